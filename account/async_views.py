@@ -0,0 +1,143 @@
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.http import Http404
+
+from .cache import account_page_queries, get_account_version, home_timeline
+from .middleware import get_profile
+from .models import Account, FollowConnection
+from .views import (
+    account_etag,
+    connection_page,
+    followers_etag,
+    followings_etag,
+    home_view as sync_home_view,
+)
+from notification.notify import get_unread_count
+from tweet.forms import TweetForm
+from tweet.trends import get_trends
+from twitter_clone.async_views import async_read_view, async_render, gather_queries
+from twitter_clone.cache import get_or_compute
+from twitter_clone.pagination import parse_before
+
+
+async def abuild_account_page(account_id, before=None):
+    """
+    アカウントのページの内容を（プロフィール・ツイート・いいね・件数を同時に読み込んで）作る
+    """
+
+    page = {}
+    for part in await gather_queries(*account_page_queries(account_id, before)):
+        page.update(part)
+    return page
+
+
+async def home_view(request):
+    """
+    ホームの非同期版（ツイートの投稿は同期版のビューで処理する）
+    """
+
+    if request.method == "POST":
+        return await sync_to_async(sync_home_view)(request)
+    return await _home_view(request)
+
+
+@async_read_view()
+async def _home_view(request):
+    user_id = request.user.pk
+    before = parse_before(request)
+    profile, timeline, unread_count = await gather_queries(
+        lambda: get_profile(request),
+        lambda: home_timeline(user_id, before=before),
+        lambda: get_unread_count(user_id),
+    )
+    return await async_render(
+        request,
+        "account/home.html",
+        {
+            **timeline,
+            "profile": profile,
+            "form": TweetForm(),
+            "trend_list": get_trends(),
+            "unread_notification_count": unread_count,
+        },
+    )
+
+
+@async_read_view(etag_func=account_etag)
+async def account_detail_view(request, account_id):
+    """
+    アカウントの詳細ページの非同期版
+    """
+
+    before = request.GET.get("before", "")
+    if before.isdigit():
+        page_query = lambda: async_to_sync(abuild_account_page)(  # noqa: E731
+            account_id, before=int(before)
+        )
+    else:
+        page_query = lambda: get_or_compute(  # noqa: E731
+            f"account_page:{account_id}:{get_account_version(account_id)}",
+            lambda: async_to_sync(abuild_account_page)(account_id),
+            timeout=settings.ACCOUNT_PAGE_CACHE_TIMEOUT,
+            local_timeout=settings.LOCAL_CACHE_TIMEOUT,
+        )
+    user_id = request.user.pk
+    page, is_follow = await gather_queries(
+        page_query,
+        lambda: FollowConnection.objects.filter(
+            follower_id=user_id, followee_id=account_id
+        ).exists(),
+    )
+    return await async_render(
+        request, "account/account_detail.html", {**page, "is_follow": is_follow}
+    )
+
+
+async def _connection_list_view(
+    request, account_id, template_name, context_name, queryset
+):
+    account_exists, (connection_list, next_before) = await gather_queries(
+        lambda: Account.objects.filter(pk=account_id).exists(),
+        lambda: connection_page(queryset, request),
+    )
+    if not account_exists:
+        raise Http404("No Account matches the given query.")
+    return await async_render(
+        request,
+        template_name,
+        {context_name: connection_list, "next_before": next_before},
+    )
+
+
+@async_read_view(etag_func=followings_etag)
+async def account_followings_view(request, account_id):
+    """
+    フォローしているアカウントの一覧ページの非同期版
+    """
+
+    return await _connection_list_view(
+        request,
+        account_id,
+        "account/account_followings.html",
+        "followee_connection_list",
+        FollowConnection.objects.select_related("followee__profile")
+        .filter(follower_id=account_id)
+        .order_by("-id"),
+    )
+
+
+@async_read_view(etag_func=followers_etag)
+async def account_followers_view(request, account_id):
+    """
+    フォローされているアカウントの一覧ページの非同期版
+    """
+
+    return await _connection_list_view(
+        request,
+        account_id,
+        "account/account_followers.html",
+        "follower_connection_list",
+        FollowConnection.objects.select_related("follower__profile")
+        .filter(followee_id=account_id)
+        .order_by("-id"),
+    )
@@ -0,0 +1,220 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db.models import Count
+
+from .models import Account
+
+AUTOCOMPLETE_SIZE = 10
+
+# 候補がこの件数を超える短い接頭辞は，上位の結果を接頭辞ごとに記憶しておく
+SCAN_LIMIT = 1000
+
+_MAX_CHAR = "\U0010ffff"
+
+
+def _sort_key(username):
+    return username.casefold()
+
+
+class UsernameIndex:
+    """
+    ユーザ名の接頭辞からフォロワーの多い順にアカウントを探すためのメモリ上の索引
+
+    ユーザ名（大文字・小文字を区別しない）でソートしたリストを二分探索する．
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._lock = threading.Lock()
+        # 読み込み・取り込みを同時に1つのスレッドだけで行うためのロック
+        self._load_lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self._entries = []
+        self._followers = {}
+        self._by_id = {}
+        self._top = {}
+        self._max_id = 0
+        self._loaded_at = None
+        self._rebuilt_at = None
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+    def _accounts(self, queryset):
+        return queryset.annotate(follower_num=Count("followee")).values_list(
+            "id", "username", "follower_num"
+        )
+
+    def load(self):
+        """
+        全アカウントを読み込んで索引を作り直す
+        """
+
+        accounts = list(self._accounts(Account.objects.all()))
+        with self._lock:
+            self._entries = sorted(
+                (_sort_key(username), username, pk) for pk, username, _ in accounts
+            )
+            self._followers = {pk: follower_num for pk, _, follower_num in accounts}
+            self._by_id = {entry[2]: entry for entry in self._entries}
+            self._top = {}
+            self._max_id = max(self._followers, default=0)
+            self._loaded_at = self._rebuilt_at = self.clock()
+
+    def refresh(self, wait=True):
+        """
+        前回の読み込み以降に他のプロセスで登録されたアカウントを追加する
+
+        全件を読み込んでから AUTOCOMPLETE_REBUILD_INTERVAL 秒が過ぎている場合は，
+        他のプロセスでのフォロワー数の変化や削除を反映するため全件を読み込み直す．
+        wait=False の場合，他のスレッドが読み込み中ならば待たずに何もしない．
+        """
+
+        if not self._load_lock.acquire(blocking=wait):
+            return
+        try:
+            if (
+                not self.loaded
+                or self.clock() - self._rebuilt_at
+                >= settings.AUTOCOMPLETE_REBUILD_INTERVAL
+            ):
+                self.load()
+                return
+            accounts = list(self._accounts(Account.objects.filter(id__gt=self._max_id)))
+            for pk, username, follower_num in accounts:
+                self._add(pk, username, follower_num)
+            self._loaded_at = self.clock()
+        finally:
+            self._load_lock.release()
+
+    def _ensure_fresh(self):
+        if not self.loaded:
+            # 最初の読み込みは1つのスレッドだけが行い，他のスレッドはそれを待つ
+            with self._load_lock:
+                if not self.loaded:
+                    self.load()
+        elif self.clock() - self._loaded_at >= settings.AUTOCOMPLETE_REFRESH_INTERVAL:
+            self.refresh(wait=False)
+
+    def _rank(self, entry):
+        return (-self._followers[entry[2]], entry[0])
+
+    def _add(self, pk, username, follower_num=0):
+        entry = (_sort_key(username), username, pk)
+        with self._lock:
+            if pk in self._followers:
+                return
+            index = bisect_left(self._entries, entry)
+            self._entries.insert(index, entry)
+            self._followers[pk] = follower_num
+            self._by_id[pk] = entry
+            self._max_id = max(self._max_id, pk)
+            self._offer(entry)
+
+    def add(self, account):
+        """
+        登録されたアカウントを索引に追加する（まだ読み込んでいない場合は何もしない）
+        """
+
+        if self.loaded:
+            self._add(account.pk, account.username)
+
+    def remove(self, account_id):
+        """
+        削除されたアカウントを索引から取り除く
+        """
+
+        with self._lock:
+            entry = self._by_id.pop(account_id, None)
+            if entry is None:
+                return
+            self._entries.pop(bisect_left(self._entries, entry))
+            del self._followers[account_id]
+            self._forget(entry)
+
+    def update_followers(self, account_id, delta):
+        """
+        フォロワー数の変化を反映する
+        """
+
+        with self._lock:
+            if account_id not in self._followers:
+                return
+            self._followers[account_id] += delta
+            entry = self._by_id[account_id]
+            if delta > 0:
+                self._offer(entry)
+                return
+            # 順位が下がった場合は，記憶した上位の結果から外れるかもしれないので作り直す
+            self._forget(entry)
+
+    def _forget(self, entry):
+        for length in range(len(entry[0]) + 1):
+            prefix = entry[0][:length]
+            if entry in self._top.get(prefix, ()):
+                del self._top[prefix]
+
+    def _offer(self, entry):
+        """
+        記憶している上位の結果のうち，entry の接頭辞のものに entry を反映する
+        """
+
+        key = entry[0]
+        for length in range(len(key) + 1):
+            prefix = key[:length]
+            top = self._top.get(prefix)
+            if top is not None:
+                candidates = [other for other in top if other != entry] + [entry]
+                self._top[prefix] = heapq.nsmallest(
+                    AUTOCOMPLETE_SIZE, candidates, key=self._rank
+                )
+
+    def _contains(self, username):
+        key = (_sort_key(username), username)
+        index = bisect_left(self._entries, key)
+        return index < len(self._entries) and self._entries[index][:2] == key
+
+    def contains(self, username):
+        """
+        ユーザ名（大文字・小文字を区別する）のアカウントが索引にあるかを返す
+
+        他のプロセスでの登録・削除は次の取り込み・読み込み直しまで反映されないため，
+        正確な結果が必要ならばデータベースで確かめること．
+        """
+
+        self._ensure_fresh()
+        return self._contains(username)
+
+    def _range(self, prefix):
+        lo = bisect_left(self._entries, (prefix,))
+        hi = bisect_left(self._entries, (prefix + _MAX_CHAR,))
+        return lo, hi
+
+    def search(self, prefix, limit=AUTOCOMPLETE_SIZE):
+        """
+        ユーザ名が prefix で始まるアカウントを (id, username) のリストで返す
+        """
+
+        self._ensure_fresh()
+        prefix = _sort_key(prefix)
+        top = self._top.get(prefix)
+        if top is None:
+            lo, hi = self._range(prefix)
+            top = heapq.nsmallest(
+                AUTOCOMPLETE_SIZE,
+                self._entries[lo:hi],
+                key=self._rank,
+            )
+            if hi - lo > SCAN_LIMIT:
+                self._top[prefix] = top
+        return [(pk, username) for _, username, pk in top[:limit]]
+
+
+username_index = UsernameIndex()
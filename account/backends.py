@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+from django.core.cache import cache
+
+
+def _user_key(user_id):
+    return f"auth_user:{user_id}"
+
+
+def invalidate_user(user_id):
+    cache.delete(_user_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    セッションからのユーザの読み込みをキャッシュする認証バックエンド
+
+    以前のセッションを読めるよう AUTHENTICATION_BACKENDS には ModelBackend も残すため，
+    ユーザ名とパスワードで認証できなかった場合は（ModelBackend で同じパスワードの
+    ハッシュをもう一度計算しないよう）PermissionDenied で認証を打ち切る．
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user = super().authenticate(request, username, password, **kwargs)
+        if user is None and password is not None:
+            raise PermissionDenied
+        return user
+
+    def get_user(self, user_id):
+        key = _user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
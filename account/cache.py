@@ -0,0 +1,193 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+from tweet.models import FavoriteConnection, Tweet
+from tweet.sharding import ShardedQuerySet, shard_for_user
+from twitter_clone.cache import get_or_compute
+
+from .models import Account, FollowConnection, Profile
+
+ACCOUNT_PAGE_SIZE = 20
+HOME_PAGE_SIZE = 20
+
+
+def _version_key(account_id):
+    return f"account_version:{account_id}"
+
+
+def _new_version():
+    # キャッシュから追い出された後に古いバージョンの値へ戻らないよう時刻から作る
+    return time.time_ns()
+
+
+def get_account_version(account_id):
+    """
+    アカウントのページのバージョンを返す
+    """
+
+    key = _version_key(account_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_account_versions(account_ids):
+    """
+    複数のアカウントのページのバージョンを {アカウントのID: バージョン} で返す
+    """
+
+    keys = {_version_key(account_id): account_id for account_id in account_ids}
+    versions = {keys[key]: version for key, version in cache.get_many(keys).items()}
+    for account_id in account_ids:
+        if account_id not in versions:
+            versions[account_id] = get_account_version(account_id)
+    return versions
+
+
+def bump_account_version(account_id):
+    """
+    アカウントのページのバージョンを更新し，キャッシュを無効にする
+    """
+
+    key = _version_key(account_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), timeout=None)
+
+
+def _get_account(account_id):
+    account = Account.objects.select_related("profile").filter(pk=account_id).first()
+    if account is None:
+        raise Http404("No Account matches the given query.")
+    return account
+
+
+def account_page_queries(account_id, before=None):
+    """
+    アカウントのページの内容のうち，互いに依存しない部分を読み込む関数のリストを返す
+
+    各関数はページの内容の一部を辞書で返す．
+    """
+
+    def tweets():
+        shard = shard_for_user(account_id)
+        tweets = (
+            Tweet.objects.prefetch_related("user")
+            .filter(user_id=account_id)
+            .order_by("-id")
+        )
+        if before is not None:
+            tweets = tweets.filter(id__lt=before)
+        tweet_list = ShardedQuerySet(tweets, shards=[shard], limit=ACCOUNT_PAGE_SIZE)
+        next_before = None
+        if len(tweet_list) == ACCOUNT_PAGE_SIZE:
+            last_id = tweet_list[ACCOUNT_PAGE_SIZE - 1].id
+            if tweets.using(shard).filter(id__lt=last_id).exists():
+                next_before = last_id
+        return {"tweet_list": tweet_list, "next_before": next_before}
+
+    def favorites():
+        favorite_connection_list = ShardedQuerySet(
+            FavoriteConnection.objects.select_related("favorited_tweet")
+            .prefetch_related("favorited_tweet__user")
+            .filter(favorite_account_id=account_id, favorited_tweet__is_deleted=False)
+            .order_by("-id"),
+            limit=ACCOUNT_PAGE_SIZE,
+        )
+        len(favorite_connection_list)
+        return {"favorite_connection_list": favorite_connection_list}
+
+    def account():
+        account = _get_account(account_id)
+        return {"account": account, "profile": account.profile}
+
+    def counts():
+        return {
+            "followee_num": FollowConnection.objects.filter(
+                follower_id=account_id
+            ).count(),
+            "follower_num": FollowConnection.objects.filter(
+                followee_id=account_id
+            ).count(),
+        }
+
+    return [account, tweets, favorites, counts]
+
+
+def build_account_page(account_id, before=None):
+    """
+    閲覧者によらないアカウントのページの内容（プロフィール・件数・最初のページ）を作る
+    """
+
+    page = {}
+    for query in account_page_queries(account_id, before=before):
+        page.update(query())
+    return page
+
+
+def home_timeline(user_id, before=None):
+    """
+    ホームのタイムラインの1ページ分と，そのうちユーザがいいねしたツイートのIDを返す
+    """
+
+    tweets = Tweet.objects.prefetch_related("user").order_by("-id")
+    if before is not None:
+        tweets = tweets.filter(id__lt=before)
+    tweet_list = list(ShardedQuerySet(tweets, limit=HOME_PAGE_SIZE))
+    favorited_tweet_id_list = set(
+        ShardedQuerySet(
+            FavoriteConnection.objects.filter(
+                favorite_account_id=user_id,
+                favorited_tweet_id__in=[tweet.pk for tweet in tweet_list],
+            )
+        ).values_list("favorited_tweet_id", flat=True)
+    )
+    next_before = None
+    if len(tweet_list) == HOME_PAGE_SIZE:
+        next_before = tweet_list[-1].pk
+    return {
+        "tweet_list": tweet_list,
+        "favorited_tweet_id_list": favorited_tweet_id_list,
+        "next_before": next_before,
+    }
+
+
+def get_account_page(account_id):
+    """
+    バージョン付きのキャッシュからアカウントのページの内容を返す
+    """
+
+    key = f"account_page:{account_id}:{get_account_version(account_id)}"
+    return get_or_compute(
+        key,
+        lambda: build_account_page(account_id),
+        timeout=settings.ACCOUNT_PAGE_CACHE_TIMEOUT,
+        local_timeout=settings.LOCAL_CACHE_TIMEOUT,
+    )
+
+
+def _profile_key(user_id):
+    return f"profile:{user_id}"
+
+
+def get_cached_profile(user_id):
+    """
+    ユーザのプロフィールをキャッシュから返す（なければデータベースから読み込む）
+    """
+
+    key = _profile_key(user_id)
+    profile = cache.get(key)
+    if profile is None:
+        profile = Profile.objects.get(user_id=user_id)
+        cache.set(key, profile, timeout=settings.PROFILE_CACHE_TIMEOUT)
+    return profile
+
+
+def invalidate_profile(user_id):
+    cache.delete(_profile_key(user_id))
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.caches)
+def check_throttle_cache(app_configs, **kwargs):
+    """
+    ログインの試行回数を数えるキャッシュが全プロセスで共有されているかを確かめる
+    """
+
+    if not settings.THROTTLE_REQUIRE_SHARED_CACHE:
+        return []
+    if isinstance(caches["throttle"], LocMemCache):
+        return [
+            Error(
+                "CACHES['throttle'] がプロセスごとの LocMemCache のため，"
+                "ログインの試行の制限がプロセスの数だけ緩くなります．",
+                hint="Memcached などの共有キャッシュを THROTTLE_CACHE_BACKEND・"
+                "THROTTLE_CACHE_LOCATION で指定してください．",
+                id="account.E001",
+            )
+        ]
+    return []
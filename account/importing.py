@@ -0,0 +1,177 @@
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from .autocomplete import username_index
+from .models import Account, Profile
+
+IMPORT_BATCH_SIZE = 1000
+USERNAME_MAX_LENGTH = 30
+EMAIL_MAX_LENGTH = 200
+
+_validate_username = UnicodeUsernameValidator()
+
+
+def _hash_password(password):
+    # 空のパスワードは使えないパスワード（後から再設定させる）にする
+    return make_password(password or None)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_accounts(f):
+    """
+    username, email, password（, profile）の列を持つCSVを読み込む
+    """
+
+    for row in csv.DictReader(f):
+        yield {
+            "username": (row.get("username") or "").strip(),
+            "email": (row.get("email") or "").strip(),
+            "password": row.get("password") or "",
+            "profile": row.get("profile") or "",
+        }
+
+
+def _is_valid(row):
+    username, email = row["username"], row["email"]
+    if not username or len(username) > USERNAME_MAX_LENGTH:
+        return False
+    if not email or len(email) > EMAIL_MAX_LENGTH:
+        return False
+    try:
+        _validate_username(username)
+        validate_email(email)
+    except ValidationError:
+        return False
+    return True
+
+
+class AccountImporter:
+    """
+    アカウントとプロフィールをまとめて登録する
+
+    パスワードのハッシュは（CPUを使うため）プロセスプールで並列に計算し，
+    次のバッチのハッシュを計算している間に今のバッチを登録する．
+    各バッチのアカウントとプロフィールは1つのトランザクションで登録し，
+    その間に他で登録されたユーザ名があればそれを除いて登録し直す．
+    """
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE, workers=None):
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.counts = {"created": 0, "invalid": 0, "duplicate": 0, "exists": 0}
+
+    def _filter(self, rows, seen):
+        """
+        不正な行・ファイル内で重複した行・登録済みのユーザ名の行を除く
+        """
+
+        valid = []
+        for row in rows:
+            if not _is_valid(row):
+                self.counts["invalid"] += 1
+            elif row["username"] in seen:
+                self.counts["duplicate"] += 1
+            else:
+                seen.add(row["username"])
+                valid.append(row)
+        existing = set(
+            Account.objects.filter(
+                username__in=[row["username"] for row in valid]
+            ).values_list("username", flat=True)
+        )
+        self.counts["exists"] += len(existing)
+        return [row for row in valid if row["username"] not in existing]
+
+    def _hash(self, executor, rows):
+        passwords = [row["password"] for row in rows]
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return executor.map(_hash_password, passwords, chunksize=chunksize)
+
+    def _create(self, rows):
+        accounts = [
+            Account(username=row["username"], email=row["email"], password=password)
+            for row, password in rows
+        ]
+        with transaction.atomic():
+            Account.objects.bulk_create(accounts)
+            # SQLite では bulk_create で作った行のIDが返らないため読み込み直す
+            account_ids = dict(
+                Account.objects.filter(
+                    username__in=[account.username for account in accounts]
+                ).values_list("username", "id")
+            )
+            Profile.objects.bulk_create(
+                [
+                    Profile(
+                        user_id=account_ids[row["username"]], profile=row["profile"]
+                    )
+                    for row, _ in rows
+                ]
+            )
+        for account in accounts:
+            account.pk = account_ids[account.username]
+        return accounts
+
+    def _insert(self, rows, hashes):
+        rows = list(zip(rows, hashes))
+        while rows:
+            try:
+                accounts = self._create(rows)
+            except IntegrityError:
+                # ハッシュを計算している間に他で登録されたユーザ名を除いてやり直す
+                existing = set(
+                    Account.objects.filter(
+                        username__in=[row["username"] for row, _ in rows]
+                    ).values_list("username", flat=True)
+                )
+                if not existing:
+                    raise
+                self.counts["exists"] += len(existing)
+                rows = [row for row in rows if row[0]["username"] not in existing]
+                continue
+            self.counts["created"] += len(accounts)
+            for account in accounts:
+                username_index.add(account)
+            return
+
+    def run(self, rows):
+        """
+        行を登録し，結果の件数と所要時間（秒）を返す
+        """
+
+        start = time.perf_counter()
+        seen = set()
+        batches = (
+            self._filter(chunk, seen) for chunk in _chunks(rows, self.batch_size)
+        )
+        with ProcessPoolExecutor(
+            max_workers=self.workers, initializer=django.setup
+        ) as executor:
+            previous = None
+            for batch in batches:
+                # 次のバッチのハッシュの計算を始めてから前のバッチを登録する
+                hashes = self._hash(executor, batch) if batch else iter(())
+                if previous is not None:
+                    self._insert(*previous)
+                previous = (batch, hashes)
+            if previous is not None:
+                self._insert(*previous)
+        return self.counts, time.perf_counter() - start
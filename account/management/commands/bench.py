@@ -0,0 +1,115 @@
+import json
+import subprocess
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from account.models import Account
+from tweet.models import Tweet
+from tweet.sharding import ShardedQuerySet
+from twitter_clone.benchmark import BENCH_VIEWS, Benchmark
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "各ビューのスループット・レイテンシ・クエリ数を同時接続数ごとに計測する"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--username", required=True, help="詳細・フォロー一覧を閲覧し，フォローするアカウント"
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            nargs="+",
+            default=[1],
+            help="同時に接続するクライアント数（クライアントごとに別のアカウントでログインする）",
+        )
+        parser.add_argument("--requests", type=int, default=100, help="ビューごとに送るリクエスト数")
+        parser.add_argument(
+            "--warmup", type=int, default=5, help="計測前にクライアントごとに送るリクエスト数"
+        )
+        parser.add_argument(
+            "--views", nargs="+", choices=BENCH_VIEWS, default=BENCH_VIEWS
+        )
+        parser.add_argument("--output", help="結果を保存するJSONファイル")
+
+    def handle(
+        self,
+        *args,
+        username,
+        concurrency,
+        requests,
+        warmup,
+        views,
+        output,
+        **options,
+    ):
+        subject = Account.objects.filter(username=username).first()
+        if subject is None:
+            raise CommandError(f"User {username} does not exist.")
+        viewers = list(
+            Account.objects.exclude(pk=subject.pk).order_by("pk")[: max(concurrency)]
+        )
+        if len(viewers) < max(concurrency):
+            raise CommandError(
+                f"At least {max(concurrency)} other accounts are required "
+                f"(one per client)."
+            )
+        tweet = next(
+            iter(ShardedQuerySet(Tweet.objects.order_by("-id"), limit=1)), None
+        )
+        if tweet is None:
+            views = [view for view in views if view not in ("tweet_detail", "favorite")]
+
+        runs = []
+        for clients in concurrency:
+            results = Benchmark(
+                viewers,
+                subject,
+                tweet,
+                concurrency=clients,
+                requests=requests,
+                warmup=warmup,
+            ).run(views)
+            runs.append({"concurrency": clients, "results": results})
+            self._write_table(clients, results)
+
+        if output:
+            report = {
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "git_commit": _git_commit(),
+                "username": username,
+                "requests": requests,
+                "warmup": warmup,
+                "runs": runs,
+            }
+            with open(output, "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"結果を {output} に保存しました")
+
+    def _write_table(self, clients, results):
+        self.stdout.write(f"\nconcurrency={clients}")
+        self.stdout.write(
+            f"{'view':<16}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+            f"{'queries':>10}{'errors':>8}"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<16}{result['throughput']:>10.1f}{result['p50_ms']:>10.1f}"
+                f"{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+                f"{result['queries_per_request']:>10.1f}{result['errors']:>8}"
+            )
@@ -0,0 +1,153 @@
+import asyncio
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.urls import include, path, reverse
+
+from account import async_views, views
+from account.models import Account
+from tweet import async_views as tweet_async_views, views as tweet_views
+from tweet.models import Tweet
+from tweet.sharding import ShardedQuerySet
+from twitter_clone.benchmark import client_host
+
+
+class _URLConf:
+    def __init__(self, urlpatterns):
+        self.urlpatterns = urlpatterns
+
+
+class Command(BaseCommand):
+    help = "閲覧用のビューの同期版と非同期版のスループットを同時接続数ごとに比較する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", required=True, help="閲覧するユーザ")
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            nargs="+",
+            default=[1, 10, 100],
+            help="同時に接続するクライアント数",
+        )
+        parser.add_argument("--requests", type=int, default=200, help="1回の計測で送るリクエスト数")
+
+    def handle(self, *args, username, concurrency, requests, **options):
+        user = Account.objects.filter(username=username).first()
+        if user is None:
+            raise CommandError(f"User {username} does not exist.")
+        tweet = ShardedQuerySet(Tweet.objects.order_by("-id"), limit=1)
+        targets = [
+            (
+                "home",
+                reverse("account:home"),
+                {},
+                views.home_view,
+                async_views.home_view,
+            ),
+            (
+                "account_detail",
+                reverse("account:account_detail", args=[user.pk]),
+                {"account_id": user.pk},
+                views.account_detail_view,
+                async_views.account_detail_view,
+            ),
+            (
+                "followings",
+                reverse("account:followings", args=[user.pk]),
+                {"account_id": user.pk},
+                views.account_followings_view,
+                async_views.account_followings_view,
+            ),
+            (
+                "followers",
+                reverse("account:followers", args=[user.pk]),
+                {"account_id": user.pk},
+                views.account_followers_view,
+                async_views.account_followers_view,
+            ),
+        ]
+        if tweet:
+            targets.append(
+                (
+                    "tweet_detail",
+                    reverse("tweet:tweet_detail", args=[tweet[0].pk]),
+                    {"tweet_id": tweet[0].pk},
+                    tweet_views.tweet_detail_view,
+                    tweet_async_views.tweet_detail_view,
+                )
+            )
+
+        self.stdout.write(
+            f"{'view':<16}{'clients':>8}{'sync req/s':>14}{'async req/s':>14}"
+        )
+        for name, url, view_kwargs, sync_view, async_view in targets:
+            for clients in concurrency:
+                with self._urlconf(url, sync_view, view_kwargs):
+                    sync_rate = self._bench_sync(user, url, clients, requests)
+                with self._urlconf(url, async_view, view_kwargs):
+                    async_rate = self._bench_async(user, url, clients, requests)
+                self.stdout.write(
+                    f"{name:<16}{clients:>8}{sync_rate:>14.1f}{async_rate:>14.1f}"
+                )
+
+    def _urlconf(self, url, view, view_kwargs):
+        """
+        url だけを指定したビューで処理し，他のURLは通常どおり解決するURLconfに切り替える
+
+        リクエストはミドルウェアを含むハンドラ（WSGI・ASGI）を通して送る．
+        """
+
+        urlconf = _URLConf(
+            [
+                path(url.lstrip("/"), view, view_kwargs),
+                path("", include(settings.ROOT_URLCONF)),
+            ]
+        )
+        return override_settings(ROOT_URLCONF=urlconf)
+
+    def _check(self, response, url):
+        if response.status_code >= 400:
+            raise CommandError(f"{url} returned {response.status_code}.")
+
+    def _bench_sync(self, user, url, clients, requests):
+        pool = queue.SimpleQueue()
+        for _ in range(clients):
+            client = Client(HTTP_HOST=client_host())
+            client.force_login(user)
+            pool.put(client)
+
+        def call(_):
+            client = pool.get()
+            try:
+                self._check(client.get(url), url)
+            finally:
+                pool.put(client)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            list(executor.map(call, range(requests)))
+        return requests / (time.perf_counter() - start)
+
+    def _bench_async(self, user, url, clients, requests):
+        pool = []
+        for _ in range(clients):
+            client = AsyncClient(HTTP_HOST=client_host())
+            client.force_login(user)
+            pool.append(client)
+
+        async def run():
+            remaining = iter(range(requests))
+
+            async def worker(client):
+                for _ in remaining:
+                    self._check(await client.get(url), url)
+
+            await asyncio.gather(*(worker(client) for client in pool))
+
+        start = time.perf_counter()
+        asyncio.run(run())
+        return requests / (time.perf_counter() - start)
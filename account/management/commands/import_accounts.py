@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from account.importing import IMPORT_BATCH_SIZE, AccountImporter, read_accounts
+
+
+class Command(BaseCommand):
+    help = "CSV（username, email, password, profile）からアカウントをまとめて登録する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="読み込むCSVファイル")
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument("--workers", type=int, help="パスワードのハッシュを計算するプロセス数（既定はCPU数）")
+
+    def handle(self, *args, path, batch_size, workers, **options):
+        with open(path, newline="", encoding="utf-8") as f:
+            counts, elapsed = AccountImporter(
+                batch_size=batch_size, workers=workers
+            ).run(read_accounts(f))
+        rate = counts["created"] / elapsed if elapsed else 0
+        self.stdout.write(
+            f"{counts['created']} 件のアカウントを登録しました（{elapsed:.1f}秒，{rate:.0f}件/秒）"
+        )
+        skipped = {name: count for name, count in counts.items() if name != "created"}
+        if any(skipped.values()):
+            self.stdout.write(
+                "スキップ: "
+                + ", ".join(f"{name}={count}" for name, count in skipped.items())
+            )
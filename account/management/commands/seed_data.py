@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from account.models import Account
+from twitter_clone.seeding import SEED_BATCH_SIZE, Seeder
+
+
+class Command(BaseCommand):
+    help = "負荷試験用にアカウント・ツイート・フォロー・いいねを大量に作る"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--accounts", type=int, default=1000, help="作るアカウント数")
+        parser.add_argument(
+            "--tweets-per-account", type=int, default=10, help="1アカウントあたりの平均ツイート数"
+        )
+        parser.add_argument(
+            "--follows-per-account", type=int, default=20, help="1アカウントあたりの平均フォロー数"
+        )
+        parser.add_argument(
+            "--favorites-per-account", type=int, default=20, help="1アカウントあたりの平均いいね数"
+        )
+        parser.add_argument(
+            "--exponent", type=float, default=1.1, help="人気の偏り（Zipf 分布の指数）"
+        )
+        parser.add_argument("--seed", type=int, default=0, help="乱数のシード")
+        parser.add_argument("--prefix", default="seed", help="ユーザ名の接頭辞")
+        parser.add_argument("--password", default="password", help="全アカウント共通のパスワード")
+        parser.add_argument("--batch-size", type=int, default=SEED_BATCH_SIZE)
+
+    def handle(
+        self,
+        *args,
+        accounts,
+        tweets_per_account,
+        follows_per_account,
+        favorites_per_account,
+        exponent,
+        seed,
+        prefix,
+        password,
+        batch_size,
+        **options,
+    ):
+        if Account.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f"Accounts with prefix {prefix!r} already exist. Use another --prefix."
+            )
+        counts, timings = Seeder(
+            accounts,
+            tweets_per_account=tweets_per_account,
+            follows_per_account=follows_per_account,
+            favorites_per_account=favorites_per_account,
+            exponent=exponent,
+            seed=seed,
+            prefix=prefix,
+            password=password,
+            batch_size=batch_size,
+        ).run()
+        for name, count in counts.items():
+            self.stdout.write(f"{name}: {count} 件 ({timings[name]:.1f}s)")
@@ -0,0 +1,25 @@
+from django.utils.functional import SimpleLazyObject
+
+from twitter_clone.middleware import WrappingMiddleware
+
+from .cache import get_cached_profile
+
+
+def get_profile(request):
+    if not hasattr(request, "_cached_profile"):
+        user = request.user
+        request._cached_profile = (
+            get_cached_profile(user.pk) if user.is_authenticated else None
+        )
+    return request._cached_profile
+
+
+class ProfileMiddleware(WrappingMiddleware):
+    """
+    ログイン中のユーザのプロフィールを request.profile として遅延して読み込む
+    """
+
+    def wrap(self, request):
+        request.profile = SimpleLazyObject(lambda: get_profile(request))
+        response = yield
+        return response
@@ -0,0 +1,42 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .autocomplete import username_index
+from .backends import invalidate_user
+from .cache import bump_account_version, invalidate_profile
+from .models import Account, FollowConnection, Profile
+
+
+@receiver([post_save, post_delete], sender=Account)
+def account_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+    bump_account_version(instance.pk)
+
+
+@receiver(post_delete, sender=Account)
+def account_deleted(sender, instance, **kwargs):
+    username_index.remove(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    invalidate_profile(instance.user_id)
+    invalidate_user(instance.user_id)
+    bump_account_version(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=FollowConnection)
+def follow_connection_changed(sender, instance, **kwargs):
+    bump_account_version(instance.follower_id)
+    bump_account_version(instance.followee_id)
+
+
+@receiver(post_save, sender=FollowConnection)
+def follow_connection_created(sender, instance, created, **kwargs):
+    if created:
+        username_index.update_followers(instance.followee_id, 1)
+
+
+@receiver(post_delete, sender=FollowConnection)
+def follow_connection_deleted(sender, instance, **kwargs):
+    username_index.update_followers(instance.followee_id, -1)
@@ -1,9 +1,55 @@
-from django.http import HttpResponseNotAllowed
-from django.test import TestCase
-from django.urls import reverse
-
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.conf import settings
+from django.core.cache import caches
+from django.core.handlers.base import BaseHandler
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed
+from django.template import engines
+from django.test import (
+    AsyncRequestFactory,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils.module_loading import import_string
+
+from . import async_views
+from .autocomplete import UsernameIndex, username_index
+from .checks import check_throttle_cache
+from .importing import AccountImporter
+from .cache import ACCOUNT_PAGE_SIZE, HOME_PAGE_SIZE, get_account_version
 from .models import Account, Profile, FollowConnection
 from .forms import SignUpForm, LoginForm
+from .throttling import WindowCounter, client_ip
+from tweet.models import FavoriteConnection, Tweet
+from tweet.trends import trend_counter
+from twitter_clone.cache import get_or_compute
+from twitter_clone import metrics
+from twitter_clone.async_views import gather_queries
+from twitter_clone.benchmark import BENCH_VIEWS, Benchmark, percentile
+from twitter_clone.instrumentation import collect_queries, query_shape
+from twitter_clone.profiling import SlowRequestMiddleware, watch_task
+from twitter_clone.seeding import ZipfSampler
+from twitter_clone.testing import QueryBudgetMixin
+from twitter_clone.warmup import warm_up
 
 
 class RegistrationTest(TestCase):
@@ -388,6 +434,142 @@ class LoginTest(TestCase):
         self.assertIsInstance(response, HttpResponseNotAllowed)
 
 
+class LoginThrottleTest(TestCase):
+    """
+    ログインの試行の制限に対するテスト
+    """
+
+    def setUp(self):
+        Account.objects.create_user(
+            email="sample@example.com", username="sample", password="instance1"
+        )
+        self.path = reverse("account:login")
+
+    def attempt(self, username="sample", password="wrong-password", ip="10.0.0.1"):
+        return self.client.post(
+            self.path,
+            data={"username": username, "password": password},
+            REMOTE_ADDR=ip,
+        )
+
+    def test_ip_throttle(self):
+        """
+        同じIPアドレスからの試行が多すぎる場合にハッシュを計算せずに拒否する場合
+        """
+
+        with self.settings(LOGIN_THROTTLE_IP_RATE=(3, 60)):
+            for i in range(3):
+                self.assertEqual(self.attempt(username=f"user{i}").status_code, 200)
+            with mock.patch("django.contrib.auth.forms.authenticate") as authenticate:
+                response = self.attempt(password="instance1")
+            authenticate.assert_not_called()
+            self.assertEqual(response.status_code, 429)
+            self.assertIn(int(response["Retry-After"]), range(1, 61))
+            self.assertContains(response, "ログインの試行回数が多すぎます", status_code=429)
+
+            # 別のIPアドレスからはログインできる
+            response = self.attempt(password="instance1", ip="10.0.0.2")
+            self.assertRedirects(response, "/home/", fetch_redirect_response=False)
+
+    def test_username_throttle(self):
+        """
+        同じユーザ名への試行が多すぎる場合に，IPアドレスによらず拒否する場合
+        """
+
+        with self.settings(LOGIN_THROTTLE_USERNAME_RATE=(2, 60)):
+            self.attempt(ip="10.0.0.1")
+            self.attempt(username="SAMPLE", ip="10.0.0.2")
+            response = self.attempt(password="instance1", ip="10.0.0.3")
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(self.attempt(username="other").status_code, 200)
+
+    def test_window_counter(self):
+        """
+        区間ごとに回数を数え，次の区間で再び許可する場合
+        """
+
+        now = [0.0]
+        counter = WindowCounter("test", limit=2, window=10, clock=lambda: now[0])
+        self.assertIsNone(counter.consume("key"))
+        self.assertIsNone(counter.consume("key"))
+        self.assertEqual(counter.consume("key"), 10)
+        now[0] = 7.5
+        self.assertEqual(counter.consume("key"), 3)
+        self.assertIsNone(counter.consume("other"))
+        now[0] = 10.0
+        self.assertIsNone(counter.consume("key"))
+        self.assertIsNone(counter.consume("key"))
+        self.assertIsNotNone(counter.consume("key"))
+        counter.reset("key")
+        self.assertIsNone(counter.consume("key"))
+
+    def test_window_counter_concurrent(self):
+        """
+        同時に数えても上限を超えて許可しない場合
+        """
+
+        counter = WindowCounter("test", limit=50, window=60, clock=lambda: 0.0)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda i: counter.consume("key"), range(200)))
+        self.assertEqual(results.count(None), 50)
+
+    def test_trusted_proxy(self):
+        """
+        信頼できるプロキシからの場合だけ X-Forwarded-For のアドレスで制限する場合
+        """
+
+        def ip(remote_addr, forwarded=None):
+            request = RequestFactory().post(self.path, REMOTE_ADDR=remote_addr)
+            if forwarded is not None:
+                request.META["HTTP_X_FORWARDED_FOR"] = forwarded
+            return client_ip(request)
+
+        self.assertEqual(ip("10.0.0.9", "192.0.2.1"), "10.0.0.9")
+        with self.settings(LOGIN_THROTTLE_TRUSTED_PROXIES=["10.0.0.0/24"]):
+            self.assertEqual(ip("10.0.0.9", "192.0.2.1"), "192.0.2.1")
+            # クライアントが付けた左側のアドレスは使わない
+            self.assertEqual(
+                ip("10.0.0.9", "198.51.100.7, 192.0.2.1, 10.0.0.5"), "192.0.2.1"
+            )
+            self.assertEqual(ip("10.0.0.9"), "10.0.0.9")
+            self.assertEqual(ip("192.0.2.1", "198.51.100.7"), "192.0.2.1")
+
+            with self.settings(LOGIN_THROTTLE_IP_RATE=(1, 60)):
+                self.client.post(
+                    self.path,
+                    data={"username": "sample", "password": "wrong"},
+                    REMOTE_ADDR="10.0.0.9",
+                    HTTP_X_FORWARDED_FOR="192.0.2.1",
+                )
+                response = self.client.post(
+                    self.path,
+                    data={"username": "sample", "password": "instance1"},
+                    REMOTE_ADDR="10.0.0.9",
+                    HTTP_X_FORWARDED_FOR="192.0.2.2",
+                )
+                self.assertEqual(response.status_code, 302)
+
+    def test_shared_cache_check(self):
+        """
+        回数を数えるキャッシュがプロセスごとの場合に起動を止める場合
+        """
+
+        self.assertEqual(check_throttle_cache(None), [])
+        with self.settings(THROTTLE_REQUIRE_SHARED_CACHE=True):
+            self.assertEqual(
+                [error.id for error in check_throttle_cache(None)], ["account.E001"]
+            )
+            caches_setting = {
+                **settings.CACHES,
+                "throttle": {
+                    "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                    "LOCATION": "throttle",
+                },
+            }
+            with self.settings(CACHES=caches_setting):
+                self.assertEqual(check_throttle_cache(None), [])
+
+
 class LogoutTest(TestCase):
     """
     ログアウト機能に対するテスト
@@ -686,3 +868,1547 @@ class UnFollowTest(TestCase):
         response = self.client.put(path=self.path)
         self.assertEqual(response.status_code, 405)
         self.assertIsInstance(response, HttpResponseNotAllowed)
+
+
+class AccountPageCacheTest(TestCase):
+    """
+    アカウントの詳細ページのキャッシュに対するテスト
+    """
+
+    def setUp(self):
+        self.user1 = Account.objects.create_user(
+            email="sample1@example.com", username="sample1", password="instance1"
+        )
+        Profile.objects.create(user=self.user1, profile="hello")
+        self.user2 = Account.objects.create_user(
+            email="sample2@example.com", username="sample2", password="instance2"
+        )
+        Profile.objects.create(user=self.user2)
+        self.client.force_login(self.user2)
+        self.path = reverse("account:account_detail", args=[self.user1.id])
+
+    def test_cached_page(self):
+        """
+        2回目以降の閲覧でページの内容をキャッシュから返す場合
+        """
+
+        self.client.get(path=self.path)
+        version = get_account_version(self.user1.id)
+        with self.assertNumQueries(1):
+            response = self.client.get(path=self.path)
+        self.assertEqual(response.context["profile"].profile, "hello")
+        self.assertEqual(get_account_version(self.user1.id), version)
+
+    def test_invalidate_on_changes(self):
+        """
+        ツイート・フォロー・プロフィールの変更でキャッシュが無効になる場合
+        """
+
+        response = self.client.get(path=self.path)
+        self.assertEqual(len(response.context["tweet_list"]), 0)
+        self.assertFalse(response.context["is_follow"])
+
+        Tweet.objects.create(user=self.user1, content="aaa")
+        FollowConnection.objects.create(follower=self.user2, followee=self.user1)
+        profile = self.user1.profile
+        profile.profile = "updated"
+        profile.save()
+
+        response = self.client.get(path=self.path)
+        self.assertEqual(len(response.context["tweet_list"]), 1)
+        self.assertEqual(response.context["follower_num"], 1)
+        self.assertEqual(response.context["profile"].profile, "updated")
+        self.assertTrue(response.context["is_follow"])
+
+        self.client.force_login(self.user1)
+        response = self.client.get(path=self.path)
+        self.assertFalse(response.context["is_follow"])
+
+    def test_next_page(self):
+        """
+        最初のページに収まらないツイートがある場合
+        """
+
+        tweets = [
+            Tweet.objects.create(user=self.user1, content=str(i))
+            for i in range(ACCOUNT_PAGE_SIZE + 1)
+        ]
+
+        response = self.client.get(path=self.path)
+        self.assertEqual(len(response.context["tweet_list"]), ACCOUNT_PAGE_SIZE)
+        next_before = response.context["next_before"]
+        self.assertEqual(next_before, tweets[1].id)
+
+        response = self.client.get(path=self.path, data={"before": next_before})
+        self.assertEqual(list(response.context["tweet_list"]), [tweets[0]])
+        self.assertIsNone(response.context["next_before"])
+
+
+class ProfileCacheTest(TestCase):
+    """
+    プロフィールのキャッシュに対するテスト
+    """
+
+    def setUp(self):
+        self.user = Account.objects.create_user(
+            email="sample1@example.com", username="sample1", password="instance1"
+        )
+        Profile.objects.create(user=self.user, profile="hello")
+        self.client.force_login(self.user)
+
+    def assertNoProfileQuery(self, queries):
+        self.assertFalse([q for q in queries if "account_profile" in q["sql"]])
+
+    def test_profile_is_cached(self):
+        """
+        2回目以降のページの表示でプロフィールを読み込まない場合
+        """
+
+        self.client.get(path=reverse("account:home"))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path=reverse("account:home"))
+            self.client.get(path=reverse("account:edit_profile"))
+            self.client.post(path=reverse("account:home"), data={"content": "a"})
+        self.assertEqual(str(response.context["profile"]), "hello")
+        self.assertNoProfileQuery(queries)
+
+    def test_invalidate_on_edit(self):
+        """
+        プロフィールを編集した後に新しい内容が表示される場合
+        """
+
+        self.client.get(path=reverse("account:home"))
+        self.client.post(
+            path=reverse("account:edit_profile"), data={"profile": "updated"}
+        )
+        response = self.client.get(path=reverse("account:home"))
+        self.assertEqual(str(response.context["profile"]), "updated")
+
+
+class CachedAuthenticationTest(TestCase):
+    """
+    セッションとログインユーザのキャッシュに対するテスト
+    """
+
+    def setUp(self):
+        self.user = Account.objects.create_user(
+            email="sample1@example.com", username="sample1", password="instance1"
+        )
+        Profile.objects.create(user=self.user)
+        self.client.login(username="sample1", password="instance1")
+        self.path = reverse("account:edit_profile")
+
+    def test_no_queries_in_steady_state(self):
+        """
+        2回目以降のリクエストでセッションとユーザを読み込まない場合
+        """
+
+        self.client.get(path=self.path)
+        with self.assertNumQueries(0):
+            response = self.client.get(path=self.path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["user"], self.user)
+
+    def test_invalidate_on_password_change(self):
+        """
+        パスワードを変更した後に古いセッションが無効になる場合
+        """
+
+        self.client.get(path=self.path)
+        user = Account.objects.get(pk=self.user.pk)
+        user.set_password("instance2")
+        user.save()
+
+        response = self.client.get(path=self.path)
+        self.assertEqual(response.status_code, 302)
+
+    def test_legacy_session(self):
+        """
+        キャッシュを使う前の ModelBackend でログインしたセッションが使える場合
+        """
+
+        self.client.logout()
+        self.client.force_login(
+            self.user, backend="django.contrib.auth.backends.ModelBackend"
+        )
+        response = self.client.get(path=self.path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["user"], self.user)
+
+    def test_wrong_password_hashed_once(self):
+        """
+        パスワードが間違っている場合に，ハッシュを1回だけ計算して拒否する場合
+        """
+
+        self.client.logout()
+        with mock.patch.object(
+            Account, "check_password", return_value=False
+        ) as check_password:
+            self.assertFalse(
+                self.client.login(username="sample1", password="wrong-password")
+            )
+        self.assertEqual(check_password.call_count, 1)
+
+
+class WarmUpTest(TestCase):
+    """
+    起動時のウォームアップに対するテスト
+    """
+
+    def test_templates_are_compiled(self):
+        """
+        ウォームアップでテンプレートがキャッシュされる場合
+        """
+
+        engine = engines["django"].engine
+        loader = engine.template_loaders[0]
+        loader.reset()
+
+        timings = warm_up()
+        self.assertEqual(set(timings), {"models", "urls", "templates"})
+        self.assertIn("account/home.html", loader.get_template_cache)
+        self.assertIn("tweet/tweet_detail.html", loader.get_template_cache)
+
+
+class ConditionalGetTest(TestCase):
+    """
+    アカウントのページの条件付きGETに対するテスト
+    """
+
+    def setUp(self):
+        self.user1 = Account.objects.create_user(
+            email="sample1@example.com", username="sample1", password="instance1"
+        )
+        Profile.objects.create(user=self.user1)
+        self.user2 = Account.objects.create_user(
+            email="sample2@example.com", username="sample2", password="instance2"
+        )
+        Profile.objects.create(user=self.user2)
+        self.client.force_login(self.user2)
+
+    def test_not_modified(self):
+        """
+        変更がない場合に304を返し，変更があった場合に再描画する場合
+        """
+
+        # 最初のリクエストでCSRFのCookieが発行される
+        self.client.get(path=reverse("account:account_detail", args=[self.user1.id]))
+        for name in ["account_detail", "followings", "followers"]:
+            path = reverse(f"account:{name}", args=[self.user1.id])
+            response = self.client.get(path=path)
+            self.assertEqual(response.status_code, 200)
+            etag = response["ETag"]
+
+            response = self.client.get(path=path, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+            FollowConnection.objects.create(follower=self.user2, followee=self.user1)
+            response = self.client.get(path=path, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            FollowConnection.objects.all().delete()
+
+    def test_listed_profile_changed(self):
+        """
+        一覧に表示するアカウントのプロフィールが変わった場合に再描画する場合
+        """
+
+        FollowConnection.objects.create(follower=self.user2, followee=self.user1)
+        for name, account, listed in [
+            ("followings", self.user2, self.user1),
+            ("followers", self.user1, self.user2),
+        ]:
+            path = reverse(f"account:{name}", args=[account.id])
+            etag = self.client.get(path=path)["ETag"]
+            response = self.client.get(path=path, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+            listed.profile.profile = f"{name} updated"
+            listed.profile.save()
+            response = self.client.get(path=path, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, f"{name} updated")
+
+    def test_etag_differs_by_viewer(self):
+        """
+        閲覧者が異なる場合に別のETagになる場合
+        """
+
+        path = reverse("account:account_detail", args=[self.user1.id])
+        etag = self.client.get(path=path)["ETag"]
+
+        self.client.force_login(self.user1)
+        response = self.client.get(path=path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class StampedeProtectionTest(TestCase):
+    """
+    キャッシュの同時再計算の抑制に対するテスト
+    """
+
+    def test_single_flight(self):
+        """
+        同時に多数のリクエストが来ても1回だけ再計算する場合
+        """
+
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return "value"
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    get_or_compute("stampede", compute, timeout=60, local_timeout=5)
+                )
+            )
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["value"] * 10)
+        self.assertEqual(len(calls), 1)
+
+    def test_stale_while_revalidate(self):
+        """
+        他のワーカーが再計算している間は古い値を返す場合
+        """
+
+        get_or_compute("stale", lambda: "old", timeout=60)
+        shared = caches["default"]
+        value, _, delta = shared.get("stale")
+        shared.set("stale", (value, time.time() - 1, delta))
+        shared.add("stale:lock", 1)
+
+        self.assertEqual(get_or_compute("stale", lambda: "new", timeout=60), "old")
+
+        shared.delete("stale:lock")
+        self.assertEqual(get_or_compute("stale", lambda: "new", timeout=60), "new")
+
+    def test_stale_in_same_process(self):
+        """
+        同じプロセスの他のスレッドが再計算している間も待たずに古い値を返す場合
+        """
+
+        get_or_compute("stale", lambda: "old", timeout=60)
+        shared = caches["default"]
+        value, _, delta = shared.get("stale")
+        shared.set("stale", (value, time.time() - 1, delta))
+
+        started = threading.Event()
+
+        def slow_compute():
+            started.set()
+            time.sleep(0.3)
+            return "new"
+
+        thread = threading.Thread(
+            target=get_or_compute, args=("stale", slow_compute, 60)
+        )
+        thread.start()
+        started.wait()
+        start = time.monotonic()
+        self.assertEqual(get_or_compute("stale", lambda: "other", timeout=60), "old")
+        self.assertLess(time.monotonic() - start, 0.1)
+        thread.join()
+        self.assertEqual(get_or_compute("stale", lambda: "other", timeout=60), "new")
+
+    def test_none_cached_briefly(self):
+        """
+        計算結果が None の場合は短い期限でだけ保存する場合
+        """
+
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return None
+
+        with self.settings(NONE_CACHE_TIMEOUT=5):
+            self.assertIsNone(get_or_compute("missing", compute, timeout=300))
+            self.assertIsNone(get_or_compute("missing", compute, timeout=300))
+            self.assertEqual(len(calls), 1)
+            _, expires_at, _ = caches["default"].get("missing")
+            self.assertLessEqual(expires_at, time.time() + 5)
+
+            caches["default"].delete("missing")
+            self.assertEqual(get_or_compute("missing", lambda: "found", 300), "found")
+
+    def test_early_expiration(self):
+        """
+        期限の直前に確率的に再計算する場合
+        """
+
+        get_or_compute("early", lambda: "old", timeout=60)
+        shared = caches["default"]
+        value, _, _ = shared.get("early")
+        # 計算に時間がかかる値ほど早めに再計算される
+        shared.set("early", (value, time.time() + 1, 10**6))
+        self.assertEqual(get_or_compute("early", lambda: "new", timeout=60), "new")
+        self.assertEqual(get_or_compute("early", lambda: "newer", timeout=60), "new")
+
+
+class AutocompleteTest(TestCase):
+    """
+    ユーザ名の補完に対するテスト
+    """
+
+    def setUp(self):
+        username_index.clear()
+        self.addCleanup(username_index.clear)
+        self.users = {}
+        for username in ["alice", "Alan", "albert", "bob"]:
+            user = Account.objects.create_user(
+                email=f"{username}@example.com", username=username, password="pass"
+            )
+            Profile.objects.create(user=user)
+            self.users[username] = user
+        FollowConnection.objects.create(
+            follower=self.users["bob"], followee=self.users["albert"]
+        )
+        self.client.force_login(self.users["bob"])
+        self.path = reverse("account:autocomplete")
+
+    def usernames(self, query):
+        response = self.client.get(path=self.path, data={"q": query})
+        self.assertEqual(response.status_code, 200)
+        return [result["username"] for result in response.json()["results"]]
+
+    def test_rank_by_followers(self):
+        """
+        接頭辞が一致するユーザがフォロワーの多い順に並ぶ場合
+        """
+
+        self.assertEqual(self.usernames("AL"), ["albert", "Alan", "alice"])
+        self.assertEqual(self.usernames("@ali"), ["alice"])
+        self.assertEqual(self.usernames("c"), [])
+
+        FollowConnection.objects.create(
+            follower=self.users["bob"], followee=self.users["alice"]
+        )
+        FollowConnection.objects.create(
+            follower=self.users["albert"], followee=self.users["alice"]
+        )
+        self.assertEqual(self.usernames("al"), ["alice", "albert", "Alan"])
+
+    def test_no_queries(self):
+        """
+        読み込んだ後はデータベースを使わずに補完する場合
+        """
+
+        username_index.search("a")
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                username_index.search("a"),
+                [
+                    (self.users["albert"].pk, "albert"),
+                    (self.users["Alan"].pk, "Alan"),
+                    (self.users["alice"].pk, "alice"),
+                ],
+            )
+
+    def test_register(self):
+        """
+        登録したユーザがすぐに補完される場合
+        """
+
+        self.usernames("a")
+        self.client.post(
+            reverse("account:register"),
+            data={
+                "email": "alpha@example.com",
+                "username": "alpha",
+                "password1": "testpassword",
+                "password2": "testpassword",
+            },
+        )
+        alpha = Account.objects.get(username="alpha")
+        with self.assertNumQueries(0):
+            self.assertEqual(username_index.search("alp"), [(alpha.pk, "alpha")])
+        self.assertEqual(self.usernames("alp"), ["alpha"])
+
+        self.users["alice"].delete()
+        self.assertEqual(self.usernames("ali"), [])
+
+    def test_memoized_prefix(self):
+        """
+        候補の多い接頭辞の上位の結果を記憶し，変更を反映する場合
+        """
+
+        index = UsernameIndex()
+        index.load()
+        with mock.patch("account.autocomplete.SCAN_LIMIT", 1):
+            index.search("al")
+        self.assertIn("al", index._top)
+
+        index._add(1000, "alz", follower_num=5)
+        index.update_followers(self.users["Alan"].pk, 2)
+        self.assertEqual(
+            [username for _, username in index.search("al")],
+            ["alz", "Alan", "albert", "alice"],
+        )
+        index.update_followers(self.users["Alan"].pk, -2)
+        self.assertNotIn("al", index._top)
+        self.assertEqual(
+            [username for _, username in index.search("al")],
+            ["alz", "albert", "Alan", "alice"],
+        )
+
+    def test_refresh(self):
+        """
+        他のプロセスで登録されたアカウントを一定時間ごとに取り込む場合
+        """
+
+        clock = [0.0]
+        index = UsernameIndex(clock=lambda: clock[0])
+        with self.settings(AUTOCOMPLETE_REFRESH_INTERVAL=60):
+            index.search("car")
+            carol = Account.objects.create_user(
+                email="carol@example.com", username="carol", password="pass"
+            )
+            self.assertEqual(index.search("car"), [])
+            clock[0] = 60
+            self.assertEqual(index.search("car"), [(carol.pk, "carol")])
+
+    def test_rebuild(self):
+        """
+        他のプロセスでのフォロワー数の変化や削除を一定時間ごとに反映する場合
+        """
+
+        clock = [0.0]
+        index = UsernameIndex(clock=lambda: clock[0])
+        with self.settings(
+            AUTOCOMPLETE_REFRESH_INTERVAL=60, AUTOCOMPLETE_REBUILD_INTERVAL=600
+        ):
+            self.assertEqual(
+                [username for _, username in index.search("al")],
+                ["albert", "Alan", "alice"],
+            )
+            # 別の索引（他のプロセス）での変更はこの索引には通知されない
+            for follower in ["bob", "albert"]:
+                FollowConnection.objects.create(
+                    follower=self.users[follower], followee=self.users["alice"]
+                )
+            self.users["Alan"].delete()
+
+            clock[0] = 60
+            self.assertEqual(
+                [username for _, username in index.search("al")],
+                ["albert", "Alan", "alice"],
+            )
+            clock[0] = 600
+            self.assertEqual(
+                [username for _, username in index.search("al")],
+                ["alice", "albert"],
+            )
+
+    def test_load_once(self):
+        """
+        同時に検索しても全件の読み込みは1回だけ行う場合
+        """
+
+        index = UsernameIndex()
+        loads = []
+
+        def load():
+            loads.append(1)
+            time.sleep(0.05)
+            index._loaded_at = index.clock()
+
+        with mock.patch.object(index, "load", side_effect=load):
+            threads = [
+                threading.Thread(target=index.search, args=("a",)) for _ in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(loads), 1)
+
+
+class UsernameAvailabilityTest(TestCase):
+    """
+    ユーザ名が使えるかの確認に対するテスト
+    """
+
+    def setUp(self):
+        username_index.clear()
+        self.addCleanup(username_index.clear)
+        Account.objects.create_user(
+            email="sample@example.com", username="sample", password="instance1"
+        )
+        username_index.load()
+        self.path = reverse("account:username_availability")
+
+    def check(self, username):
+        response = self.client.get(self.path, {"username": username})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_available(self):
+        """
+        使われていないユーザ名をデータベースを使わずに使えると答える場合
+        """
+
+        with self.assertNumQueries(0):
+            result = self.check("Sample")
+        self.assertTrue(result["available"])
+        self.assertEqual(result["message"], "このユーザー名は使用できます．")
+
+    def test_registered_elsewhere(self):
+        """
+        他のプロセスで登録されたユーザ名を取り込んだ後に使えないと答える場合
+        """
+
+        with mock.patch.object(username_index, "add"):
+            Account.objects.create_user(
+                email="other@example.com", username="other", password="instance1"
+            )
+        self.assertTrue(self.check("other")["available"])
+        with self.settings(AUTOCOMPLETE_REFRESH_INTERVAL=0):
+            self.assertFalse(self.check("other")["available"])
+
+    def test_not_loaded(self):
+        """
+        索引を読み込んでいないプロセスでは最初に確かめる際に読み込む場合
+        """
+
+        username_index.clear()
+        with self.assertNumQueries(1):
+            self.assertFalse(self.check("sample")["available"])
+        self.assertTrue(username_index.loaded)
+        with self.assertNumQueries(0):
+            self.assertTrue(self.check("other")["available"])
+
+    def test_taken(self):
+        """
+        使われているユーザ名をデータベースを使わずに使えないと答える場合
+        """
+
+        with self.assertNumQueries(0):
+            result = self.check("sample")
+        self.assertFalse(result["available"])
+        self.assertEqual(result["message"], "このユーザー名は既に使われています．")
+
+    def test_registered_and_deleted(self):
+        """
+        登録・削除したアカウントが反映される場合
+        """
+
+        self.check("other")
+        self.client.post(
+            reverse("account:register"),
+            data={
+                "email": "new@example.com",
+                "username": "new",
+                "password1": "Instance-password1",
+                "password2": "Instance-password1",
+            },
+        )
+        self.assertFalse(self.check("new")["available"])
+
+        Account.objects.get(username="sample").delete()
+        self.assertTrue(self.check("sample")["available"])
+
+        # 他のプロセスでの削除は索引を読み込み直した後に反映される
+        with mock.patch.object(username_index, "remove"):
+            Account.objects.filter(username="new").delete()
+        self.assertFalse(self.check("new")["available"])
+        with self.settings(
+            AUTOCOMPLETE_REFRESH_INTERVAL=0, AUTOCOMPLETE_REBUILD_INTERVAL=0
+        ):
+            self.assertTrue(self.check("new")["available"])
+
+    def test_invalid(self):
+        """
+        ユーザ名として使えない文字列の場合
+        """
+
+        self.assertFalse(self.check("")["available"])
+        self.assertFalse(self.check("a" * 31)["available"])
+        result = self.check("bad name")
+        self.assertFalse(result["available"])
+        self.assertTrue(result["message"])
+
+    def test_register_page(self):
+        """
+        登録ページに確認用のURLが含まれる場合
+        """
+
+        response = self.client.get(reverse("account:register"))
+        self.assertContains(response, self.path)
+        self.assertContains(response, 'id="username_availability"')
+
+
+class AsyncReadViewTest(TransactionTestCase):
+    """
+    非同期の閲覧用ビューに対するテスト
+
+    クエリを別のスレッド（別の接続）で実行するため TransactionTestCase を使う．
+    """
+
+    def setUp(self):
+        self.users = []
+        for i in range(1, 4):
+            user = Account.objects.create_user(
+                email=f"sample{i}@example.com",
+                username=f"sample{i}",
+                password=f"instance{i}",
+            )
+            Profile.objects.create(user=user, profile=f"introduction{i}")
+            self.users.append(user)
+        FollowConnection.objects.create(follower=self.users[1], followee=self.users[0])
+        FollowConnection.objects.create(follower=self.users[0], followee=self.users[2])
+        Tweet.objects.create(user=self.users[0], content="async tweet")
+        self.factory = AsyncRequestFactory()
+
+    def request(self, view, path, *args, **extra):
+        request = self.factory.get(path)
+        request.META.update(extra)
+        request.resolver_match = resolve(path)
+        request.user = self.users[1]
+        request.session = {}
+        return async_to_sync(view)(request, *args)
+
+    def test_home(self):
+        """
+        ホームを非同期のビューで表示する場合
+        """
+
+        response = self.request(async_views.home_view, reverse("account:home"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "async tweet")
+        self.assertContains(response, "introduction2")
+
+    def test_account_detail(self):
+        """
+        アカウントの詳細を非同期のビューで表示し，ETagで304を返す場合
+        """
+
+        path = reverse("account:account_detail", args=[self.users[0].pk])
+        response = self.request(async_views.account_detail_view, path, self.users[0].pk)
+        self.assertContains(response, "async tweet")
+        self.assertContains(response, "introduction1")
+        self.assertIn("private", response["Cache-Control"])
+
+        response = self.request(
+            async_views.account_detail_view,
+            path,
+            self.users[0].pk,
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_connections(self):
+        """
+        フォロー・フォロワーの一覧を非同期のビューで表示する場合
+        """
+
+        account_id = self.users[0].pk
+        response = self.request(
+            async_views.account_followers_view,
+            reverse("account:followers", args=[account_id]),
+            account_id,
+        )
+        self.assertContains(response, "sample2")
+        response = self.request(
+            async_views.account_followings_view,
+            reverse("account:followings", args=[account_id]),
+            account_id,
+        )
+        self.assertContains(response, "sample3")
+
+        with self.assertRaises(Http404):
+            self.request(
+                async_views.account_followers_view,
+                reverse("account:followers", args=[0]),
+                0,
+            )
+
+    def test_benchmark_command(self):
+        """
+        同期版と非同期版のスループットを比較するコマンドを実行する場合
+        """
+
+        out = StringIO()
+        call_command(
+            "bench_async_views",
+            username="sample1",
+            concurrency=[1, 2],
+            requests=2,
+            stdout=out,
+        )
+        self.assertEqual(len(out.getvalue().splitlines()), 1 + 5 * 2)
+
+    def test_login_required(self):
+        """
+        ログインしていない場合にログインページへ移動する場合
+        """
+
+        request = self.factory.get(reverse("account:home"))
+        request.user = AnonymousUser()
+        response = async_to_sync(async_views.home_view)(request)
+        self.assertEqual(response.status_code, 302)
+
+
+class AsyncMiddlewareTest(SimpleTestCase):
+    """
+    ASGI で非同期のリクエストがミドルウェアで直列にならないことのテスト
+    """
+
+    def test_async_capable(self):
+        """
+        すべてのミドルウェアが同期・非同期の両方に対応している場合
+        """
+
+        for path in settings.MIDDLEWARE:
+            self.assertTrue(import_string(path).async_capable, path)
+
+    def test_concurrent_requests(self):
+        """
+        非同期のビューへの同時のリクエストが並行して処理される場合
+        """
+
+        async def slow_view(handler, request):
+            await asyncio.sleep(0.3)
+            return HttpResponse()
+
+        with mock.patch.object(BaseHandler, "_get_response_async", slow_view):
+            handler = BaseHandler()
+            handler.load_middleware(is_async=True)
+        factory = AsyncRequestFactory()
+
+        async def run():
+            return await asyncio.gather(
+                *(handler._middleware_chain(factory.get("/")) for _ in range(5))
+            )
+
+        start = time.perf_counter()
+        responses = async_to_sync(run)()
+        self.assertEqual([r.status_code for r in responses], [200] * 5)
+        # 直列に処理されると 1.5 秒かかる
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+
+class QueryInstrumentationTest(TestCase):
+    """
+    クエリの記録とN+1の検出に対するテスト
+    """
+
+    def setUp(self):
+        self.user = Account.objects.create_user(
+            email="sample1@example.com", username="sample1", password="instance1"
+        )
+        Profile.objects.create(user=self.user)
+        self.client.force_login(self.user)
+
+    def test_query_shape(self):
+        """
+        パラメータの数だけが異なるクエリが同じ形になる場合
+        """
+
+        self.assertEqual(
+            query_shape('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s) LIMIT 21'),
+            query_shape('SELECT * FROM "t" WHERE "id" IN (%s)  LIMIT 1'),
+        )
+
+    def test_collect(self):
+        """
+        ブロック内のクエリを数え，繰り返されたクエリを検出する場合
+        """
+
+        with collect_queries() as collector:
+            for _ in range(5):
+                Account.objects.filter(pk=self.user.pk).first()
+            Profile.objects.count()
+        self.assertEqual(collector.count, 6)
+        self.assertIsNotNone(collector.slowest_sql)
+        with self.settings(SQL_N_PLUS_ONE_THRESHOLD=5):
+            repeated = collector.repeated_shapes()
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(repeated[0][1], 5)
+
+        # ブロックの外では記録しない
+        Account.objects.count()
+        self.assertEqual(collector.count, 6)
+
+    def test_middleware(self):
+        """
+        記録したリクエストに Server-Timing ヘッダが付き，N+1が警告される場合
+        """
+
+        for i in range(3):
+            Tweet.objects.create(user=self.user, content=f"tweet {i}")
+
+        def n_plus_one_timeline(user_id, before=None):
+            # ツイートごとに投稿者を読み込む（N+1）タイムライン
+            tweet_list = list(Tweet.objects.order_by("-id"))
+            for tweet in tweet_list:
+                tweet.user
+            return {"tweet_list": tweet_list}
+
+        with self.settings(
+            SQL_INSTRUMENTATION_SAMPLE_RATE=1.0, SQL_N_PLUS_ONE_THRESHOLD=3
+        ), mock.patch("account.views.home_timeline", n_plus_one_timeline):
+            with self.assertLogs("twitter_clone.instrumentation", "WARNING") as logs:
+                response = self.client.get(reverse("account:home"))
+        self.assertIn("db;dur=", response["Server-Timing"])
+        self.assertIn("db-repeated", response["Server-Timing"])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["view"], "account:home")
+        self.assertGreaterEqual(record["queries"], 3)
+
+    def test_sampling_off(self):
+        """
+        記録しない設定の場合にヘッダを付けない場合
+        """
+
+        response = self.client.get(reverse("account:home"))
+        self.assertFalse(response.has_header("Server-Timing"))
+
+
+class ProfilingTest(TestCase):
+    """
+    リクエストのプロファイルと遅いリクエストのログに対するテスト
+    """
+
+    def setUp(self):
+        self.user = Account.objects.create_user(
+            email="sample1@example.com", username="sample1", password="instance1"
+        )
+        Profile.objects.create(user=self.user)
+        self.client.force_login(self.user)
+
+    def test_profile_staff(self):
+        """
+        スタッフがクエリパラメータやヘッダでプロファイルを要求した場合
+        """
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse("account:home"), {"_profile": "1"})
+        self.assertTemplateUsed(response, "account/home.html")
+        self.assertEqual(response["Content-Type"], "text/plain; charset=utf-8")
+        self.assertEqual(response["X-Profile-Status"], "200")
+        self.assertIn("queries", response["X-Profile-Summary"])
+        self.assertContains(response, "-> 200")
+        self.assertContains(response, "home_view")
+
+        response = self.client.get(
+            reverse("account:account_detail", kwargs={"account_id": self.user.pk}),
+            HTTP_X_PROFILE="tottime",
+        )
+        self.assertContains(response, "Ordered by: internal time")
+
+        # リダイレクトも本来のステータスコードをヘッダに付けて結果を返す
+        response = self.client.post(
+            reverse("account:home") + "?_profile=1", {"content": "profiled"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Profile-Status"], "302")
+
+    def test_profile_not_staff(self):
+        """
+        スタッフ以外がプロファイルを要求しても通常のレスポンスを返す場合
+        """
+
+        response = self.client.get(reverse("account:home"), {"_profile": "1"})
+        self.assertTemplateUsed(response, "account/home.html")
+        self.assertFalse(response.has_header("X-Profile-Summary"))
+
+    def test_slow_request_log(self):
+        """
+        しきい値を超えたリクエストのクエリとスタックをログに出力する場合
+        """
+
+        def slow_unread_count(user_id):
+            time.sleep(0.3)
+            return 0
+
+        with self.settings(SLOW_REQUEST_THRESHOLD=0.1), mock.patch(
+            "account.views.get_unread_count", slow_unread_count
+        ):
+            with self.assertLogs("twitter_clone.profiling", "WARNING") as logs:
+                self.client.get(reverse("account:home"))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["view"], "account:home")
+        self.assertGreaterEqual(record["duration_ms"], 300)
+        self.assertEqual(len(record["query_list"]), record["queries"])
+        self.assertIn("slow_unread_count", record["stack"])
+
+    def test_slow_async_view(self):
+        """
+        非同期のビューではイベントループのタスクとスレッドプールのスタックを記録する場合
+        """
+
+        async def slow_async_part():
+            await asyncio.sleep(0.3)
+
+        def slow_worker_part():
+            time.sleep(0.3)
+
+        async def async_view(request):
+            watch_task()
+            await slow_async_part()
+            return HttpResponse()
+
+        async def gather_view(request):
+            watch_task()
+            await gather_queries(slow_worker_part)
+            return HttpResponse()
+
+        for view, name in [
+            (async_view, "slow_async_part"),
+            (gather_view, "slow_worker_part"),
+        ]:
+            middleware = SlowRequestMiddleware(async_to_sync(view))
+            with self.settings(SLOW_REQUEST_THRESHOLD=0.1):
+                with self.assertLogs("twitter_clone.profiling", "WARNING") as logs:
+                    middleware(RequestFactory().get("/slow"))
+            stack = json.loads(logs.records[0].getMessage())["stack"]
+            self.assertIn(name, stack)
+
+    def test_fast_request(self):
+        """
+        しきい値を超えないリクエストは記録しない場合
+        """
+
+        with self.assertNoLogs("twitter_clone.profiling", "WARNING"):
+            self.client.get(reverse("account:home"))
+
+
+class MetricsTest(TestCase):
+    """
+    /metrics とプロセスごとのメトリクスのファイルに対するテスト
+    """
+
+    def setUp(self):
+        metrics.clear()
+        self.addCleanup(metrics.clear)
+        self.user = Account.objects.create_user(
+            email="sample1@example.com", username="sample1", password="instance1"
+        )
+        Profile.objects.create(user=self.user)
+        self.client.force_login(self.user)
+
+    def test_process_file(self):
+        """
+        値がファイルに保存され，容量を超えても書き込める場合
+        """
+
+        counter = metrics.Counter("test_file", "test")
+        self.addCleanup(metrics._registry.pop, "test_file")
+        for i in range(3000):
+            counter.inc(label=str(i))
+        counter.inc(2, label="0")
+        values = metrics.collect()
+        self.assertEqual(values[("test_file_total", (("label", "0"),))], 3)
+        self.assertEqual(values[("test_file_total", (("label", "2999"),))], 1)
+
+    def test_aggregate_processes(self):
+        """
+        複数のプロセスの値を合計し，停止したプロセスのゲージは含めない場合
+        """
+
+        counter = metrics.Counter("test_processes", "test")
+        gauge = metrics.Gauge("test_processes_gauge", "test")
+        self.addCleanup(metrics._registry.pop, "test_processes")
+        self.addCleanup(metrics._registry.pop, "test_processes_gauge")
+        counter.inc()
+        gauge.inc()
+
+        def child():
+            counter.inc(5)
+            gauge.inc(10)
+
+        process = multiprocessing.get_context("fork").Process(target=child)
+        process.start()
+        process.join()
+        values = metrics.collect()
+        self.assertEqual(values[("test_processes_total", ())], 6)
+        self.assertEqual(values[("test_processes_gauge", ())], 1)
+
+    def test_endpoint(self):
+        """
+        リクエストのレイテンシ・クエリ・キャッシュ・ジョブキューのメトリクスを返す場合
+        """
+
+        self.client.get(reverse("account:home"))
+        self.client.get(reverse("account:home"))
+        with self.settings(METRICS_TOKEN="secret"):
+            response = self.client.get(
+                reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret"
+            )
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",view="account:home"} 2',
+            body,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{method="GET",view="account:home",'
+            'le="+Inf"} 2',
+            body,
+        )
+        self.assertIn('db_queries_per_request_count{view="account:home"} 2', body)
+        self.assertIn('cache_requests_total{cache="default",prefix="profile"', body)
+        self.assertIn('jobqueue_jobs{status="queued"} 0', body)
+        self.assertIn("http_requests_in_flight 1", body)
+
+    def test_forbidden(self):
+        """
+        トークンを持たないスタッフ以外がアクセスした場合（ローカルからでも拒否する）
+        """
+
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="127.0.0.1")
+        self.assertEqual(response.status_code, 403)
+        with self.settings(METRICS_TOKEN="secret"):
+            response = self.client.get(
+                reverse("metrics"), HTTP_AUTHORIZATION="Bearer wrong"
+            )
+        self.assertEqual(response.status_code, 403)
+        with self.settings(METRICS_TOKEN=None):
+            response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer ")
+        self.assertEqual(response.status_code, 403)
+
+    def test_staff(self):
+        """
+        スタッフがアクセスした場合
+        """
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
+
+
+class AccountQueryBudgetTest(QueryBudgetMixin, TestCase):
+    """
+    account.urls の各ページのクエリの数と読み込む行数に対するテスト
+
+    1ページより多いデータを用意し，データを増やしてもクエリの数が変わらないことを確かめる．
+    """
+
+    def setUp(self):
+        username_index.clear()
+        self.addCleanup(username_index.clear)
+        trend_counter.reset()
+        self.addCleanup(trend_counter.reset)
+        self.user = Account.objects.create_user(
+            email="sample@example.com", username="sample", password="instance1"
+        )
+        Profile.objects.create(user=self.user)
+        self.other = self.seed(ACCOUNT_PAGE_SIZE + 5)
+        self.client.force_login(self.user)
+
+    def seed(self, n):
+        """
+        ユーザをフォローし，フォローされ，ツイートがいいねされたアカウントを n 件作る
+        """
+
+        start = Account.objects.count()
+        for i in range(start, start + n):
+            account = Account.objects.create_user(
+                email=f"user{i}@example.com", username=f"user{i}", password=None
+            )
+            Profile.objects.create(user=account, profile=f"profile {i}")
+            FollowConnection.objects.create(follower=account, followee=self.user)
+            FollowConnection.objects.create(follower=self.user, followee=account)
+            tweet = Tweet.objects.create(user=account, content=f"#tag @sample {i}")
+            FavoriteConnection.objects.create(
+                favorite_account=self.user, favorited_tweet=tweet
+            )
+            Tweet.objects.create(user=self.user, content=f"tweet {i}")
+        return account
+
+    def get(self, name, *args, **data):
+        return lambda: self.client.get(reverse(name, args=args), data)
+
+    def post(self, name, *args, **data):
+        return lambda: self.client.post(reverse(name, args=args), data)
+
+    def grow(self):
+        self.seed(10)
+
+    def test_start(self):
+        self.assertQueryBudget(self.get("account:start"), 2, rows=2)
+
+    def test_register(self):
+        self.client.logout()
+        self.assertQueryBudget(self.get("account:register"), 0, rows=0)
+        response = self.assertQueryBudget(
+            self.post(
+                "account:register",
+                email="new@example.com",
+                username="new",
+                password1="Instance-password1",
+                password2="Instance-password1",
+            ),
+            # ユーザ名の重複の確認・アカウントとプロフィールの追加（とテストでのセーブポイント）
+            5,
+            rows=0,
+        )
+        self.assertRedirects(response, reverse("account:complete"))
+
+    def test_complete(self):
+        self.assertQueryBudget(self.get("account:complete"), 2, rows=2)
+
+    def test_login(self):
+        self.client.logout()
+        self.assertQueryBudget(self.get("account:login"), 0, rows=0)
+        response = self.assertQueryBudget(
+            self.post("account:login", username="sample", password="instance1"),
+            9,
+            rows=2,
+        )
+        self.assertRedirects(response, "/home/")
+
+    def test_logout(self):
+        self.assertQueryBudget(self.get("account:logout"), 4, rows=3)
+
+    def test_home(self):
+        # セッション・ユーザ・プロフィール・1ページ分のツイートと投稿者
+        rows = 3 + 2 * HOME_PAGE_SIZE
+        self.assertQueryBudget(self.get("account:home"), 7, rows=rows)
+        self.assertQueriesDoNotScale(self.get("account:home"), self.grow)
+        self.assertQueryBudget(
+            self.get("account:home", before=self.other.tweet.get().pk), 7, rows=rows
+        )
+
+    def test_home_post(self):
+        self.assertQueryBudget(
+            self.post("account:home", content="#tag @user1"), 8, rows=2
+        )
+
+    def test_autocomplete(self):
+        username_index.load()
+        self.assertQueryBudget(self.get("account:autocomplete", q="user"), 2, rows=2)
+        self.assertQueriesDoNotScale(
+            self.get("account:autocomplete", q="user"), self.grow
+        )
+
+    def test_username_availability(self):
+        self.client.logout()
+        username_index.load()
+        self.assertQueryBudget(
+            self.get("account:username_availability", username="new"), 0, rows=0
+        )
+        self.assertQueryBudget(
+            self.get("account:username_availability", username="user1"), 0, rows=0
+        )
+        self.assertQueriesDoNotScale(
+            self.get("account:username_availability", username="new"), self.grow
+        )
+
+    def test_edit_profile(self):
+        self.assertQueryBudget(self.get("account:edit_profile"), 3, rows=3)
+        self.assertQueryBudget(
+            self.post("account:edit_profile", profile="updated"), 4, rows=3
+        )
+
+    def test_account_detail(self):
+        # セッション・ユーザ・アカウントとプロフィール・1ページ分のツイートと
+        # いいね（とそのツイートと投稿者）
+        rows = 4 + 4 * ACCOUNT_PAGE_SIZE + 1
+        for account, queries in ((self.user, 11), (self.other, 9)):
+            self.assertQueryBudget(
+                self.get("account:account_detail", account.pk), queries, rows=rows
+            )
+            self.assertQueriesDoNotScale(
+                self.get("account:account_detail", account.pk), self.grow
+            )
+        self.assertQueryBudget(
+            self.get(
+                "account:account_detail", self.user.pk, before=self.user.tweet.last().pk
+            ),
+            11,
+            rows=rows,
+        )
+
+    def test_follow(self):
+        FollowConnection.objects.filter(
+            follower=self.user, followee=self.other
+        ).delete()
+        self.assertQueryBudget(self.post("account:follow", self.other.pk), 10, rows=3)
+        self.assertQueryBudget(self.post("account:unfollow", self.other.pk), 5, rows=4)
+
+    def test_followings(self):
+        # セッション・ユーザ・ETag用の1ページ分のフォロー・アカウント・
+        # 1ページ分のフォローとそのアカウントとプロフィール
+        rows = 3 + 4 * ACCOUNT_PAGE_SIZE
+        self.assertQueryBudget(
+            self.get("account:followings", self.user.pk), 5, rows=rows
+        )
+        self.assertQueriesDoNotScale(
+            self.get("account:followings", self.user.pk), self.grow
+        )
+
+    def test_followers(self):
+        rows = 3 + 4 * ACCOUNT_PAGE_SIZE
+        self.assertQueryBudget(
+            self.get("account:followers", self.user.pk), 5, rows=rows
+        )
+        self.assertQueriesDoNotScale(
+            self.get("account:followers", self.user.pk), self.grow
+        )
+
+
+class SeedDataTest(TestCase):
+    """
+    負荷試験用のデータを作るコマンドに対するテスト
+    """
+
+    def seed(self, prefix, seed=1):
+        call_command(
+            "seed_data",
+            accounts=40,
+            tweets_per_account=3,
+            follows_per_account=5,
+            favorites_per_account=5,
+            seed=seed,
+            prefix=prefix,
+            batch_size=7,
+            stdout=StringIO(),
+        )
+        accounts = Account.objects.filter(username__startswith=prefix)
+        index = {
+            pk: username[len(prefix) :]
+            for pk, username in accounts.values_list("pk", "username")
+        }
+        follows = {
+            (index[follower_id], index[followee_id])
+            for follower_id, followee_id in FollowConnection.objects.filter(
+                follower__in=accounts
+            ).values_list("follower_id", "followee_id")
+        }
+        tweets = sorted(
+            (index[user_id], content[len(prefix) :])
+            for user_id, content in Tweet.objects.filter(user__in=accounts).values_list(
+                "user_id", "content"
+            )
+        )
+        return follows, tweets
+
+    def test_seed(self):
+        """
+        アカウント・プロフィール・ツイート・フォロー・いいねが作られる場合
+        """
+
+        follows, tweets = self.seed("a")
+        self.assertEqual(Account.objects.count(), 40)
+        self.assertEqual(Profile.objects.count(), 40)
+        self.assertEqual(len(tweets), 120)
+        self.assertTrue(follows)
+        self.assertTrue(FavoriteConnection.objects.exists())
+        self.assertFalse(any(follower == followee for follower, followee in follows))
+        # パスワードのハッシュは1回だけ計算される
+        self.assertEqual(
+            len(set(Account.objects.values_list("password", flat=True))), 1
+        )
+        self.assertTrue(Account.objects.get(username="a0").check_password("password"))
+
+    def test_deterministic(self):
+        """
+        同じシードからは同じデータが，異なるシードからは異なるデータが作られる場合
+        """
+
+        self.assertEqual(self.seed("a"), self.seed("b"))
+        self.assertNotEqual(self.seed("c"), self.seed("d", seed=2))
+
+    def test_existing_prefix(self):
+        """
+        同じ接頭辞のアカウントがすでにある場合
+        """
+
+        self.seed("a")
+        with self.assertRaises(CommandError):
+            self.seed("a")
+
+    def test_zipf(self):
+        """
+        先頭の要素ほど多く選ばれる場合
+        """
+
+        sampler = ZipfSampler(list(range(100)), 1.1, random.Random(0))
+        counts = Counter(sampler.choice() for _ in range(10000))
+        self.assertGreater(counts[0], counts[9] * 5)
+        self.assertGreater(counts[0], 10000 * 0.1)
+        self.assertEqual(len(sampler.sample(10)), 10)
+        self.assertNotIn(0, sampler.sample(10, exclude=0))
+
+
+class BenchTest(TestCase):
+    """
+    各ビューを計測するコマンドに対するテスト
+    """
+
+    def setUp(self):
+        call_command(
+            "seed_data",
+            accounts=5,
+            tweets_per_account=2,
+            favorites_per_account=0,
+            follows_per_account=0,
+            stdout=StringIO(),
+        )
+
+    def test_bench(self):
+        """
+        全てのビューを計測し，結果をJSONに保存する場合
+        """
+
+        with tempfile.NamedTemporaryFile(suffix=".json") as f:
+            out = StringIO()
+            call_command(
+                "bench",
+                username="seed0",
+                requests=3,
+                warmup=1,
+                output=f.name,
+                stdout=out,
+            )
+            report = json.load(f)
+
+        self.assertIn("req/s", out.getvalue())
+        self.assertEqual(report["requests"], 3)
+        results = report["runs"][0]["results"]
+        self.assertEqual(
+            set(results),
+            set(BENCH_VIEWS) | {"unfavorite", "unfollow"},
+        )
+        for name, result in results.items():
+            self.assertEqual(result["requests"], 3, name)
+            self.assertEqual(result["errors"], 0, name)
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+        self.assertGreater(results["home"]["queries_per_request"], 0)
+        # いいねとフォローは元の状態に戻る
+        self.assertFalse(FavoriteConnection.objects.exists())
+        self.assertFalse(FollowConnection.objects.exists())
+
+    def test_unknown_user(self):
+        """
+        存在しないユーザを指定した場合
+        """
+
+        with self.assertRaises(CommandError):
+            call_command("bench", username="unknown", stdout=StringIO())
+
+    def test_not_enough_viewers(self):
+        """
+        同時接続数より閲覧するアカウントが少ない場合
+        """
+
+        with self.assertRaises(CommandError):
+            call_command(
+                "bench", username="seed0", concurrency=[1, 5], stdout=StringIO()
+            )
+        with self.assertRaises(ValueError):
+            Benchmark(list(Account.objects.all()[:2]), None, None, concurrency=3)
+
+    def test_without_tweets(self):
+        """
+        ツイートがない場合にツイートを使うビューを除いて計測する場合
+        """
+
+        Tweet.all_objects.all().delete()
+        out = StringIO()
+        call_command(
+            "bench",
+            username="seed0",
+            requests=2,
+            warmup=0,
+            views=["home", "followers"],
+            stdout=out,
+        )
+        self.assertIn("followers", out.getvalue())
+
+    def test_percentile(self):
+        """
+        最近傍順位法でパーセンタイルを求める場合
+        """
+
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([3], 95), 3)
+        self.assertIsNone(percentile([], 50))
+
+
+class ImportAccountsTest(TestCase):
+    """
+    CSVからアカウントをまとめて登録するコマンドに対するテスト
+    """
+
+    def write_csv(self, rows):
+        f = tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False)
+        self.addCleanup(os.remove, f.name)
+        with f:
+            f.write("username,email,password,profile\n")
+            for row in rows:
+                f.write(",".join(row) + "\n")
+        return f.name
+
+    def test_import(self):
+        """
+        アカウントとプロフィールが登録され，不正・重複・登録済みの行はスキップされる場合
+        """
+
+        Account.objects.create_user(
+            email="sample@example.com", username="sample", password="instance1"
+        )
+        path = self.write_csv(
+            [
+                ("user0", "user0@example.com", "password0", "hello"),
+                ("user1", "user1@example.com", "password1", ""),
+                ("user2", "user2@example.com", "", ""),
+                ("user0", "other@example.com", "password0", ""),
+                ("sample", "sample@example.com", "password", ""),
+                ("bad name", "bad@example.com", "password", ""),
+                ("user3", "not-an-email", "password", ""),
+            ]
+        )
+        out = StringIO()
+        call_command("import_accounts", path, batch_size=2, workers=2, stdout=out)
+
+        self.assertIn("3 件のアカウントを登録しました", out.getvalue())
+        self.assertIn("invalid=2, duplicate=1, exists=1", out.getvalue())
+        user0 = Account.objects.get(username="user0")
+        self.assertTrue(user0.check_password("password0"))
+        self.assertEqual(user0.profile.profile, "hello")
+        self.assertTrue(
+            Account.objects.get(username="user1").check_password("password1")
+        )
+        self.assertFalse(Account.objects.get(username="user2").has_usable_password())
+        self.assertEqual(Profile.objects.count(), 3)
+
+    def test_registered_during_import(self):
+        """
+        ハッシュを計算している間に同じユーザ名が登録された場合に，その行を除いて登録する場合
+        """
+
+        username_index.load()
+        self.addCleanup(username_index.clear)
+        importer = AccountImporter()
+        rows = [
+            {"username": f"user{i}", "email": f"user{i}@example.com", "profile": ""}
+            for i in range(3)
+        ]
+        Account.objects.create_user(
+            email="other@example.com", username="user1", password="instance1"
+        )
+        importer._insert(rows, ["!", "!", "!"])
+
+        self.assertEqual(importer.counts["created"], 2)
+        self.assertEqual(importer.counts["exists"], 1)
+        self.assertEqual(
+            Account.objects.get(username="user1").email, "other@example.com"
+        )
+        self.assertEqual(Profile.objects.count(), 2)
+        # 登録したアカウントはこのプロセスの索引にも追加される
+        with mock.patch.object(username_index, "refresh"):
+            self.assertTrue(username_index.contains("user0"))
+            self.assertTrue(username_index.contains("user2"))
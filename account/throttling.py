@@ -0,0 +1,106 @@
+import hashlib
+import ipaddress
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class WindowCounter:
+    """
+    キャッシュ（CACHES["throttle"]）に保存する固定ウィンドウのカウンタ（全ワーカーで共有する）
+
+    window 秒ごとの区間で limit 回まで許可する．区間ごとのキーを cache.add で作り，
+    cache.incr で数えるため，同時のリクエストでも上限を超えて許可しない
+    （区間の境目をまたぐと短時間に最大 2 * limit 回まで許可することがある）．
+    """
+
+    def __init__(self, name, limit, window, clock=time.time):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.clock = clock
+
+    def _key(self, key, now):
+        return f"throttle:{self.name}:{key}:{int(now // self.window)}"
+
+    def consume(self, key, tokens=1):
+        """
+        許可する場合は None を，上限を超えた場合は次の区間までの秒数を返す
+        """
+
+        cache = caches["throttle"]
+        now = self.clock()
+        cache_key = self._key(key, now)
+        # 区間が終われば消えてよい（時計のずれを考えて1区間分は残す）
+        cache.add(cache_key, 0, timeout=math.ceil(self.window * 2))
+        try:
+            count = cache.incr(cache_key, tokens)
+        except ValueError:
+            # add と incr の間に期限切れで消えた場合
+            cache.add(cache_key, tokens, timeout=math.ceil(self.window * 2))
+            count = tokens
+        if count > self.limit:
+            return max(1, math.ceil(self.window - now % self.window))
+        return None
+
+    def reset(self, key):
+        caches["throttle"].delete(self._key(key, self.clock()))
+
+
+def _username_key(username):
+    # キャッシュのキーに使えない文字を含むことがあるためハッシュにする
+    return hashlib.sha256(username.casefold().encode()).hexdigest()
+
+
+def _is_trusted_proxy(address):
+    try:
+        address = ipaddress.ip_address(address.strip())
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(proxy, strict=False)
+        for proxy in settings.LOGIN_THROTTLE_TRUSTED_PROXIES
+    )
+
+
+def client_ip(request):
+    """
+    リクエストの送信元のIPアドレスを返す
+
+    REMOTE_ADDR が信頼できるプロキシの場合だけ X-Forwarded-For を右からたどり，
+    信頼できるプロキシ以外の最初のアドレスを使う（それより左はクライアントが偽装できる）．
+    """
+
+    address = request.META.get("REMOTE_ADDR", "")
+    if not _is_trusted_proxy(address):
+        return address
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
+    for hop in reversed([hop.strip() for hop in forwarded.split(",") if hop.strip()]):
+        address = hop
+        if not _is_trusted_proxy(hop):
+            break
+    return address
+
+
+def login_buckets():
+    return (
+        WindowCounter("login:ip", *settings.LOGIN_THROTTLE_IP_RATE),
+        WindowCounter("login:username", *settings.LOGIN_THROTTLE_USERNAME_RATE),
+    )
+
+
+def throttle_login(request, username):
+    """
+    ログインの試行を IP アドレスとユーザ名ごとに制限する
+
+    許可する場合は None を，制限する場合は再試行までの秒数を返す．
+    パスワードのハッシュを計算する前に呼ぶ．
+    """
+
+    ip_bucket, username_bucket = login_buckets()
+    retry_after = ip_bucket.consume(client_ip(request))
+    if retry_after is None and username:
+        retry_after = username_bucket.consume(_username_key(username))
+    return retry_after
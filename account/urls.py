@@ -1,6 +1,7 @@
 from django.urls import path
 
-from . import views
+from . import async_views, views
+from twitter_clone.async_views import select_view
 
 app_name = "account"
 
@@ -9,12 +10,20 @@ urlpatterns = [
     path("", views.start_view, name="start"),
     path("register/", views.register_view, name="register"),
     path("register/complete/", views.complete_view, name="complete"),
+    path(
+        "register/availability/",
+        views.username_availability_view,
+        name="username_availability",
+    ),
     path("login/", views.login_view, name="login"),
-    path("home/", views.home_view, name="home"),
+    path("home/", select_view(views.home_view, async_views.home_view), name="home"),
     path("logout/", views.logout_view, name="logout"),
+    path("autocomplete/", views.autocomplete_view, name="autocomplete"),
     path("edit_profile/", views.edit_profile_view, name="edit_profile"),
     path(
-        "accounts/<int:account_id>/", views.account_detail_view, name="account_detail"
+        "accounts/<int:account_id>/",
+        select_view(views.account_detail_view, async_views.account_detail_view),
+        name="account_detail",
     ),
     path(
         "accounts/<int:account_id>/follow/",
@@ -28,12 +37,12 @@ urlpatterns = [
     ),
     path(
         "accounts/<int:account_id>/followings/",
-        views.account_followings_view,
+        select_view(views.account_followings_view, async_views.account_followings_view),
         name="followings",
     ),
     path(
         "accounts/<int:account_id>/followers/",
-        views.account_followers_view,
+        select_view(views.account_followers_view, async_views.account_followers_view),
         name="followers",
     ),
 ]
@@ -1,19 +1,38 @@
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.http import (
     HttpResponseNotAllowed,
     HttpResponseForbidden,
     HttpResponseBadRequest,
+    JsonResponse,
 )
 from urllib.parse import urlencode
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
-from django.views.decorators.http import require_http_methods
-
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods
+
+from .autocomplete import username_index
+from .cache import (
+    ACCOUNT_PAGE_SIZE,
+    build_account_page,
+    get_account_page,
+    get_account_version,
+    get_account_versions,
+    home_timeline,
+)
 from .forms import SignUpForm, LoginForm, ProfileForm
+from .middleware import get_profile
 from .models import Account, Profile, FollowConnection
+from .throttling import throttle_login
+from notification.notify import get_unread_count, notify_follow
+from tweet.entities import index_tweet_entities
 from tweet.forms import TweetForm
-from tweet.models import Tweet, FavoriteConnection
+from tweet.trends import get_trends, trend_counter
+from twitter_clone.conditional import viewer_etag
+from twitter_clone.pagination import parse_before
 
 
 def start_view(request):
@@ -34,16 +53,36 @@ def register_view(request):
     if request.method == "POST":
         form = SignUpForm(request.POST)
         if form.is_valid():
-            form.save()
-            profile = Profile(
-                user=Account.objects.get(username=form.cleaned_data["username"])
-            )
-            profile.save()
+            with transaction.atomic():
+                user = form.save()
+                Profile.objects.create(user=user)
+            username_index.add(user)
             return redirect(reverse("account:complete"))
 
     return render(request, "account/register.html", {"form": form})
 
 
+@require_http_methods(["GET"])
+def username_availability_view(request):
+    """
+    ユーザ登録のフォームで入力中のユーザ名が使えるかを返す
+
+    入力のたびに呼ばれるため，データベースを使わずにメモリ上の索引だけで答える．
+    他のプロセスでの登録・削除は索引を取り込み直すまで反映されないが，
+    登録時にも重複は検証される．
+    """
+
+    username = request.GET.get("username", "")
+    try:
+        SignUpForm.base_fields["username"].clean(username)
+        Account._meta.get_field("username").run_validators(username)
+    except ValidationError as e:
+        return JsonResponse({"available": False, "message": e.messages[0]})
+    if username_index.contains(username):
+        return JsonResponse({"available": False, "message": "このユーザー名は既に使われています．"})
+    return JsonResponse({"available": True, "message": "このユーザー名は使用できます．"})
+
+
 def complete_view(request):
     """
     ユーザ登録が完了した際に見れるページ
@@ -61,15 +100,26 @@ def login_view(request):
         form = LoginForm()
         return render(request, "account/login.html", {"form": form})
     elif request.method == "POST":
+        retry_after = throttle_login(request, request.POST.get("username", ""))
+        if retry_after is not None:
+            response = render(
+                request,
+                "account/login.html",
+                {
+                    "form": LoginForm(
+                        initial={"username": request.POST.get("username", "")}
+                    ),
+                    "throttle_error": "ログインの試行回数が多すぎます．しばらくしてから再度お試しください．",
+                },
+                status=429,
+            )
+            response["Retry-After"] = str(retry_after)
+            return response
         form = LoginForm(request=request, data=request.POST)
+        # フォームの検証で認証する（AuthenticationForm.clean が authenticate を呼ぶ）
         if form.is_valid():
-            username = form.cleaned_data.get("username")
-            password = form.cleaned_data.get("password")
-            user = authenticate(username=username, password=password)
-            if user:
-                if user.is_active:
-                    login(request, user)
-                    return redirect("/home/")
+            login(request, form.get_user())
+            return redirect("/home/")
         return render(request, "account/login.html", {"form": form})
     return HttpResponseNotAllowed(["GET", "POST"])
 
@@ -81,34 +131,98 @@ def home_view(request):
     """
 
     if request.method == "GET":
-        user_profile = Profile.objects.get(user=request.user)
+        user_profile = get_profile(request)
         form = TweetForm()
-        tweet_list = Tweet.objects.all().order_by("-id")
-        favorited_tweet_id_list = request.user.favorite_account.values_list(
-            "favorited_tweet_id", flat=True
-        )
+        timeline = home_timeline(request.user.pk, before=parse_before(request))
         return render(
             request,
             "account/home.html",
             {
+                **timeline,
                 "profile": user_profile,
                 "form": form,
-                "tweet_list": tweet_list,
-                "favorited_tweet_id_list": favorited_tweet_id_list,
+                "trend_list": get_trends(),
+                "unread_notification_count": get_unread_count(request.user.pk),
             },
         )
     elif request.method == "POST":
-        user_profile = Profile.objects.get(user=request.user)
         form = TweetForm(data=request.POST)
         if form.is_valid():
             tweet = form.save(commit=False)
             tweet.user = request.user
             tweet.save()
+            trend_counter.record(index_tweet_entities(tweet))
         return redirect(reverse("account:home"))
 
     return HttpResponseNotAllowed(["GET", "POST"])
 
 
+def connection_page(queryset, request):
+    """
+    フォローの一覧を before より古い ACCOUNT_PAGE_SIZE 件に絞り，次のページの before と返す
+    """
+
+    before = parse_before(request)
+    if before is not None:
+        queryset = queryset.filter(id__lt=before)
+    connection_list = list(queryset[:ACCOUNT_PAGE_SIZE])
+    next_before = None
+    if len(connection_list) == ACCOUNT_PAGE_SIZE:
+        next_before = connection_list[-1].pk
+    return connection_list, next_before
+
+
+def account_etag(request, account_id):
+    """
+    アカウントのバージョンから（ページを作らずに）ETagを計算する
+    """
+
+    return viewer_etag(
+        request,
+        request.resolver_match.view_name,
+        account_id,
+        get_account_version(account_id),
+        request.GET.urlencode(),
+    )
+
+
+def connection_etag(field, listed_field):
+    """
+    フォロー・フォロワーの一覧のETagを計算する関数を返す
+
+    一覧には表示する各アカウントのプロフィールも含まれるため，一覧のアカウントの
+    バージョンに加えて，表示するページのアカウントのバージョンからも計算する．
+    """
+
+    def etag(request, account_id):
+        queryset = FollowConnection.objects.filter(
+            **{f"{field}_id": account_id}
+        ).order_by("-id")
+        before = parse_before(request)
+        if before is not None:
+            queryset = queryset.filter(id__lt=before)
+        rows = list(
+            queryset.values_list("id", f"{listed_field}_id")[:ACCOUNT_PAGE_SIZE]
+        )
+        versions = get_account_versions(
+            [account_id, *(listed_id for _, listed_id in rows)]
+        )
+        return viewer_etag(
+            request,
+            request.resolver_match.view_name,
+            account_id,
+            versions[account_id],
+            *(f"{pk}:{versions[listed_id]}" for pk, listed_id in rows),
+            request.GET.urlencode(),
+        )
+
+    return etag
+
+
+followings_etag = connection_etag("follower", "followee")
+followers_etag = connection_etag("followee", "follower")
+
+
 @login_required
 def logout_view(request):
     """
@@ -132,14 +246,14 @@ def edit_profile_view(request):
 
     if request.method == "GET":
         form = ProfileForm()
-        user_profile = Profile.objects.get(user=request.user)
+        user_profile = get_profile(request)
         return render(
             request,
             "account/edit_profile.html",
             {"form": form, "profile": user_profile},
         )
     elif request.method == "POST":
-        user_profile = Profile.objects.get(user=request.user)
+        user_profile = get_profile(request)
         form = ProfileForm(data=request.POST, instance=user_profile)
         if form.is_valid():
             form.save()
@@ -153,42 +267,26 @@ def edit_profile_view(request):
 
 @login_required
 @require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=account_etag)
 def account_detail_view(request, account_id):
     """
     アカウントの詳細を確認するページ
     """
 
     if request.method == "GET":
-        account = get_object_or_404(
-            Account.objects.select_related("profile"), pk=account_id
-        )
-        tweet_list = (
-            Tweet.objects.select_related("user")
-            .filter(user=account)
-            .order_by("-created_at")
-        )
-        favorite_connection_list = (
-            FavoriteConnection.objects.select_related("favorited_tweet")
-            .filter(favorite_account=account)
-            .order_by("-id")
-        )
+        before = request.GET.get("before", "")
+        if before.isdigit():
+            page = build_account_page(account_id, before=int(before))
+        else:
+            page = get_account_page(account_id)
         is_follow = FollowConnection.objects.filter(
-            follower=request.user, followee=account
+            follower=request.user, followee_id=account_id
         ).exists()
-        followee_num = FollowConnection.objects.filter(follower=account).count()
-        follower_num = FollowConnection.objects.filter(followee=account).count()
         return render(
             request,
             "account/account_detail.html",
-            {
-                "account": account,
-                "profile": account.profile,
-                "tweet_list": tweet_list,
-                "is_follow": is_follow,
-                "followee_num": followee_num,
-                "follower_num": follower_num,
-                "favorite_connection_list": favorite_connection_list,
-            },
+            {**page, "is_follow": is_follow},
         )
     else:
         return HttpResponseBadRequest
@@ -196,49 +294,57 @@ def account_detail_view(request, account_id):
 
 @login_required
 @require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=followings_etag)
 def account_followings_view(request, account_id):
     """
     アカウントがフォローしているアカウントの一覧を表示するページ
     """
 
     if request.method == "GET":
-        account = get_object_or_404(
-            Account.objects.select_related("profile"), pk=account_id
-        )
-        followee_connection_list = (
-            FollowConnection.objects.select_related("followee")
+        account = get_object_or_404(Account, pk=account_id)
+        followee_connection_list, next_before = connection_page(
+            FollowConnection.objects.select_related("followee__profile")
             .filter(follower=account)
-            .order_by("-id")
+            .order_by("-id"),
+            request,
         )
 
         return render(
             request,
             "account/account_followings.html",
-            {"followee_connection_list": followee_connection_list},
+            {
+                "followee_connection_list": followee_connection_list,
+                "next_before": next_before,
+            },
         )
 
 
 @login_required
 @require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=followers_etag)
 def account_followers_view(request, account_id):
     """
     アカウントがフォローされているアカウントの一覧を表示するページ
     """
 
     if request.method == "GET":
-        account = get_object_or_404(
-            Account.objects.select_related("profile"), pk=account_id
-        )
-        follower_connection_list = (
-            FollowConnection.objects.select_related("follower")
+        account = get_object_or_404(Account, pk=account_id)
+        follower_connection_list, next_before = connection_page(
+            FollowConnection.objects.select_related("follower__profile")
             .filter(followee=account)
-            .order_by("-id")
+            .order_by("-id"),
+            request,
         )
 
         return render(
             request,
             "account/account_followers.html",
-            {"follower_connection_list": follower_connection_list},
+            {
+                "follower_connection_list": follower_connection_list,
+                "next_before": next_before,
+            },
         )
 
 
@@ -261,6 +367,7 @@ def follow_account_view(request, account_id):
         )
         if not is_created:
             return HttpResponseForbidden()
+        notify_follow(follower, followee)
 
     return redirect(reverse("account:account_detail", args=[account_id]))
 
@@ -284,3 +391,23 @@ def unfollow_account_view(request, account_id):
         follow.delete()
 
     return redirect(reverse("account:account_detail", args=[account_id]))
+
+
+@login_required
+@require_http_methods(["GET"])
+def autocomplete_view(request):
+    """
+    入力中のユーザ名の候補をフォロワーの多い順に返す
+    """
+
+    query = request.GET.get("q", "").strip().lstrip("@")
+    if not query:
+        return JsonResponse({"results": []})
+    return JsonResponse(
+        {
+            "results": [
+                {"id": pk, "username": username}
+                for pk, username in username_index.search(query)
+            ]
+        }
+    )
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class JobqueueConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'jobqueue'
+
+    def ready(self):
+        from django.utils.module_loading import autodiscover_modules
+
+        # 各アプリの jobs.py で登録されたジョブを読み込む
+        autodiscover_modules('jobs')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from jobqueue.queue import queue_stats
+
+
+class Command(BaseCommand):
+    help = "ジョブキューの状態を表示する"
+
+    def handle(self, *args, **options):
+        for name, value in queue_stats().items():
+            self.stdout.write(f"{name}: {value}")
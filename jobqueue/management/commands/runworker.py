@@ -0,0 +1,69 @@
+import logging
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobqueue.queue import Worker, default_worker_name
+
+logger = logging.getLogger(__name__)
+
+
+def _run_worker(name, sleep, burst):
+    worker = Worker(name=name, sleep=sleep)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    try:
+        worker.run(burst=burst)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "ジョブキューのワーカーを起動する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=1, help="起動するワーカーのプロセス数")
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="実行できるジョブがない場合に待つ秒数",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="実行できるジョブがなくなったら終了する",
+        )
+
+    def handle(self, *args, processes, sleep, burst, **options):
+        if processes <= 1:
+            _run_worker(default_worker_name(), sleep, burst)
+            return
+
+        # 子プロセスが親のデータベース接続を引き継がないよう閉じてから起動する
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(
+                target=_run_worker,
+                args=(f"{default_worker_name()}-{i}", sleep, burst),
+                daemon=True,
+            )
+            for i in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+
+        def stop(signum, frame):
+            for worker in workers:
+                worker.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for worker in workers:
+            worker.join()
+        failed = [worker.exitcode for worker in workers if worker.exitcode]
+        if failed:
+            logger.warning("%d worker(s) exited with errors", len(failed))
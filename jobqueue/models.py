@@ -0,0 +1,32 @@
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class Job(models.Model):
+    class Status(models.TextChoices):
+        QUEUED = "queued", _("queued")
+        RUNNING = "running", _("running")
+        FAILED = "failed", _("failed")
+
+    name = models.CharField(_("name"), max_length=100)
+    payload = models.JSONField(_("payload"), default=dict, blank=True)
+    status = models.CharField(
+        _("status"), max_length=16, choices=Status.choices, default=Status.QUEUED
+    )
+    attempts = models.PositiveIntegerField(_("attempts"), default=0)
+    max_attempts = models.PositiveIntegerField(_("max attempts"), default=5)
+    run_at = models.DateTimeField(_("run at"), default=timezone.now)
+    locked_by = models.CharField(_("locked by"), max_length=100, blank=True)
+    locked_at = models.DateTimeField(_("locked at"), null=True, blank=True)
+    last_error = models.TextField(_("last error"), blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # ワーカーは (status, run_at) の索引で実行できるジョブを古い順に取り出す
+            models.Index(fields=["status", "run_at"], name="job_ready_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
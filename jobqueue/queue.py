@@ -0,0 +1,295 @@
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from twitter_clone.metrics import register_collector
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def job(name):
+    """
+    関数をジョブとして登録するデコレータ（引数はJSONにできる値のキーワード引数で渡す）
+    """
+
+    def decorator(func):
+        _registry[name] = func
+        return func
+
+    return decorator
+
+
+def get_job_function(name):
+    return _registry[name]
+
+
+def enqueue(name, payload=None, delay=0, max_attempts=None, unique=False):
+    """
+    ジョブを登録する
+
+    unique=True の場合，同じ名前のジョブが実行待ちならば登録しない
+    （後から実行されるジョブがまとめて処理する種類のジョブに使う）．
+    """
+
+    if name not in _registry:
+        raise KeyError(f"Unknown job: {name}")
+    if unique and Job.objects.filter(name=name, status=Job.Status.QUEUED).exists():
+        return None
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def default_worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_job(worker_name=None):
+    """
+    実行できるジョブを1件取り出して実行中にする（なければNone）
+
+    他のワーカーと同じジョブを取り出さないよう，状態を条件にした UPDATE で確保する．
+    """
+
+    worker_name = worker_name or default_worker_name()
+    while True:
+        now = timezone.now()
+        job_id = (
+            Job.objects.filter(status=Job.Status.QUEUED, run_at__lte=now)
+            .order_by("run_at", "id")
+            .values_list("id", flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        claimed = Job.objects.filter(id=job_id, status=Job.Status.QUEUED).update(
+            status=Job.Status.RUNNING,
+            locked_by=worker_name,
+            locked_at=now,
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+
+
+def retry_delay(attempts):
+    """
+    失敗した回数から次に実行するまでの秒数を返す（指数バックオフ・ジッター付き）
+    """
+
+    delay = min(
+        settings.JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1),
+        settings.JOB_RETRY_MAX_DELAY,
+    )
+    return delay * random.uniform(0.5, 1.0)
+
+
+def touch_job(job):
+    """
+    実行中のジョブの locked_at を更新して，停止したワーカーのジョブとみなされないようにする
+    """
+
+    return Job.objects.filter(
+        id=job.pk, status=Job.Status.RUNNING, locked_by=job.locked_by
+    ).update(locked_at=timezone.now())
+
+
+class Heartbeat:
+    """
+    ジョブの実行中に JOB_HEARTBEAT_INTERVAL 秒ごとに touch_job を呼ぶスレッド
+
+    JOB_LOCK_TIMEOUT より長くかかるジョブが requeue_stale_jobs で実行待ちに戻され，
+    別のワーカーで同時に実行されないようにする．
+    """
+
+    def __init__(self, job, interval=None):
+        self.job = job
+        self.interval = (
+            settings.JOB_HEARTBEAT_INTERVAL if interval is None else interval
+        )
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        if self.interval > 0:
+            self._thread = threading.Thread(
+                target=self._run, name=f"heartbeat-{self.job.pk}", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                try:
+                    touch_job(self.job)
+                except Exception:
+                    logger.exception("heartbeat for job %s failed", self.job.pk)
+        finally:
+            connections.close_all()
+
+
+def run_job(job):
+    """
+    取り出したジョブを実行する（成功したジョブは削除し，失敗したジョブは再試行する）
+    """
+
+    start = time.perf_counter()
+    try:
+        with Heartbeat(job):
+            get_job_function(job.name)(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts)
+            logger.warning(
+                "job %s (%s) failed, retrying in %.1fs", job.pk, job.name, delay
+            )
+            Job.objects.filter(id=job.pk).update(
+                status=Job.Status.QUEUED,
+                run_at=timezone.now() + timedelta(seconds=delay),
+                locked_by="",
+                locked_at=None,
+                last_error=error,
+            )
+        else:
+            logger.error("job %s (%s) failed permanently", job.pk, job.name)
+            Job.objects.filter(id=job.pk).update(
+                status=Job.Status.FAILED, last_error=error
+            )
+        return False
+    Job.objects.filter(id=job.pk).delete()
+    logger.info(
+        "job %s (%s) finished in %.1fms",
+        job.pk,
+        job.name,
+        (time.perf_counter() - start) * 1000,
+    )
+    return True
+
+
+def requeue_stale_jobs(timeout=None):
+    """
+    ワーカーが停止したまま実行中になっているジョブを実行待ちに戻す
+    """
+
+    timeout = settings.JOB_LOCK_TIMEOUT if timeout is None else timeout
+    return Job.objects.filter(
+        status=Job.Status.RUNNING,
+        locked_at__lt=timezone.now() - timedelta(seconds=timeout),
+    ).update(status=Job.Status.QUEUED, locked_by="", locked_at=None)
+
+
+def run_pending(worker_name=None, limit=None):
+    """
+    実行できるジョブがなくなるまで（または limit 件まで）実行し，実行した件数を返す
+    """
+
+    count = 0
+    while limit is None or count < limit:
+        job = claim_job(worker_name)
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
+
+
+def queue_stats():
+    """
+    キューの状態（状態ごとの件数・実行できるジョブの件数・最も古い実行待ちの経過秒数）を返す
+    """
+
+    now = timezone.now()
+    stats = {status: 0 for status in Job.Status.values}
+    for row in Job.objects.values("status").annotate(count=Count("id")):
+        stats[row["status"]] = row["count"]
+    ready = Job.objects.filter(status=Job.Status.QUEUED, run_at__lte=now).aggregate(
+        count=Count("id"), oldest=Min("run_at")
+    )
+    stats["ready"] = ready["count"]
+    stats["oldest_ready_seconds"] = (
+        (now - ready["oldest"]).total_seconds() if ready["oldest"] else 0.0
+    )
+    return stats
+
+
+@register_collector
+def queue_metrics():
+    stats = queue_stats()
+    return [
+        (
+            "jobqueue_jobs",
+            "gauge",
+            "Jobs in the queue by status.",
+            [({"status": status}, stats[status]) for status in Job.Status.values],
+        ),
+        (
+            "jobqueue_ready_jobs",
+            "gauge",
+            "Queued jobs whose run_at has passed.",
+            [({}, stats["ready"])],
+        ),
+        (
+            "jobqueue_oldest_ready_seconds",
+            "gauge",
+            "Age of the oldest ready job.",
+            [({}, stats["oldest_ready_seconds"])],
+        ),
+    ]
+
+
+class Worker:
+    """
+    ジョブを繰り返し取り出して実行するワーカー
+    """
+
+    def __init__(self, name=None, sleep=1.0):
+        self.name = name or default_worker_name()
+        self.sleep = sleep
+        self.stopped = False
+
+    def stop(self, *args):
+        self.stopped = True
+
+    def run(self, burst=False):
+        """
+        ジョブを実行し続ける（burst=True の場合は実行できるジョブがなくなったら終了する）
+        """
+
+        logger.info("worker %s started", self.name)
+        last_requeue = 0.0
+        while not self.stopped:
+            if time.monotonic() - last_requeue >= settings.JOB_LOCK_TIMEOUT:
+                requeue_stale_jobs()
+                last_requeue = time.monotonic()
+            job = claim_job(self.name)
+            if job is None:
+                if burst:
+                    break
+                time.sleep(self.sleep)
+                continue
+            run_job(job)
+        logger.info("worker %s stopped", self.name)
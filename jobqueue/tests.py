@@ -0,0 +1,224 @@
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Job
+from .queue import (
+    Heartbeat,
+    claim_job,
+    enqueue,
+    job,
+    queue_stats,
+    requeue_stale_jobs,
+    retry_delay,
+    run_job,
+    run_pending,
+    touch_job,
+)
+from account.models import Account, Profile
+from notification.models import Notification
+from tweet.models import Tweet
+
+calls = []
+
+
+@job("jobqueue.tests.record")
+def record_job(value=None, fail=False):
+    if fail:
+        raise ValueError("failed")
+    calls.append(value)
+
+
+class JobQueueTest(TestCase):
+    """
+    ジョブキューに対するテスト
+    """
+
+    def setUp(self):
+        calls.clear()
+
+    def test_run(self):
+        """
+        登録したジョブが古い順に実行され，削除される場合
+        """
+
+        enqueue("jobqueue.tests.record", {"value": 1})
+        enqueue("jobqueue.tests.record", {"value": 2})
+        enqueue("jobqueue.tests.record", {"value": 3}, delay=60)
+
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(Job.objects.count(), 1)
+        with self.assertRaises(KeyError):
+            enqueue("jobqueue.tests.unknown")
+
+    def test_claim_once(self):
+        """
+        同じジョブを2つのワーカーが取り出さない場合
+        """
+
+        enqueue("jobqueue.tests.record")
+        first = claim_job("worker-1")
+        self.assertEqual(first.status, Job.Status.RUNNING)
+        self.assertEqual(first.attempts, 1)
+        self.assertIsNone(claim_job("worker-2"))
+
+    def test_unique(self):
+        """
+        同じ名前のジョブが実行待ちの場合に重複して登録しない場合
+        """
+
+        self.assertIsNotNone(enqueue("jobqueue.tests.record", unique=True))
+        self.assertIsNone(enqueue("jobqueue.tests.record", unique=True))
+        self.assertEqual(Job.objects.count(), 1)
+
+    @override_settings(
+        JOB_RETRY_BASE_DELAY=10, JOB_RETRY_MAX_DELAY=60, JOB_MAX_ATTEMPTS=2
+    )
+    def test_retry(self):
+        """
+        失敗したジョブを間隔を空けて再試行し，上限に達したら失敗にする場合
+        """
+
+        with mock.patch("jobqueue.queue.random.uniform", return_value=1.0):
+            self.assertEqual([retry_delay(n) for n in range(1, 5)], [10, 20, 40, 60])
+
+        enqueue("jobqueue.tests.record", {"fail": True})
+        self.assertFalse(run_job(claim_job()))
+        failed = Job.objects.get()
+        self.assertEqual(failed.status, Job.Status.QUEUED)
+        self.assertGreater(failed.run_at, timezone.now())
+        self.assertIn("ValueError", failed.last_error)
+        self.assertIsNone(claim_job())
+
+        Job.objects.update(run_at=timezone.now())
+        self.assertFalse(run_job(claim_job()))
+        self.assertEqual(Job.objects.get().status, Job.Status.FAILED)
+
+    def test_requeue_stale(self):
+        """
+        停止したワーカーのジョブを実行待ちに戻す場合
+        """
+
+        enqueue("jobqueue.tests.record")
+        claim_job()
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale_jobs(timeout=60), 1)
+        self.assertIsNotNone(claim_job())
+
+    def test_heartbeat(self):
+        """
+        実行中のジョブの locked_at を更新し，実行待ちに戻されない場合
+        """
+
+        enqueue("jobqueue.tests.record")
+        job = claim_job("worker-1")
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(touch_job(job), 1)
+        self.assertEqual(requeue_stale_jobs(timeout=60), 0)
+        job.locked_by = "worker-2"
+        self.assertEqual(touch_job(job), 0)
+
+        with mock.patch("jobqueue.queue.touch_job") as touch:
+            with Heartbeat(job, interval=0.01):
+                for _ in range(100):
+                    if touch.called:
+                        break
+                    time.sleep(0.01)
+        touch.assert_called_with(job)
+
+    def test_stats(self):
+        """
+        キューの状態を取得する場合
+        """
+
+        enqueue("jobqueue.tests.record")
+        enqueue("jobqueue.tests.record", delay=60)
+        stats = queue_stats()
+        self.assertEqual(stats["queued"], 2)
+        self.assertEqual(stats["ready"], 1)
+        self.assertEqual(stats["running"], 0)
+
+        out = StringIO()
+        call_command("jobqueue_stats", stdout=out)
+        self.assertIn("ready: 1", out.getvalue())
+
+    def test_runworker(self):
+        """
+        ワーカーのコマンドで実行待ちのジョブを実行する場合
+        """
+
+        enqueue("jobqueue.tests.record", {"value": "a"})
+        call_command("runworker", burst=True, stdout=StringIO())
+        self.assertEqual(calls, ["a"])
+        self.assertFalse(Job.objects.exists())
+
+
+class JobWiringTest(TestCase):
+    """
+    ジョブキューで実行する処理に対するテスト
+    """
+
+    def setUp(self):
+        self.users = []
+        for i in range(1, 3):
+            user = Account.objects.create_user(
+                email=f"sample{i}@example.com",
+                username=f"sample{i}",
+                password=f"instance{i}",
+            )
+            Profile.objects.create(user=user)
+            self.users.append(user)
+
+    def test_notifications(self):
+        """
+        いいねの通知がジョブとして処理される場合
+        """
+
+        tweet = Tweet.objects.create(user=self.users[0], content="hello")
+        self.client.force_login(self.users[1])
+        self.client.post(reverse("tweet:favorite_tweet", args=[tweet.pk]))
+        self.client.post(reverse("account:follow", args=[self.users[0].pk]))
+        self.assertEqual(
+            list(Job.objects.values_list("name", flat=True)),
+            ["notification.process_events"],
+        )
+
+        Job.objects.update(run_at=timezone.now())
+        run_pending()
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_purge(self):
+        """
+        すべてのツイートを削除した後に物理削除がジョブとして実行される場合
+        """
+
+        Tweet.objects.create(user=self.users[0], content="hello")
+        self.client.force_login(self.users[0])
+        self.client.post(reverse("tweet:delete_all_tweets"))
+        self.assertEqual(Tweet.all_objects.count(), 1)
+
+        run_pending()
+        self.assertEqual(Tweet.all_objects.count(), 0)
+
+    def test_purge_single(self):
+        """
+        ツイートを1件削除した後に物理削除がジョブとして実行される場合
+        """
+
+        tweet = Tweet.objects.create(user=self.users[0], content="hello")
+        self.client.force_login(self.users[0])
+        self.client.get(reverse("tweet:delete_tweet", args=[tweet.pk]))
+        self.assertEqual(
+            list(Job.objects.values_list("name", flat=True)),
+            ["tweet.purge_deleted_tweets"],
+        )
+
+        run_pending()
+        self.assertEqual(Tweet.all_objects.count(), 0)
@@ -0,0 +1,8 @@
+from jobqueue.queue import job
+
+from .notify import PROCESS_BATCH_SIZE, process_events
+
+
+@job("notification.process_events")
+def process_events_job(batch_size=PROCESS_BATCH_SIZE):
+    process_events(batch_size=batch_size)
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notification.notify import PROCESS_BATCH_SIZE, process_events
+
+
+class Command(BaseCommand):
+    help = "記録されたフォローやいいねを受信者ごとの通知にまとめる"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=PROCESS_BATCH_SIZE)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=None,
+            help="指定した秒数ごとに処理を繰り返す（指定しない場合は1回だけ実行する）",
+        )
+
+    def handle(self, *args, batch_size, interval, **options):
+        while True:
+            processed = process_events(batch_size=batch_size)
+            self.stdout.write(f"{processed} 件の出来事を通知にしました")
+            if interval is None:
+                return
+            time.sleep(interval)
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('account', '0011_rename_date_created_followconnection_created_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('recipient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_counter', serialize=False, to='account.account')),
+                ('count', models.IntegerField(default=0, verbose_name='count')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NotificationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('verb', models.CharField(choices=[('follow', 'follow'), ('favorite', 'favorite')], max_length=16, verbose_name='verb')),
+                ('tweet_id', models.BigIntegerField(blank=True, null=True, verbose_name='tweet id')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('actor', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('recipient', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('verb', models.CharField(choices=[('follow', 'follow'), ('favorite', 'favorite')], max_length=16, verbose_name='verb')),
+                ('tweet_id', models.BigIntegerField(blank=True, null=True, verbose_name='tweet id')),
+                ('actor_count', models.PositiveIntegerField(default=1, verbose_name='actor count')),
+                ('is_read', models.BooleanField(default=False, verbose_name='is read')),
+                ('started_at', models.DateTimeField(verbose_name='started at')),
+                ('updated_at', models.DateTimeField(verbose_name='updated at')),
+                ('last_actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('recipient', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'id'], name='notification_inbox_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'verb', 'tweet_id', 'started_at'], name='notification_group_idx'),
+        ),
+    ]
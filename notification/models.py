@@ -0,0 +1,79 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from account.models import Account
+
+
+class Verb(models.TextChoices):
+    FOLLOW = "follow", _("follow")
+    FAVORITE = "favorite", _("favorite")
+
+
+class NotificationEvent(models.Model):
+    """
+    リクエスト中に記録し，後からまとめて通知にする出来事（アウトボックス）
+    """
+
+    recipient = models.ForeignKey(
+        Account, related_name="+", on_delete=models.CASCADE, db_index=False
+    )
+    actor = models.ForeignKey(
+        Account, related_name="+", on_delete=models.CASCADE, db_index=False
+    )
+    verb = models.CharField(_("verb"), max_length=16, choices=Verb.choices)
+    # ツイートはシャードにあるため外部キーにしない
+    tweet_id = models.BigIntegerField(_("tweet id"), null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.actor_id} {self.verb} -> {self.recipient_id}"
+
+
+class Notification(models.Model):
+    """
+    受信者ごとの通知（同じツイートへのいいねなどは一定時間まとめて1件にする）
+    """
+
+    recipient = models.ForeignKey(
+        Account,
+        related_name="notifications",
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+    verb = models.CharField(_("verb"), max_length=16, choices=Verb.choices)
+    tweet_id = models.BigIntegerField(_("tweet id"), null=True, blank=True)
+    last_actor = models.ForeignKey(Account, related_name="+", on_delete=models.CASCADE)
+    actor_count = models.PositiveIntegerField(_("actor count"), default=1)
+    is_read = models.BooleanField(_("is read"), default=False)
+    started_at = models.DateTimeField(_("started at"))
+    updated_at = models.DateTimeField(_("updated at"))
+
+    class Meta:
+        indexes = [
+            # 受信箱は (recipient_id, id) の索引で新しい順に続きから引ける
+            models.Index(fields=["recipient", "id"], name="notification_inbox_idx"),
+            models.Index(
+                fields=["recipient", "verb", "tweet_id", "started_at"],
+                name="notification_group_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient_id} : {self.verb} ({self.actor_count})"
+
+
+class UnreadCounter(models.Model):
+    """
+    受信者ごとの未読の通知の件数
+    """
+
+    recipient = models.OneToOneField(
+        Account,
+        related_name="unread_counter",
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    count = models.IntegerField(_("count"), default=0)
+
+    def __str__(self):
+        return f"{self.recipient_id} : {self.count}"
@@ -0,0 +1,183 @@
+from datetime import timedelta
+from itertools import groupby
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from jobqueue.queue import enqueue
+
+from .models import Notification, NotificationEvent, UnreadCounter, Verb
+
+PROCESS_BATCH_SIZE = 500
+INBOX_PAGE_SIZE = 20
+
+
+def _enqueue(recipient_id, actor_id, verb, tweet_id=None):
+    if recipient_id == actor_id:
+        return None
+    event = NotificationEvent.objects.create(
+        recipient_id=recipient_id, actor_id=actor_id, verb=verb, tweet_id=tweet_id
+    )
+    # 少し待ってから処理し，その間の出来事をまとめて通知にする
+    enqueue(
+        "notification.process_events",
+        delay=settings.NOTIFICATION_PROCESS_DELAY,
+        unique=True,
+    )
+    return event
+
+
+def notify_follow(follower, followee):
+    """
+    フォローされたことを通知する（通知の作成はジョブキューの process_events で行う）
+    """
+
+    return _enqueue(followee.pk, follower.pk, Verb.FOLLOW)
+
+
+def notify_favorite(account, tweet):
+    """
+    ツイートがいいねされたことを通知する（通知の作成はジョブキューの process_events で行う）
+    """
+
+    return _enqueue(tweet.user_id, account.pk, Verb.FAVORITE, tweet.pk)
+
+
+class EventsClaimed(Exception):
+    """
+    取り出そうとした出来事を他のワーカーが先に処理した
+    """
+
+
+def _group_key(event):
+    return (event.recipient_id, event.verb, event.tweet_id or 0)
+
+
+def _claim_events(batch_size):
+    events = list(
+        NotificationEvent.objects.select_for_update(skip_locked=True).order_by("id")[
+            :batch_size
+        ]
+    )
+    if not events:
+        return events
+    deleted, _ = NotificationEvent.objects.filter(
+        id__in=[event.id for event in events]
+    ).delete()
+    if deleted != len(events):
+        raise EventsClaimed
+    return events
+
+
+def _coalesce(recipient_id, verb, tweet_id, events):
+    latest = events[-1]
+    window_start = latest.created_at - timedelta(
+        seconds=settings.NOTIFICATION_COALESCE_WINDOW
+    )
+    current = (
+        Notification.objects.filter(
+            recipient_id=recipient_id,
+            verb=verb,
+            tweet_id=tweet_id,
+            started_at__gte=window_start,
+        )
+        .order_by("-id")
+        .first()
+    )
+    notification = Notification(
+        recipient_id=recipient_id,
+        verb=verb,
+        tweet_id=tweet_id,
+        last_actor_id=latest.actor_id,
+        actor_count=len(events),
+        started_at=events[0].created_at,
+        updated_at=latest.created_at,
+    )
+    unread_delta = 1
+    if current is not None:
+        # 新しいIDで作り直し，受信箱の先頭へ移動する
+        notification.actor_count += current.actor_count
+        notification.started_at = current.started_at
+        if not current.is_read:
+            unread_delta = 0
+        current.delete()
+    notification.save()
+    return unread_delta
+
+
+def _add_unread(recipient_id, delta):
+    if not delta:
+        return
+    counter = UnreadCounter.objects.filter(recipient_id=recipient_id)
+    if not counter.update(count=F("count") + delta):
+        UnreadCounter.objects.create(recipient_id=recipient_id, count=delta)
+
+
+def process_events(batch_size=PROCESS_BATCH_SIZE):
+    """
+    記録された出来事を受信者・種類・ツイートごとにまとめて通知にし，処理した件数を返す
+    """
+
+    processed = 0
+    while True:
+        try:
+            with transaction.atomic():
+                events = _claim_events(batch_size)
+                unread = {}
+                events.sort(key=_group_key)
+                for (recipient_id, verb, tweet_id), group in groupby(
+                    events, key=_group_key
+                ):
+                    group = sorted(group, key=attrgetter("id"))
+                    unread[recipient_id] = unread.get(recipient_id, 0) + _coalesce(
+                        recipient_id, verb, tweet_id or None, group
+                    )
+                for recipient_id, delta in unread.items():
+                    _add_unread(recipient_id, delta)
+        except EventsClaimed:
+            continue
+        if not events:
+            return processed
+        processed += len(events)
+
+
+def get_unread_count(recipient_id):
+    """
+    未読の通知の件数を返す
+    """
+
+    return (
+        UnreadCounter.objects.filter(recipient_id=recipient_id)
+        .values_list("count", flat=True)
+        .first()
+        or 0
+    )
+
+
+def get_inbox(recipient_id, before=None, limit=INBOX_PAGE_SIZE):
+    """
+    受信者の通知を新しい順に返す（before には前のページの最後の通知のIDを渡す）
+    """
+
+    notifications = (
+        Notification.objects.select_related("last_actor")
+        .filter(recipient_id=recipient_id)
+        .order_by("-id")
+    )
+    if before is not None:
+        notifications = notifications.filter(id__lt=before)
+    return list(notifications[:limit])
+
+
+def mark_all_read(recipient_id):
+    """
+    受信者の通知をすべて既読にする
+    """
+
+    with transaction.atomic():
+        Notification.objects.filter(recipient_id=recipient_id, is_read=False).update(
+            is_read=True
+        )
+        UnreadCounter.objects.filter(recipient_id=recipient_id).update(count=0)
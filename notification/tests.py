@@ -0,0 +1,120 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .models import Notification, NotificationEvent
+from .notify import INBOX_PAGE_SIZE, get_unread_count, process_events
+from account.models import Account, Profile
+from tweet.models import Tweet
+
+
+class NotificationTest(TestCase):
+    """
+    通知に対するテスト
+    """
+
+    def setUp(self):
+        self.users = []
+        for i in range(1, 5):
+            user = Account.objects.create_user(
+                email=f"sample{i}@example.com",
+                username=f"sample{i}",
+                password=f"instance{i}",
+            )
+            Profile.objects.create(user=user)
+            self.users.append(user)
+        self.tweet = Tweet.objects.create(user=self.users[0], content="hello")
+
+    def favorite(self, user):
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse("tweet:favorite_tweet", args=[self.tweet.pk])
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_enqueue_only(self):
+        """
+        いいね・フォローの際には出来事の記録だけを行う場合
+        """
+
+        self.favorite(self.users[1])
+        self.client.post(reverse("account:follow", args=[self.users[0].pk]))
+        self.assertEqual(NotificationEvent.objects.count(), 2)
+        self.assertFalse(Notification.objects.exists())
+
+        # 自分への操作は通知しない
+        self.favorite(self.users[0])
+        self.assertEqual(NotificationEvent.objects.count(), 2)
+
+    def test_coalesce(self):
+        """
+        同じツイートへのいいねが1件の通知にまとめられる場合
+        """
+
+        self.favorite(self.users[1])
+        self.favorite(self.users[2])
+        self.assertEqual(process_events(), 2)
+        self.favorite(self.users[3])
+        self.client.post(reverse("account:follow", args=[self.users[0].pk]))
+        self.assertEqual(process_events(), 2)
+
+        notifications = list(
+            Notification.objects.filter(recipient=self.users[0]).order_by("-id")
+        )
+        self.assertEqual(
+            [(n.verb, n.actor_count, n.last_actor) for n in notifications],
+            [("follow", 1, self.users[3]), ("favorite", 3, self.users[3])],
+        )
+        self.assertEqual(get_unread_count(self.users[0].pk), 2)
+        self.assertFalse(NotificationEvent.objects.exists())
+
+    def test_window(self):
+        """
+        まとめる時間を過ぎた後のいいねが別の通知になる場合
+        """
+
+        self.favorite(self.users[1])
+        process_events()
+        Notification.objects.update(
+            started_at=Notification.objects.get().started_at - timedelta(days=1)
+        )
+        self.favorite(self.users[2])
+        process_events()
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(get_unread_count(self.users[0].pk), 2)
+
+    def test_inbox(self):
+        """
+        受信箱を開くと既読になり，続きのページを取得できる場合
+        """
+
+        for i in range(INBOX_PAGE_SIZE + 2):
+            tweet = Tweet.objects.create(user=self.users[0], content=f"tweet {i}")
+            NotificationEvent.objects.create(
+                recipient=self.users[0],
+                actor=self.users[1],
+                verb="favorite",
+                tweet_id=tweet.pk,
+            )
+        call_command("process_notifications", stdout=StringIO())
+        self.assertEqual(get_unread_count(self.users[0].pk), INBOX_PAGE_SIZE + 2)
+
+        self.client.force_login(self.users[0])
+        response = self.client.get(reverse("account:home"))
+        self.assertContains(response, f"{INBOX_PAGE_SIZE + 2}</span>")
+
+        path = reverse("notification:inbox")
+        response = self.client.get(path)
+        self.assertEqual(len(response.context["notification_list"]), INBOX_PAGE_SIZE)
+        self.assertEqual(get_unread_count(self.users[0].pk), 0)
+        response = self.client.get(
+            path, data={"before": response.context["next_before"]}
+        )
+        self.assertEqual(len(response.context["notification_list"]), 2)
+        self.assertIsNone(response.context["next_before"])
+
+        with self.assertNumQueries(1):
+            get_unread_count(self.users[0].pk)
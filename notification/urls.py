@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import views
+
+app_name = "notification"
+
+
+urlpatterns = [
+    path("notifications", views.inbox_view, name="inbox"),
+]
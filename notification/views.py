@@ -0,0 +1,27 @@
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import render
+from django.views.decorators.http import require_http_methods
+
+from .notify import INBOX_PAGE_SIZE, get_inbox, mark_all_read
+
+
+@login_required
+@require_http_methods(["GET"])
+def inbox_view(request):
+    """
+    ログインしているユーザへの通知の一覧ページ（最初のページを開くと既読にする）
+    """
+
+    before = request.GET.get("before", "")
+    before = int(before) if before.isdigit() else None
+    notification_list = get_inbox(request.user.pk, before=before)
+    if before is None:
+        mark_all_read(request.user.pk)
+    next_before = None
+    if len(notification_list) == INBOX_PAGE_SIZE:
+        next_before = notification_list[-1].pk
+    return render(
+        request,
+        "notification/inbox.html",
+        {"notification_list": notification_list, "next_before": next_before},
+    )
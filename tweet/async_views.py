@@ -0,0 +1,17 @@
+from django.http import Http404
+
+from .cache import get_cached_tweet
+from .views import tweet_etag
+from twitter_clone.async_views import async_read_view, async_render, gather_queries
+
+
+@async_read_view(etag_func=tweet_etag)
+async def tweet_detail_view(request, tweet_id):
+    """
+    ツイートの詳細ページの非同期版
+    """
+
+    (tweet,) = await gather_queries(lambda: get_cached_tweet(tweet_id))
+    if tweet is None:
+        raise Http404("No Tweet matches the given query.")
+    return await async_render(request, "tweet/tweet_detail.html", {"tweet": tweet})
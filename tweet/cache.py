@@ -0,0 +1,32 @@
+from django.conf import settings
+
+from twitter_clone.cache import delete, get_or_compute
+
+from .sharding import find_tweet
+
+
+def _tweet_key(tweet_id):
+    return f"tweet:{tweet_id}"
+
+
+def get_cached_tweet(tweet_id):
+    """
+    ツイートを投稿者と一緒にキャッシュから返す（存在しなければNone）
+    """
+
+    def compute():
+        tweet = find_tweet(tweet_id)
+        if tweet is not None:
+            tweet.user
+        return tweet
+
+    return get_or_compute(
+        _tweet_key(tweet_id),
+        compute,
+        timeout=settings.TWEET_CACHE_TIMEOUT,
+        local_timeout=settings.LOCAL_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_tweets(*tweet_ids):
+    delete(*(_tweet_key(tweet_id) for tweet_id in tweet_ids))
@@ -0,0 +1,91 @@
+from django.db import transaction
+from django.utils import timezone
+
+from account.cache import bump_account_version
+
+from .cache import invalidate_tweets
+from .models import FavoriteConnection, Tweet
+from .sharding import get_shards, shard_for_user
+
+PURGE_BATCH_SIZE = 1000
+
+
+def tombstone_tweet(tweet):
+    """
+    ツイートを論理削除する（関連するいいねは後から purge_deleted_tweets で削除する）
+    """
+
+    tweet.is_deleted = True
+    tweet.deleted_at = timezone.now()
+    Tweet.all_objects.using(tweet._state.db).filter(pk=tweet.pk).update(
+        is_deleted=tweet.is_deleted, deleted_at=tweet.deleted_at
+    )
+    invalidate_tweets(tweet.pk)
+    bump_account_version(tweet.user_id)
+    _bump_favoriters(tweet._state.db, [tweet.pk])
+
+
+def tombstone_user_tweets(user):
+    """
+    ユーザのツイートをすべて論理削除し，件数を返す
+    """
+
+    tweets = Tweet.objects.using(shard_for_user(user.pk)).filter(user=user)
+    tweet_ids = list(tweets.values_list("id", flat=True))
+    deleted = tweets.update(is_deleted=True, deleted_at=timezone.now())
+    invalidate_tweets(*tweet_ids)
+    bump_account_version(user.pk)
+    _bump_favoriters(shard_for_user(user.pk), tweet_ids)
+    return deleted
+
+
+def _bump_favoriters(shard, tweet_ids):
+    """
+    削除したツイートをいいねしたユーザのページのキャッシュを無効にする
+    （キャッシュされたいいねの一覧に削除したツイートが残らないようにする）
+    """
+
+    account_ids = (
+        FavoriteConnection.objects.using(shard)
+        .filter(favorited_tweet_id__in=tweet_ids)
+        .values_list("favorite_account_id", flat=True)
+        .distinct()
+    )
+    for account_id in account_ids:
+        bump_account_version(account_id)
+
+
+def purge_deleted_tweets(batch_size=PURGE_BATCH_SIZE, shards=None):
+    """
+    論理削除されたツイートとそのいいねを batch_size 件ずつ物理削除する
+    """
+
+    purged = 0
+    for shard in get_shards() if shards is None else shards:
+        while True:
+            tweet_ids = list(
+                Tweet.all_objects.using(shard)
+                .filter(is_deleted=True)
+                .order_by("deleted_at")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not tweet_ids:
+                break
+            _delete_favorites(shard, tweet_ids, batch_size)
+            with transaction.atomic(using=shard):
+                Tweet.all_objects.using(shard).filter(id__in=tweet_ids).delete()
+            purged += len(tweet_ids)
+    return purged
+
+
+def _delete_favorites(shard, tweet_ids, batch_size):
+    while True:
+        favorite_ids = list(
+            FavoriteConnection.objects.using(shard)
+            .filter(favorited_tweet_id__in=tweet_ids)
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not favorite_ids:
+            return
+        with transaction.atomic(using=shard):
+            FavoriteConnection.objects.using(shard).filter(id__in=favorite_ids).delete()
@@ -0,0 +1,148 @@
+import re
+import unicodedata
+
+from account.models import Account
+
+from .models import Hashtag, Mention, Tweet, TweetHashtag
+from .sharding import ShardedQuerySet, get_shards
+
+BACKFILL_BATCH_SIZE = 1000
+ENTITY_PAGE_SIZE = 20
+
+# 直前が英数字や "&"（HTMLの文字参照）の "#" はハッシュタグとみなさない
+HASHTAG_RE = re.compile(r"(?<![\w&])[#＃](\w+)")
+MENTION_RE = re.compile(r"(?<![\w.@+-])[@＠]([\w.@+-]+)")
+
+HASHTAG_MAX_LENGTH = Hashtag._meta.get_field("name").max_length
+
+
+def normalize_hashtag(name):
+    """
+    全角・半角や大文字・小文字の違いを吸収したハッシュタグ名を返す
+    """
+
+    return unicodedata.normalize("NFKC", name).lower()
+
+
+def extract_hashtags(content):
+    hashtags = []
+    for match in HASHTAG_RE.finditer(content):
+        name = normalize_hashtag(match.group(1))
+        if len(name) <= HASHTAG_MAX_LENGTH and name not in hashtags:
+            hashtags.append(name)
+    return hashtags
+
+
+def extract_mentions(content):
+    """
+    メンションされたユーザ名の候補を返す（文末の "." はユーザ名に含めない場合も試す）
+    """
+
+    usernames = []
+    for match in MENTION_RE.finditer(content):
+        for username in (match.group(1), match.group(1).rstrip(".")):
+            if username and username not in usernames:
+                usernames.append(username)
+    return usernames
+
+
+def index_tweets(tweets, using):
+    """
+    同じシャードにあるツイートのハッシュタグとメンションをまとめて索引に登録する
+    """
+
+    hashtags_by_tweet = {tweet.pk: extract_hashtags(tweet.content) for tweet in tweets}
+    mentions_by_tweet = {tweet.pk: extract_mentions(tweet.content) for tweet in tweets}
+
+    names = {name for hashtags in hashtags_by_tweet.values() for name in hashtags}
+    if names:
+        Hashtag.objects.using(using).bulk_create(
+            [Hashtag(name=name) for name in names], ignore_conflicts=True
+        )
+        hashtag_ids = dict(
+            Hashtag.objects.using(using)
+            .filter(name__in=names)
+            .values_list("name", "id")
+        )
+        TweetHashtag.objects.using(using).bulk_create(
+            [
+                TweetHashtag(hashtag_id=hashtag_ids[name], tweet_id=tweet_id)
+                for tweet_id, hashtags in hashtags_by_tweet.items()
+                for name in hashtags
+            ],
+            ignore_conflicts=True,
+        )
+
+    usernames = {name for mentions in mentions_by_tweet.values() for name in mentions}
+    if usernames:
+        account_ids = dict(
+            Account.objects.filter(username__in=usernames).values_list("username", "id")
+        )
+        Mention.objects.using(using).bulk_create(
+            [
+                Mention(account_id=account_ids[username], tweet_id=tweet_id)
+                for tweet_id, mentions in mentions_by_tweet.items()
+                for username in mentions
+                if username in account_ids
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def index_tweet_entities(tweet):
+    """
+    投稿されたツイートのハッシュタグとメンションを索引に登録し，ハッシュタグを返す
+    """
+
+    index_tweets([tweet], tweet._state.db)
+    return extract_hashtags(tweet.content)
+
+
+def _timeline(links, before, limit):
+    links = (
+        links.filter(tweet__is_deleted=False)
+        .select_related("tweet")
+        .prefetch_related("tweet__user")
+        .order_by("-tweet_id")
+    )
+    if before is not None:
+        links = links.filter(tweet_id__lt=before)
+    return [link.tweet for link in ShardedQuerySet(links, key="tweet_id", limit=limit)]
+
+
+def hashtag_timeline(name, before=None, limit=ENTITY_PAGE_SIZE):
+    """
+    ハッシュタグの付いたツイートを新しい順に返す
+    """
+
+    links = TweetHashtag.objects.filter(hashtag__name=normalize_hashtag(name))
+    return _timeline(links, before, limit)
+
+
+def mention_timeline(account_id, before=None, limit=ENTITY_PAGE_SIZE):
+    """
+    ユーザがメンションされたツイートを新しい順に返す
+    """
+
+    return _timeline(Mention.objects.filter(account_id=account_id), before, limit)
+
+
+def backfill_entities(batch_size=BACKFILL_BATCH_SIZE, shards=None):
+    """
+    既存のツイートを batch_size 件ずつ索引に登録し，処理した件数を返す
+    """
+
+    indexed = 0
+    for shard in get_shards() if shards is None else shards:
+        last_id = None
+        while True:
+            tweets = Tweet.objects.using(shard).only("id", "content").order_by("id")
+            if last_id is not None:
+                tweets = tweets.filter(id__gt=last_id)
+            batch = list(tweets[:batch_size])
+            if not batch:
+                break
+            index_tweets(batch, shard)
+            indexed += len(batch)
+            last_id = batch[-1].pk
+    return indexed
@@ -0,0 +1,146 @@
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# 2022-01-01T00:00:00Z
+EPOCH_MS = 1640995200000
+
+WORKER_ID_BITS = 10
+SEQUENCE_BITS = 12
+
+MAX_WORKER_ID = (1 << WORKER_ID_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+TIMESTAMP_SHIFT = WORKER_ID_BITS + SEQUENCE_BITS
+
+
+class SnowflakeGenerator:
+    """
+    時刻・ワーカーID・シーケンスからなる64bitのIDを生成する
+
+    同じワーカー内では単調増加し，時計が巻き戻っても値は減らない．
+    """
+
+    def __init__(self, worker_id, clock=None):
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKER_ID}")
+        self.worker_id = worker_id
+        self.clock = clock or (lambda: time.time_ns() // 1_000_000)
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self):
+        with self._lock:
+            now = self.clock() - EPOCH_MS
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            else:
+                # 同じミリ秒内，または時計が巻き戻った場合は直前の時刻を使い続ける
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    self._last_ms += 1
+            return (
+                (self._last_ms << TIMESTAMP_SHIFT)
+                | (self.worker_id << SEQUENCE_BITS)
+                | self._sequence
+            )
+
+
+def parse_id(snowflake_id):
+    """
+    IDを（生成時刻，ワーカーID，シーケンス）に分解する
+    """
+
+    timestamp_ms = (snowflake_id >> TIMESTAMP_SHIFT) + EPOCH_MS
+    return (
+        datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc),
+        (snowflake_id >> SEQUENCE_BITS) & MAX_WORKER_ID,
+        snowflake_id & MAX_SEQUENCE,
+    )
+
+
+def min_id_for(dt):
+    """
+    指定した時刻以降に生成されたIDの下限を返す（時刻による範囲検索用）
+    """
+
+    timestamp_ms = int(dt.timestamp() * 1000) - EPOCH_MS
+    return max(timestamp_ms, 0) << TIMESTAMP_SHIFT
+
+
+_worker_lock_file = None
+
+
+def _claim_worker_id():
+    """
+    ロックファイルで同じホスト上のプロセス間で重複しないワーカーIDを確保する
+    """
+
+    global _worker_lock_file
+
+    start, stop = getattr(settings, "TWEET_ID_WORKER_ID_RANGE", (0, MAX_WORKER_ID + 1))
+    if fcntl is None:
+        return start + os.getpid() % (stop - start)
+
+    lock_dir = getattr(settings, "TWEET_ID_LOCK_DIR", None) or os.path.join(
+        tempfile.gettempdir(), "twitter_clone_tweet_ids"
+    )
+    os.makedirs(lock_dir, exist_ok=True)
+    for worker_id in range(start, stop):
+        lock_file = open(os.path.join(lock_dir, f"worker-{worker_id}.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        if _worker_lock_file is not None:
+            _worker_lock_file.close()
+        _worker_lock_file = lock_file
+        return worker_id
+    raise RuntimeError("No free tweet id worker id is available.")
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def _get_generator():
+    global _generator
+
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                worker_id = getattr(settings, "TWEET_ID_WORKER_ID", None)
+                if worker_id is None:
+                    worker_id = _claim_worker_id()
+                _generator = SnowflakeGenerator(worker_id)
+    return _generator
+
+
+def _reset_after_fork():
+    global _generator, _worker_lock_file
+
+    # 子プロセスは親のワーカーIDを引き継がず，新しく確保し直す
+    # （継承したファイルを閉じても親プロセスのロックは解放されない）
+    if _worker_lock_file is not None:
+        _worker_lock_file.close()
+    _generator = None
+    _worker_lock_file = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def generate_tweet_id():
+    return _get_generator().next_id()
@@ -0,0 +1,8 @@
+from jobqueue.queue import job
+
+from .deletion import PURGE_BATCH_SIZE, purge_deleted_tweets
+
+
+@job("tweet.purge_deleted_tweets")
+def purge_deleted_tweets_job(batch_size=PURGE_BATCH_SIZE):
+    purge_deleted_tweets(batch_size=batch_size)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from tweet.entities import BACKFILL_BATCH_SIZE, backfill_entities
+
+
+class Command(BaseCommand):
+    help = "既存のツイートのハッシュタグとメンションを索引に登録する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+
+    def handle(self, *args, batch_size, **options):
+        indexed = backfill_entities(batch_size=batch_size)
+        self.stdout.write(f"{indexed} 件のツイートを索引に登録しました")
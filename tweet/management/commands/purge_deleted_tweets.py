@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tweet.deletion import PURGE_BATCH_SIZE, purge_deleted_tweets
+
+
+class Command(BaseCommand):
+    help = "論理削除されたツイートとそのいいねを少しずつ物理削除する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=PURGE_BATCH_SIZE)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=None,
+            help="指定した秒数ごとに削除を繰り返す（指定しない場合は1回だけ実行する）",
+        )
+
+    def handle(self, *args, batch_size, interval, **options):
+        while True:
+            purged = purge_deleted_tweets(batch_size=batch_size)
+            self.stdout.write(f"{purged} 件のツイートを削除しました")
+            if interval is None:
+                return
+            time.sleep(interval)
@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+
+from tweet.entities import index_tweets
+from tweet.models import FavoriteConnection, Tweet
+from tweet.sharding import get_shard_databases, shard_for_user
+
+
+class Command(BaseCommand):
+    help = "TWEET_SHARDS の設定に合わせてツイート・いいね・ハッシュタグとメンションの索引を正しいシャードへ移動する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="移動対象の件数だけを表示する",
+        )
+
+    def handle(self, *args, batch_size, dry_run, **options):
+        for source in ["default", *sorted(get_shard_databases() - {"default"})]:
+            try:
+                moved = self.rebalance_shard(source, batch_size, dry_run)
+            except DatabaseError as e:
+                self.stderr.write(f"{source}: スキップしました ({e})")
+                continue
+            self.stdout.write(f"{source}: {moved} 件のツイートを移動しました")
+
+    def rebalance_shard(self, source, batch_size, dry_run):
+        moved = 0
+        last_id = None
+        while True:
+            queryset = Tweet.all_objects.using(source).order_by("id")
+            if last_id is not None:
+                queryset = queryset.filter(id__gt=last_id)
+            batch = list(queryset[:batch_size])
+            if not batch:
+                return moved
+            last_id = batch[-1].id
+
+            misplaced = {}
+            for tweet in batch:
+                target = shard_for_user(tweet.user_id)
+                if target != source:
+                    misplaced.setdefault(target, []).append(tweet)
+            for target, tweets in misplaced.items():
+                if not dry_run:
+                    self.move_tweets(tweets, source, target)
+                moved += len(tweets)
+
+    def move_tweets(self, tweets, source, target):
+        """
+        移動先へコピーしてから移動元を削除する（途中で止まっても再実行できる）
+
+        ハッシュタグとメンションの索引は移動元のツイートの削除とともに消えるため，
+        移動先で内容から作り直す．
+        """
+
+        tweet_ids = [tweet.id for tweet in tweets]
+        favorites = list(
+            FavoriteConnection.objects.using(source).filter(
+                favorited_tweet_id__in=tweet_ids
+            )
+        )
+        with transaction.atomic(using=target):
+            Tweet.all_objects.using(target).bulk_create(tweets, ignore_conflicts=True)
+            # 同じIDの別のツイートが移動先にあるとコピーが無視されるため，索引といいねを
+            # 作る前に確かめ，あればトランザクションごと取り消す
+            copied = dict(
+                Tweet.all_objects.using(target)
+                .filter(id__in=tweet_ids)
+                .values_list("id", "user_id")
+            )
+            conflicts = [
+                tweet.id for tweet in tweets if copied.get(tweet.id) != tweet.user_id
+            ]
+            if conflicts:
+                raise CommandError(
+                    f"Tweets {conflicts} could not be copied from {source} to {target}: "
+                    "a different tweet with the same id exists on the target."
+                )
+            index_tweets(tweets, using=target)
+            for favorite in favorites:
+                favorite.pk = None
+            FavoriteConnection.objects.using(target).bulk_create(
+                favorites, ignore_conflicts=True
+            )
+        with transaction.atomic(using=source):
+            FavoriteConnection.objects.using(source).filter(
+                favorited_tweet_id__in=tweet_ids
+            ).delete()
+            Tweet.all_objects.using(source).filter(id__in=tweet_ids).delete()
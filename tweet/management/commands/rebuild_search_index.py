@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from tweet.search import rebuild_search_index
+from tweet.sharding import get_shards
+
+
+class Command(BaseCommand):
+    help = "ツイートの全文検索の索引を作り直す"
+
+    def handle(self, *args, **options):
+        for shard in get_shards():
+            rebuild_search_index(using=shard)
+            self.stdout.write(f"{shard}: 索引を作り直しました")
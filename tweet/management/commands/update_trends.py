@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tweet.trends import update_snapshot
+
+
+class Command(BaseCommand):
+    help = "トレンドのスナップショットを作り直す"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=None,
+            help="指定した秒数ごとに作り直す（指定しない場合は1回だけ実行する）",
+        )
+
+    def handle(self, *args, interval, **options):
+        while True:
+            trends = update_snapshot()
+            self.stdout.write(
+                ", ".join(f"#{name} ({count})" for name, count in trends)
+                or "トレンドはありません"
+            )
+            if interval is None:
+                return
+            time.sleep(interval)
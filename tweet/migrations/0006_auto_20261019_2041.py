@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-19 11:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tweet', '0005_auto_20220812_1603'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='favoriteconnection',
+            name='favorite_account',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='favorite_account', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='tweet',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='tweet', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
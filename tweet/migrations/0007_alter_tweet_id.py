@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-19 11:45
+
+from django.db import migrations, models
+import tweet.ids
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tweet', '0006_auto_20261019_2041'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tweet',
+            name='id',
+            field=models.BigIntegerField(default=tweet.ids.generate_tweet_id, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
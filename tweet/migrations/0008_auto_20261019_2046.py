@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-19 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tweet', '0007_alter_tweet_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tweet',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='deleted at'),
+        ),
+        migrations.AddField(
+            model_name='tweet',
+            name='is_deleted',
+            field=models.BooleanField(default=False, verbose_name='is deleted'),
+        ),
+        migrations.AddIndex(
+            model_name='tweet',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at'], name='tweet_tombstone_idx'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+from django.db import migrations
+
+# ツイートの全文検索用の FTS5 仮想テーブル（trigram による n-gram 分割）
+# tweet_tweet を外部コンテンツとし，論理削除されていないツイートだけをトリガーで同期する
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE tweet_tweet_fts USING fts5(
+        content, content='tweet_tweet', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER tweet_tweet_fts_insert AFTER INSERT ON tweet_tweet
+    WHEN new.is_deleted = 0 BEGIN
+        INSERT INTO tweet_tweet_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER tweet_tweet_fts_delete AFTER DELETE ON tweet_tweet
+    WHEN old.is_deleted = 0 BEGIN
+        INSERT INTO tweet_tweet_fts(tweet_tweet_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER tweet_tweet_fts_update AFTER UPDATE OF content, is_deleted
+    ON tweet_tweet BEGIN
+        INSERT INTO tweet_tweet_fts(tweet_tweet_fts, rowid, content)
+        SELECT 'delete', old.id, old.content WHERE old.is_deleted = 0;
+        INSERT INTO tweet_tweet_fts(rowid, content)
+        SELECT new.id, new.content WHERE new.is_deleted = 0;
+    END
+    """,
+    """
+    INSERT INTO tweet_tweet_fts(rowid, content)
+    SELECT id, content FROM tweet_tweet WHERE is_deleted = 0
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS tweet_tweet_fts_insert",
+    "DROP TRIGGER IF EXISTS tweet_tweet_fts_delete",
+    "DROP TRIGGER IF EXISTS tweet_tweet_fts_update",
+    "DROP TABLE IF EXISTS tweet_tweet_fts",
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tweet', '0008_auto_20261019_2046'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_search_index, drop_search_index, hints={'model_name': 'tweet'}
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tweet', '0010_hashtag_mention'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minute', models.DateTimeField(verbose_name='minute')),
+                ('name', models.CharField(max_length=100, verbose_name='name')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='count')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='trendbucket',
+            constraint=models.UniqueConstraint(fields=('minute', 'name'), name='trend_bucket_unique'),
+        ),
+    ]
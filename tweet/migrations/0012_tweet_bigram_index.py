@@ -0,0 +1,87 @@
+from django.db import migrations
+
+# 3文字未満の検索語用の bigram の索引（trigram の FTS5 では引けないため）
+# 各ツイートの本文の各位置から始まる2文字（末尾は1文字）を小文字にして保存する．
+# トリガーでは再帰的な CTE が使えないため，位置は tweet_tweet_bigram_offset から取る．
+
+MAX_CONTENT_LENGTH = 255
+
+CREATE_SQL = [
+    "CREATE TABLE tweet_tweet_bigram_offset (i INTEGER PRIMARY KEY)",
+    f"""
+    WITH RECURSIVE n(i) AS (
+        SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {MAX_CONTENT_LENGTH}
+    )
+    INSERT INTO tweet_tweet_bigram_offset(i) SELECT i FROM n
+    """,
+    """
+    CREATE TABLE tweet_tweet_bigram (
+        gram TEXT NOT NULL, tweet_id INTEGER NOT NULL, PRIMARY KEY (gram, tweet_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX tweet_tweet_bigram_tweet_id ON tweet_tweet_bigram(tweet_id)",
+    """
+    CREATE TRIGGER tweet_tweet_bigram_insert AFTER INSERT ON tweet_tweet
+    WHEN new.is_deleted = 0 BEGIN
+        INSERT OR IGNORE INTO tweet_tweet_bigram(gram, tweet_id)
+        SELECT lower(substr(new.content, i, 2)), new.id
+        FROM tweet_tweet_bigram_offset WHERE i <= length(new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER tweet_tweet_bigram_delete AFTER DELETE ON tweet_tweet BEGIN
+        DELETE FROM tweet_tweet_bigram WHERE tweet_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER tweet_tweet_bigram_update AFTER UPDATE OF content, is_deleted
+    ON tweet_tweet BEGIN
+        DELETE FROM tweet_tweet_bigram WHERE tweet_id = old.id;
+        INSERT OR IGNORE INTO tweet_tweet_bigram(gram, tweet_id)
+        SELECT lower(substr(new.content, i, 2)), new.id
+        FROM tweet_tweet_bigram_offset
+        WHERE new.is_deleted = 0 AND i <= length(new.content);
+    END
+    """,
+    """
+    INSERT OR IGNORE INTO tweet_tweet_bigram(gram, tweet_id)
+    SELECT lower(substr(content, i, 2)), id
+    FROM tweet_tweet JOIN tweet_tweet_bigram_offset
+    WHERE is_deleted = 0 AND i <= length(content)
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS tweet_tweet_bigram_insert",
+    "DROP TRIGGER IF EXISTS tweet_tweet_bigram_delete",
+    "DROP TRIGGER IF EXISTS tweet_tweet_bigram_update",
+    "DROP TABLE IF EXISTS tweet_tweet_bigram",
+    "DROP TABLE IF EXISTS tweet_tweet_bigram_offset",
+]
+
+
+def create_bigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_bigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tweet', '0011_trendbucket'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_bigram_index, drop_bigram_index, hints={'model_name': 'tweet'}
+        ),
+    ]
@@ -3,11 +3,42 @@ from django.utils.translation import gettext_lazy as _
 
 from account.models import Account
 
+from .ids import generate_tweet_id
+from .sharding import ShardAwareQuerySet
+
+
+class TweetManager(models.Manager.from_queryset(ShardAwareQuerySet)):
+    """
+    削除済み（論理削除）のツイートを除外するマネージャ
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
 
 class Tweet(models.Model):
-    user = models.ForeignKey(Account, on_delete=models.CASCADE, related_name="tweet")
+    id = models.BigIntegerField(
+        primary_key=True, default=generate_tweet_id, editable=False
+    )
+    user = models.ForeignKey(
+        Account, on_delete=models.CASCADE, related_name="tweet", db_constraint=False
+    )
     content = models.CharField(_("content"), max_length=255)
     created_at = models.DateTimeField(verbose_name="投稿日時", auto_now_add=True)
+    is_deleted = models.BooleanField(_("is deleted"), default=False)
+    deleted_at = models.DateTimeField(_("deleted at"), null=True, blank=True)
+
+    objects = TweetManager()
+    all_objects = ShardAwareQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["deleted_at"],
+                condition=models.Q(is_deleted=True),
+                name="tweet_tombstone_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.content
@@ -15,13 +46,18 @@ class Tweet(models.Model):
 
 class FavoriteConnection(models.Model):
     favorite_account = models.ForeignKey(
-        Account, related_name="favorite_account", on_delete=models.CASCADE
+        Account,
+        related_name="favorite_account",
+        on_delete=models.CASCADE,
+        db_constraint=False,
     )
     favorited_tweet = models.ForeignKey(
         Tweet, related_name="favorited_tweet", on_delete=models.CASCADE
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ShardAwareQuerySet.as_manager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -32,3 +68,74 @@ class FavoriteConnection(models.Model):
 
     def __str__(self):
         return f"{self.favorite_account.username} : {self.favorited_tweet.content}"
+
+
+class Hashtag(models.Model):
+    name = models.CharField(_("name"), max_length=100, unique=True)
+
+    def __str__(self):
+        return f"#{self.name}"
+
+
+class TweetHashtag(models.Model):
+    hashtag = models.ForeignKey(
+        Hashtag, related_name="tweet_links", on_delete=models.CASCADE, db_index=False
+    )
+    tweet = models.ForeignKey(
+        Tweet, related_name="hashtag_links", on_delete=models.CASCADE
+    )
+
+    objects = ShardAwareQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # ハッシュタグのページは (hashtag_id, tweet_id) の索引だけで新しい順に引ける
+            models.UniqueConstraint(
+                fields=["hashtag", "tweet"], name="tweet_hashtag_unique"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.hashtag} : {self.tweet.content}"
+
+
+class Mention(models.Model):
+    account = models.ForeignKey(
+        Account,
+        related_name="mentioned",
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        db_index=False,
+    )
+    tweet = models.ForeignKey(Tweet, related_name="mentions", on_delete=models.CASCADE)
+
+    objects = ShardAwareQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # メンションのページは (account_id, tweet_id) の索引だけで新しい順に引ける
+            models.UniqueConstraint(fields=["account", "tweet"], name="mention_unique"),
+        ]
+
+    def __str__(self):
+        return f"@{self.account.username} : {self.tweet.content}"
+
+
+class TrendBucket(models.Model):
+    """
+    ハッシュタグが1分間に使われた回数（全プロセスの合計）
+    """
+
+    minute = models.DateTimeField(_("minute"))
+    name = models.CharField(_("name"), max_length=100)
+    count = models.PositiveIntegerField(_("count"), default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["minute", "name"], name="trend_bucket_unique"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.minute:%Y-%m-%d %H:%M} #{self.name} : {self.count}"
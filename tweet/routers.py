@@ -0,0 +1,55 @@
+from .sharding import (
+    SHARDED_MODEL_NAMES,
+    get_shard_databases,
+    get_shards,
+    is_sharded_model,
+    shard_for_user,
+)
+
+
+class TweetShardRouter:
+    """
+    ツイートといいねを投稿者のIDでシャードに振り分けるルーター
+    """
+
+    def _db_for_instance(self, model, instance):
+        if instance is None:
+            return None
+        if not is_sharded_model(instance.__class__):
+            # 関連マネージャ（account.tweet など）経由の場合は投稿者のシャードを使う
+            if model._meta.model_name == "tweet" and instance.pk is not None:
+                return shard_for_user(instance.pk)
+            return None
+        if instance._state.db is not None:
+            return instance._state.db
+        if model._meta.model_name == "tweet" and instance.user_id is not None:
+            return shard_for_user(instance.user_id)
+        if model._meta.model_name == "favoriteconnection":
+            tweet = model.favorited_tweet.field.get_cached_value(instance, None)
+            if tweet is not None:
+                return tweet._state.db or shard_for_user(tweet.user_id)
+        if model._meta.model_name in ("tweethashtag", "mention"):
+            tweet = model.tweet.field.get_cached_value(instance, None)
+            if tweet is not None:
+                return tweet._state.db or shard_for_user(tweet.user_id)
+        return None
+
+    def db_for_read(self, model, **hints):
+        if not is_sharded_model(model):
+            return "default"
+        return self._db_for_instance(model, hints.get("instance")) or get_shards()[0]
+
+    def db_for_write(self, model, **hints):
+        if not is_sharded_model(model):
+            return "default"
+        return self._db_for_instance(model, hints.get("instance")) or get_shards()[0]
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if is_sharded_model(obj1.__class__) or is_sharded_model(obj2.__class__):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == "default" or db not in get_shard_databases():
+            return None
+        return app_label == "tweet" and model_name in SHARDED_MODEL_NAMES
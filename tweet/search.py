@@ -0,0 +1,143 @@
+import heapq
+from itertools import islice
+
+from django.db import connections
+
+from .models import Tweet
+from .sharding import get_shards
+
+SEARCH_PAGE_SIZE = 20
+
+# trigram トークナイザは3文字未満の語を索引から引けないため，短い語は bigram の索引で探す
+MIN_INDEXED_QUERY_LENGTH = 3
+
+
+def _fts_query(query):
+    """
+    入力をそのままフレーズとして検索する（FTS5 の演算子として解釈させない）
+    """
+
+    return '"' + query.replace('"', '""') + '"'
+
+
+def _search_shard(shard, query, cursor, limit):
+    queryset = Tweet.objects.using(shard)
+    # アカウントと同じデータベースにあるシャードでは著者も同じクエリで取得する
+    if shard == "default":
+        queryset = queryset.select_related("user")
+    else:
+        queryset = queryset.prefetch_related("user")
+
+    if connections[shard].vendor != "sqlite":
+        queryset = queryset.filter(content__icontains=query).order_by("-id")
+        if cursor is not None:
+            queryset = queryset.filter(id__lt=cursor[1])
+        return _unranked(queryset[:limit])
+
+    if len(query) < MIN_INDEXED_QUERY_LENGTH:
+        return _unranked(_search_bigrams(queryset, query, cursor, limit))
+
+    where = [
+        "tweet_tweet_fts.rowid = tweet_tweet.id",
+        "tweet_tweet_fts MATCH %s",
+    ]
+    params = [_fts_query(query)]
+    if cursor is not None:
+        # bm25() は小さいほど関連度が高い．(rank, -id) の順で続きから取得する
+        where.append(
+            "(bm25(tweet_tweet_fts) > %s"
+            " OR (bm25(tweet_tweet_fts) = %s AND tweet_tweet.id < %s))"
+        )
+        params += [cursor[0], cursor[0], cursor[1]]
+    queryset = queryset.extra(
+        select={"rank": "bm25(tweet_tweet_fts)"},
+        tables=["tweet_tweet_fts"],
+        where=where,
+        params=params,
+    ).order_by("rank", "-id")
+    return list(queryset[:limit])
+
+
+def _unranked(tweets):
+    tweets = list(tweets)
+    for tweet in tweets:
+        tweet.rank = 0.0
+    return tweets
+
+
+def _search_bigrams(queryset, query, cursor, limit):
+    """
+    1・2文字の語を含むツイートを bigram の索引から新しい順に探す
+
+    索引には本文の各位置から始まる2文字（末尾は1文字）があるため，
+    語で始まるものを引けば1文字の語も2文字の語も探せる．
+    """
+
+    where = [
+        "gram >= lower(%s)",
+        "gram < lower(%s) || char(1114111)",
+    ]
+    params = [query, query]
+    if cursor is not None:
+        where.append("tweet_id < %s")
+        params.append(cursor[1])
+    ids = (
+        "SELECT DISTINCT tweet_id FROM tweet_tweet_bigram"
+        f" WHERE {' AND '.join(where)} ORDER BY tweet_id DESC LIMIT %s"
+    )
+    return queryset.extra(
+        where=[f"tweet_tweet.id IN ({ids})"], params=params + [limit]
+    ).order_by("-id")
+
+
+def search_tweets(query, cursor=None, limit=SEARCH_PAGE_SIZE):
+    """
+    ツイートを BM25 の関連度順に検索する
+
+    cursor には前のページの最後のツイートの (rank, id) を渡す．
+    """
+
+    query = query.strip()
+    if not query:
+        return []
+    results = [_search_shard(shard, query, cursor, limit) for shard in get_shards()]
+    merged = heapq.merge(*results, key=lambda tweet: (tweet.rank, -tweet.id))
+    return list(islice(merged, limit))
+
+
+def encode_cursor(tweet):
+    return f"{tweet.rank!r}_{tweet.id}"
+
+
+def decode_cursor(value):
+    """
+    カーソルの文字列を (rank, id) に戻す（不正な値の場合はNone）
+    """
+
+    try:
+        rank, tweet_id = value.rsplit("_", 1)
+        return float(rank), int(tweet_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def rebuild_search_index(using="default"):
+    """
+    全文検索と bigram の索引を作り直す（トリガーが無効になっていた場合の復旧用）
+    """
+
+    with connections[using].cursor() as cursor:
+        cursor.execute("DELETE FROM tweet_tweet_bigram")
+        cursor.execute(
+            "INSERT OR IGNORE INTO tweet_tweet_bigram(gram, tweet_id)"
+            " SELECT lower(substr(content, i, 2)), id"
+            " FROM tweet_tweet JOIN tweet_tweet_bigram_offset"
+            " WHERE is_deleted = 0 AND i <= length(content)"
+        )
+        cursor.execute(
+            "INSERT INTO tweet_tweet_fts(tweet_tweet_fts) VALUES ('delete-all')"
+        )
+        cursor.execute(
+            "INSERT INTO tweet_tweet_fts(rowid, content)"
+            " SELECT id, content FROM tweet_tweet WHERE is_deleted = 0"
+        )
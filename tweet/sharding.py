@@ -0,0 +1,171 @@
+import heapq
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import models
+from django.http import Http404
+
+SHARDED_MODEL_NAMES = {
+    "tweet",
+    "favoriteconnection",
+    "hashtag",
+    "tweethashtag",
+    "mention",
+}
+
+
+def get_shards():
+    """
+    ツイートを保持するデータベースエイリアスの一覧を返す
+    """
+
+    return list(getattr(settings, "TWEET_SHARDS", ["default"]))
+
+
+def get_shard_databases():
+    """
+    シャードとして利用できる（マイグレーション対象の）エイリアスの一覧を返す
+    """
+
+    shard_databases = set(getattr(settings, "TWEET_SHARD_DATABASES", []))
+    return shard_databases | set(get_shards())
+
+
+def is_sharded_model(model):
+    return (
+        model._meta.app_label == "tweet"
+        and model._meta.model_name in SHARDED_MODEL_NAMES
+    )
+
+
+def shard_for_user(user_id):
+    """
+    投稿者のIDからツイートを保存するシャードを決定する
+    """
+
+    shards = get_shards()
+    return shards[int(user_id) % len(shards)]
+
+
+class ShardAwareQuerySet(models.QuerySet):
+    """
+    create() 時にインスタンスからシャードを決定するクエリセット
+    """
+
+    def create(self, **kwargs):
+        if self._db is not None:
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True)
+        return obj
+
+
+def find_tweet(tweet_id, queryset=None):
+    """
+    全シャードからツイートを探して返す（見つからなければNone）
+    """
+
+    from .models import Tweet
+
+    if queryset is None:
+        queryset = Tweet.objects.all()
+    for shard in get_shards():
+        tweet = queryset.using(shard).filter(pk=tweet_id).first()
+        if tweet is not None:
+            return tweet
+    return None
+
+
+def get_tweet_or_404(tweet_id, queryset=None):
+    """
+    全シャードからツイートを探し，見つからなければ404を返す
+    """
+
+    tweet = find_tweet(tweet_id, queryset=queryset)
+    if tweet is None:
+        raise Http404("No Tweet matches the given query.")
+    return tweet
+
+
+class ShardedQuerySet:
+    """
+    各シャードのクエリセットを並び順を保ったまま統合する（scatter-gather）
+    """
+
+    def __init__(self, queryset, key="id", reverse=True, shards=None, limit=None):
+        self.queryset = queryset
+        self.key = key
+        self.reverse = reverse
+        self.shards = get_shards() if shards is None else list(shards)
+        self.limit = limit
+        self._result_cache = None
+
+    def __getstate__(self):
+        # 結果だけを保存する（QuerySet は pickle 時に全件を評価してしまうため）
+        self._fetch_all()
+        return {**self.__dict__, "queryset": None}
+
+    def _shard_querysets(self):
+        querysets = [self.queryset.using(shard) for shard in self.shards]
+        if self.limit is not None:
+            querysets = [qs[: self.limit] for qs in querysets]
+        return querysets
+
+    def _merge(self, querysets):
+        return heapq.merge(*querysets, key=attrgetter(self.key), reverse=self.reverse)
+
+    def _fetch_all(self):
+        if self._result_cache is None:
+            self._result_cache = list(
+                islice(self._merge(self._shard_querysets()), self.limit)
+            )
+
+    def __iter__(self):
+        self._fetch_all()
+        return iter(self._result_cache)
+
+    def __len__(self):
+        self._fetch_all()
+        return len(self._result_cache)
+
+    def __bool__(self):
+        self._fetch_all()
+        return bool(self._result_cache)
+
+    def __getitem__(self, k):
+        if self._result_cache is not None or self.limit is not None:
+            self._fetch_all()
+            return self._result_cache[k]
+        if isinstance(k, slice):
+            if k.step is not None or (k.start or 0) < 0 or (k.stop or 0) < 0:
+                raise ValueError("Negative indexing and steps are not supported.")
+            if k.stop is None:
+                self._fetch_all()
+                return self._result_cache[k]
+            querysets = [qs[: k.stop] for qs in self._shard_querysets()]
+            return list(islice(self._merge(querysets), k.start, k.stop))
+        if k < 0:
+            raise ValueError("Negative indexing is not supported.")
+        return self[k : k + 1][0]
+
+    def count(self):
+        if self._result_cache is not None or self.limit is not None:
+            return len(self)
+        return sum(qs.count() for qs in self._shard_querysets())
+
+    def exists(self):
+        if self._result_cache is not None:
+            return bool(self._result_cache)
+        return any(qs.exists() for qs in self._shard_querysets())
+
+    def values_list(self, *fields, flat=False):
+        """
+        各シャードの結果を連結した値のリストを返す（並び順は保証しない）
+        """
+
+        values = []
+        for qs in self._shard_querysets():
+            values.extend(qs.values_list(*fields, flat=flat))
+        return values
@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from account.cache import bump_account_version
+from account.models import Account
+
+from .cache import invalidate_tweets
+from .models import FavoriteConnection, Mention, Tweet
+from .sharding import get_shards
+
+
+@receiver([post_save, post_delete], sender=Tweet)
+def tweet_changed(sender, instance, **kwargs):
+    invalidate_tweets(instance.pk)
+    bump_account_version(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=FavoriteConnection)
+def favorite_connection_changed(sender, instance, **kwargs):
+    bump_account_version(instance.favorite_account_id)
+
+
+@receiver(post_delete, sender=Account)
+def account_deleted(sender, instance, **kwargs):
+    # 外部キー制約がないため，他のシャードのツイート・いいね・メンションは連鎖して削除されない
+    for shard in get_shards():
+        FavoriteConnection.objects.using(shard).filter(
+            favorite_account_id=instance.pk
+        ).delete()
+        Mention.objects.using(shard).filter(account_id=instance.pk).delete()
+        Tweet.all_objects.using(shard).filter(user_id=instance.pk).delete()
@@ -0,0 +1,21 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import conditional_escape, format_html
+from django.utils.safestring import mark_safe
+
+from tweet.entities import HASHTAG_RE, normalize_hashtag
+
+register = template.Library()
+
+
+@register.filter(is_safe=True)
+def link_hashtags(value):
+    """
+    ツイートの本文中のハッシュタグをハッシュタグのページへのリンクにする
+    """
+
+    def replace(match):
+        url = reverse("tweet:hashtag", args=[normalize_hashtag(match.group(1))])
+        return format_html('<a href="{}">{}</a>', url, match.group(0))
+
+    return mark_safe(HASHTAG_RE.sub(replace, conditional_escape(value)))
@@ -1,11 +1,47 @@
+import time
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.http import HttpResponseNotAllowed
 from django.shortcuts import redirect
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from .models import Tweet, FavoriteConnection
+from .models import (
+    FavoriteConnection,
+    Hashtag,
+    Mention,
+    TrendBucket,
+    Tweet,
+    TweetHashtag,
+)
+from .deletion import purge_deleted_tweets, tombstone_tweet
+from .entities import (
+    ENTITY_PAGE_SIZE,
+    extract_hashtags,
+    extract_mentions,
+    hashtag_timeline,
+    index_tweet_entities,
+    mention_timeline,
+)
 from .forms import TweetForm
+from .ids import EPOCH_MS, SnowflakeGenerator, min_id_for, parse_id
+from .search import SEARCH_PAGE_SIZE, search_tweets
+from .trends import (
+    SNAPSHOT_KEY,
+    TrendCounter,
+    get_trends,
+    trend_counter,
+    update_snapshot,
+)
+from .sharding import find_tweet, shard_for_user
 from account.models import Account, Profile
+from twitter_clone.testing import QueryBudgetMixin
 
 
 class TweetCreateTest(TestCase):
@@ -433,3 +469,755 @@ class UnFavoriteTest(TestCase):
         response = self.client.patch(path=self.path)
         self.assertEqual(response.status_code, 405)
         self.assertIsInstance(response, HttpResponseNotAllowed)
+
+
+@override_settings(TWEET_SHARDS=["default", "tweet_shard_1", "tweet_shard_2"])
+class TweetShardingTest(TestCase):
+    """
+    ツイートのシャーディングに対するテスト
+    """
+
+    databases = {"default", "tweet_shard_1", "tweet_shard_2"}
+
+    def setUp(self):
+        self.users = []
+        for i in range(1, 4):
+            user = Account.objects.create_user(
+                email=f"sample{i}@example.com",
+                username=f"sample{i}",
+                password=f"instance{i}",
+            )
+            Profile.objects.create(user=user)
+            self.users.append(user)
+        self.client.force_login(self.users[0])
+
+    def test_tweet_is_saved_to_author_shard(self):
+        """
+        ツイートが投稿者のシャードに保存される場合
+        """
+
+        response = self.client.post(
+            path=reverse("account:home"), data={"content": "Hello, shard."}
+        )
+        self.assertEqual(response.status_code, 302)
+
+        shard = shard_for_user(self.users[0].pk)
+        self.assertEqual(Tweet.objects.using(shard).count(), 1)
+        for other in {"default", "tweet_shard_1", "tweet_shard_2"} - {shard}:
+            self.assertEqual(Tweet.objects.using(other).count(), 0)
+
+    def test_read_tweets_across_shards(self):
+        """
+        複数のシャードにまたがるツイートを参照・いいね・削除した場合
+        """
+
+        tweets = [
+            Tweet.objects.create(user=user, content=f"tweet{i}")
+            for i, user in enumerate(self.users, start=1)
+        ]
+        self.assertEqual(
+            {tweet._state.db for tweet in tweets},
+            {"default", "tweet_shard_1", "tweet_shard_2"},
+        )
+
+        response = self.client.get(path=reverse("account:home"))
+        self.assertEqual(
+            [tweet.id for tweet in response.context["tweet_list"]],
+            [tweet.id for tweet in reversed(tweets)],
+        )
+
+        for tweet in tweets:
+            response = self.client.get(
+                path=reverse("tweet:tweet_detail", args=[tweet.id])
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context["tweet"].content, tweet.content)
+
+            response = self.client.post(
+                path=reverse("tweet:favorite_tweet", args=[tweet.id])
+            )
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(
+                FavoriteConnection.objects.using(tweet._state.db).count(), 1
+            )
+
+        response = self.client.get(
+            path=reverse("account:account_detail", args=[self.users[0].id])
+        )
+        self.assertEqual(response.context["favorite_connection_list"].count(), 3)
+
+        response = self.client.get(
+            path=reverse("tweet:delete_tweet", args=[tweets[0].id])
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNone(find_tweet(tweets[0].id))
+        self.assertIsNotNone(find_tweet(tweets[1].id))
+
+    def test_rebalance_tweet_shards(self):
+        """
+        誤ったシャードにあるツイートを移動した場合
+        """
+
+        tweet = Tweet(user=self.users[0], content="misplaced")
+        tweet.save(using="tweet_shard_2")
+        FavoriteConnection.objects.using("tweet_shard_2").create(
+            favorite_account=self.users[1], favorited_tweet=tweet
+        )
+        self.assertNotEqual(shard_for_user(self.users[0].pk), "tweet_shard_2")
+
+        call_command("rebalance_tweet_shards", stdout=StringIO())
+
+        shard = shard_for_user(self.users[0].pk)
+        self.assertEqual(Tweet.objects.using("tweet_shard_2").count(), 0)
+        self.assertEqual(FavoriteConnection.objects.using("tweet_shard_2").count(), 0)
+        self.assertEqual(find_tweet(tweet.id)._state.db, shard)
+        self.assertEqual(FavoriteConnection.objects.using(shard).count(), 1)
+
+    def test_rebalance_conflict(self):
+        """
+        移動先に同じIDの別のツイートがある場合に移動元を削除せずに中止する場合
+        """
+
+        tweet = Tweet(user=self.users[0], content="misplaced #tag @sample2")
+        tweet.save(using="tweet_shard_2")
+        FavoriteConnection(favorite_account=self.users[1], favorited_tweet=tweet).save(
+            using="tweet_shard_2"
+        )
+        shard = shard_for_user(self.users[0].pk)
+        # 移動先のシャードに正しく置かれた，別のユーザの同じIDのツイート
+        other_user_id = self.users[0].pk + 3
+        self.assertEqual(shard_for_user(other_user_id), shard)
+        Tweet(id=tweet.id, user_id=other_user_id, content="other").save(using=shard)
+
+        with self.assertRaises(CommandError):
+            call_command("rebalance_tweet_shards", stdout=StringIO())
+        self.assertTrue(
+            Tweet.objects.using("tweet_shard_2").filter(id=tweet.id).exists()
+        )
+        # 移動先の別のツイートにいいねや索引が付かない
+        self.assertFalse(FavoriteConnection.objects.using(shard).exists())
+        self.assertFalse(TweetHashtag.objects.using(shard).exists())
+        self.assertFalse(Mention.objects.using(shard).exists())
+
+    def test_delete_account_on_every_shard(self):
+        """
+        アカウントを削除すると，全てのシャードのツイート・いいね・メンションが削除される場合
+        """
+
+        user = self.users[0]
+        other_tweet = Tweet.objects.create(user=self.users[1], content="@sample1")
+        index_tweet_entities(other_tweet)
+        FavoriteConnection.objects.create(
+            favorite_account=user, favorited_tweet=other_tweet
+        )
+        tweet = Tweet.objects.create(user=user, content="tweet")
+        self.assertNotEqual(tweet._state.db, "default")
+        self.assertNotEqual(other_tweet._state.db, "default")
+
+        user.delete()
+
+        self.assertIsNone(find_tweet(tweet.id))
+        self.assertIsNotNone(find_tweet(other_tweet.id))
+        for shard in ("default", "tweet_shard_1", "tweet_shard_2"):
+            self.assertFalse(
+                FavoriteConnection.objects.using(shard)
+                .filter(favorite_account_id=user.pk)
+                .exists()
+            )
+            self.assertFalse(
+                Mention.objects.using(shard).filter(account_id=user.pk).exists()
+            )
+
+    def test_rebalance_keeps_entities(self):
+        """
+        ハッシュタグとメンションを含むツイートを移動しても索引から辿れる場合
+        """
+
+        tweet = Tweet(user=self.users[0], content="#tag @sample2")
+        tweet.save(using="tweet_shard_2")
+        index_tweet_entities(tweet)
+        self.assertEqual(TweetHashtag.objects.using("tweet_shard_2").count(), 1)
+
+        call_command("rebalance_tweet_shards", stdout=StringIO())
+
+        shard = shard_for_user(self.users[0].pk)
+        self.assertEqual(TweetHashtag.objects.using("tweet_shard_2").count(), 0)
+        self.assertEqual(Mention.objects.using("tweet_shard_2").count(), 0)
+        self.assertEqual(
+            [t.id for t in hashtag_timeline("tag")],
+            [tweet.id],
+        )
+        self.assertEqual([t.id for t in mention_timeline(self.users[1].pk)], [tweet.id])
+        self.assertEqual(Mention.objects.using(shard).get().tweet_id, tweet.id)
+
+
+class TweetIdTest(TestCase):
+    """
+    ツイートIDの生成に対するテスト
+    """
+
+    def test_ids_are_monotonic(self):
+        """
+        同じミリ秒内に連続してIDを生成した場合
+        """
+
+        generator = SnowflakeGenerator(worker_id=5, clock=lambda: EPOCH_MS + 1000)
+        ids = [generator.next_id() for _ in range(5000)]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(parse_id(ids[0])[1:], (5, 0))
+
+    def test_clock_moves_backwards(self):
+        """
+        時計が巻き戻った場合
+        """
+
+        now = [EPOCH_MS + 1000]
+        generator = SnowflakeGenerator(worker_id=1, clock=lambda: now[0])
+        first = generator.next_id()
+        now[0] -= 500
+        second = generator.next_id()
+        self.assertGreater(second, first)
+
+    def test_tweet_ids_follow_creation_order(self):
+        """
+        ツイートのIDの順序が投稿順と一致する場合
+        """
+
+        user = Account.objects.create_user(
+            email="sample1@example.com", username="sample1", password="instance1"
+        )
+        tweets = [Tweet.objects.create(user=user, content=str(i)) for i in range(10)]
+        self.assertEqual(
+            list(Tweet.objects.order_by("-id")),
+            list(Tweet.objects.order_by("-created_at", "-id")),
+        )
+        self.assertEqual(list(Tweet.objects.order_by("id")), tweets)
+        self.assertLessEqual(parse_id(tweets[0].id)[0], tweets[0].created_at)
+        self.assertLess(tweets[0].id, min_id_for(tweets[-1].created_at + timedelta(1)))
+
+
+class TweetSoftDeleteTest(TestCase):
+    """
+    ツイートの論理削除と後からの物理削除に対するテスト
+    """
+
+    def setUp(self):
+        self.user1 = Account.objects.create_user(
+            email="sample1@example.com", username="sample1", password="instance1"
+        )
+        Profile.objects.create(user=self.user1)
+        self.user2 = Account.objects.create_user(
+            email="sample2@example.com", username="sample2", password="instance2"
+        )
+        Profile.objects.create(user=self.user2)
+        self.tweet = Tweet.objects.create(user=self.user1, content="aaa")
+        FavoriteConnection.objects.create(
+            favorite_account=self.user2, favorited_tweet=self.tweet
+        )
+        self.client.force_login(self.user1)
+
+    def test_deleted_tweet_is_hidden(self):
+        """
+        削除したツイートが即座に見えなくなる場合
+        """
+
+        response = self.client.get(
+            path=reverse("tweet:delete_tweet", args=[self.tweet.id])
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Tweet.objects.count(), 0)
+        self.assertEqual(Tweet.all_objects.filter(is_deleted=True).count(), 1)
+        self.assertEqual(FavoriteConnection.objects.count(), 1)
+
+        response = self.client.get(
+            path=reverse("tweet:tweet_detail", args=[self.tweet.id])
+        )
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(
+            path=reverse("account:account_detail", args=[self.user2.id])
+        )
+        self.assertEqual(response.context["favorite_connection_list"].count(), 0)
+
+    def test_deleted_tweet_leaves_cached_favorites(self):
+        """
+        いいねしたユーザのページがキャッシュされた後にツイートを削除した場合
+        """
+
+        path = reverse("account:account_detail", args=[self.user2.id])
+        response = self.client.get(path)
+        self.assertEqual(len(response.context["favorite_connection_list"]), 1)
+
+        self.client.get(reverse("tweet:delete_tweet", args=[self.tweet.id]))
+        response = self.client.get(path)
+        self.assertEqual(len(response.context["favorite_connection_list"]), 0)
+
+    def test_purge_deleted_tweets(self):
+        """
+        論理削除したツイートといいねを少しずつ物理削除する場合
+        """
+
+        for i in range(3, 8):
+            user = Account.objects.create_user(
+                email=f"sample{i}@example.com", username=f"sample{i}", password="x"
+            )
+            FavoriteConnection.objects.create(
+                favorite_account=user, favorited_tweet=self.tweet
+            )
+        kept = Tweet.objects.create(user=self.user1, content="bbb")
+        tombstone_tweet(self.tweet)
+
+        self.assertEqual(purge_deleted_tweets(batch_size=2), 1)
+        self.assertEqual(Tweet.all_objects.count(), 1)
+        self.assertEqual(Tweet.objects.get(), kept)
+        self.assertEqual(FavoriteConnection.objects.count(), 0)
+
+    def test_delete_all_tweets(self):
+        """
+        自分のツイートをすべて削除した場合
+        """
+
+        Tweet.objects.create(user=self.user1, content="bbb")
+        other = Tweet.objects.create(user=self.user2, content="ccc")
+
+        response = self.client.post(path=reverse("tweet:delete_all_tweets"))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(Tweet.objects.all()), [other])
+
+        call_command("purge_deleted_tweets", stdout=StringIO())
+        self.assertEqual(Tweet.all_objects.count(), 1)
+        self.assertEqual(FavoriteConnection.objects.count(), 0)
+
+        response = self.client.get(path=reverse("tweet:delete_all_tweets"))
+        self.assertEqual(response.status_code, 405)
+
+
+class TweetConditionalGetTest(TestCase):
+    """
+    ツイートの詳細ページの条件付きGETに対するテスト
+    """
+
+    def setUp(self):
+        self.user = Account.objects.create_user(
+            email="sample1@example.com", username="sample1", password="instance1"
+        )
+        Profile.objects.create(user=self.user)
+        self.tweet = Tweet.objects.create(user=self.user, content="aaa")
+        self.client.force_login(self.user)
+        self.path = reverse("tweet:tweet_detail", args=[self.tweet.id])
+
+    def test_not_modified(self):
+        """
+        変更がない場合に304を返し，削除された場合に404を返す場合
+        """
+
+        response = self.client.get(path=self.path)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        response = self.client.get(path=self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        tombstone_tweet(self.tweet)
+        response = self.client.get(path=self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404)
+
+
+class TweetSearchTest(TestCase):
+    """
+    ツイートの全文検索に対するテスト
+    """
+
+    def setUp(self):
+        self.user = Account.objects.create_user(
+            email="sample1@example.com", username="sample1", password="instance1"
+        )
+        Profile.objects.create(user=self.user)
+        self.client.force_login(self.user)
+        self.path = reverse("tweet:search")
+
+    def test_search_japanese(self):
+        """
+        日本語のツイートを検索した場合
+        """
+
+        tokyo = Tweet.objects.create(user=self.user, content="東京タワーに行きました")
+        Tweet.objects.create(user=self.user, content="京都に行きました")
+
+        with self.assertNumQueries(1):
+            tweets = search_tweets("東京タワー")
+            self.assertEqual(tweets[0].user, self.user)
+        self.assertEqual(tweets, [tokyo])
+
+        response = self.client.get(path=self.path, data={"q": "行きました"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["tweet_list"]), 2)
+
+        response = self.client.get(path=self.path, data={"q": "東京"})
+        self.assertEqual(response.context["tweet_list"], [tokyo])
+
+    def test_index_follows_changes(self):
+        """
+        削除・論理削除したツイートが検索結果に出ない場合
+        """
+
+        deleted = Tweet.objects.create(user=self.user, content="hello world")
+        tombstoned = Tweet.objects.create(user=self.user, content="hello there")
+        kept = Tweet.objects.create(user=self.user, content="hello again")
+        deleted.delete()
+        tombstone_tweet(tombstoned)
+
+        self.assertEqual(search_tweets("hello"), [kept])
+
+    def test_short_query(self):
+        """
+        1・2文字の語を全件を走査せずに bigram の索引で検索した場合
+        """
+
+        tokyo = Tweet.objects.create(user=self.user, content="東京タワーに行きました")
+        kyoto = Tweet.objects.create(user=self.user, content="京都に行った")
+        hello = Tweet.objects.create(user=self.user, content="Hello 東")
+        tombstoned = Tweet.objects.create(user=self.user, content="東京駅")
+        tombstone_tweet(tombstoned)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(search_tweets("東京"), [tokyo])
+        self.assertEqual(len(queries), 1)
+        self.assertIn("tweet_tweet_bigram", queries[0]["sql"])
+        self.assertNotIn("LIKE", queries[0]["sql"])
+
+        self.assertEqual(search_tweets("京"), [kyoto, tokyo])
+        self.assertEqual(search_tweets("東"), [hello, tokyo])
+        self.assertEqual(search_tweets("he"), [hello])
+        self.assertEqual(search_tweets("った"), [kyoto])
+
+        kyoto.content = "大阪に行った"
+        kyoto.save()
+        self.assertEqual(search_tweets("京"), [tokyo])
+        self.assertEqual(search_tweets("行"), [kyoto, tokyo])
+
+        self.assertEqual(search_tweets("行", cursor=(0.0, kyoto.id)), [tokyo])
+
+    def test_pagination(self):
+        """
+        検索結果が複数のページにまたがる場合
+        """
+
+        tweets = [
+            Tweet.objects.create(user=self.user, content=f"search page {i}")
+            for i in range(SEARCH_PAGE_SIZE + 5)
+        ]
+
+        response = self.client.get(path=self.path, data={"q": "search"})
+        first_page = response.context["tweet_list"]
+        self.assertEqual(len(first_page), SEARCH_PAGE_SIZE)
+        response = self.client.get(
+            path=self.path,
+            data={"q": "search", "cursor": response.context["next_cursor"]},
+        )
+        second_page = response.context["tweet_list"]
+        self.assertEqual(len(second_page), 5)
+        self.assertEqual(
+            {tweet.id for tweet in first_page + second_page},
+            {tweet.id for tweet in tweets},
+        )
+
+
+class TweetEntityTest(TestCase):
+    """
+    ハッシュタグとメンションの索引に対するテスト
+    """
+
+    databases = {"default", "tweet_shard_1", "tweet_shard_2"}
+
+    def setUp(self):
+        self.users = []
+        for i in range(1, 3):
+            user = Account.objects.create_user(
+                email=f"sample{i}@example.com",
+                username=f"sample{i}",
+                password=f"instance{i}",
+            )
+            Profile.objects.create(user=user)
+            self.users.append(user)
+        self.client.force_login(self.users[0])
+
+    def test_extract(self):
+        """
+        本文からハッシュタグとメンションを取り出す場合
+        """
+
+        self.assertEqual(
+            extract_hashtags("#Django と ＃django と #テスト, a#b &#39;"),
+            ["django", "テスト"],
+        )
+        self.assertEqual(
+            extract_mentions("hi @sample1. mail@example.com ＠sample2"),
+            ["sample1.", "sample1", "sample2"],
+        )
+
+    @override_settings(TWEET_SHARDS=["tweet_shard_1", "tweet_shard_2"])
+    def test_index_on_tweet(self):
+        """
+        ツイートを投稿した際にハッシュタグとメンションが索引に登録される場合
+        """
+
+        self.client.post(
+            path=reverse("account:home"),
+            data={"content": "#Django の話 @sample2 @unknown"},
+        )
+        tweet = Tweet.objects.using(shard_for_user(self.users[0].pk)).get()
+        shard = tweet._state.db
+        self.assertEqual(
+            list(
+                TweetHashtag.objects.using(shard).values_list(
+                    "hashtag__name", flat=True
+                )
+            ),
+            ["django"],
+        )
+        self.assertEqual(
+            list(Mention.objects.using(shard).values_list("account_id", flat=True)),
+            [self.users[1].pk],
+        )
+
+        other = Tweet.objects.create(user=self.users[1], content="#django again")
+        index_tweet_entities(other)
+        response = self.client.get(reverse("tweet:hashtag", args=["DJANGO"]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["tweet_list"], [other, tweet])
+
+        self.client.force_login(self.users[1])
+        response = self.client.get(reverse("tweet:mentions"))
+        self.assertEqual(response.context["tweet_list"], [tweet])
+
+    def test_hide_deleted_tweets(self):
+        """
+        論理削除したツイートがハッシュタグのページに出ない場合
+        """
+
+        tweet = Tweet.objects.create(user=self.users[0], content="#tag")
+        index_tweet_entities(tweet)
+        tombstone_tweet(tweet)
+
+        response = self.client.get(reverse("tweet:hashtag", args=["tag"]))
+        self.assertEqual(response.context["tweet_list"], [])
+
+    def test_backfill(self):
+        """
+        既存のツイートをコマンドで索引に登録する場合
+        """
+
+        tweets = [
+            Tweet.objects.create(user=self.users[0], content=f"#backfill {i} @sample2")
+            for i in range(5)
+        ]
+        out = StringIO()
+        call_command("backfill_tweet_entities", batch_size=2, stdout=out)
+        self.assertIn("5 件", out.getvalue())
+        self.assertEqual(Hashtag.objects.count(), 1)
+        self.assertEqual(TweetHashtag.objects.count(), 5)
+
+        # 再実行しても重複して登録されない
+        call_command("backfill_tweet_entities", stdout=StringIO())
+        self.assertEqual(Mention.objects.count(), 5)
+
+        # メンションと投稿者をそれぞれ1回のクエリで取得する
+        with self.assertNumQueries(2):
+            tweet_list = mention_timeline(self.users[1].pk)
+            self.assertEqual([tweet.user for tweet in tweet_list], [self.users[0]] * 5)
+        self.assertEqual(tweet_list, tweets[::-1])
+
+
+class TrendTest(TestCase):
+    """
+    トレンドの集計に対するテスト
+    """
+
+    def setUp(self):
+        self.user = Account.objects.create_user(
+            email="sample1@example.com", username="sample1", password="instance1"
+        )
+        Profile.objects.create(user=self.user)
+        self.client.force_login(self.user)
+        self.now = datetime(2026, 10, 19, 12, 30, 15, tzinfo=timezone.utc)
+        self.counter = TrendCounter()
+
+    def test_top_k(self):
+        """
+        件数の多いハッシュタグから順に並ぶ場合
+        """
+
+        for hashtags in [["a", "b"], ["b"], ["b", "c"], ["c"]]:
+            self.counter.record(hashtags, now=self.now)
+        self.assertEqual(TrendBucket.objects.count(), 0)
+
+        with self.settings(TRENDS_SIZE=2):
+            trends = self.counter.flush(now=self.now)
+        self.assertEqual(trends, [("b", 3), ("c", 2)])
+        self.assertEqual(get_trends(), trends)
+        self.assertEqual(self.counter.pending(), {})
+
+    def test_background_flush(self):
+        """
+        リクエストでは数えるだけで，書き出しはバックグラウンドのスレッドで行う場合
+        """
+
+        with self.settings(TRENDS_FLUSH_INTERVAL=0.01), mock.patch.object(
+            self.counter, "flush"
+        ) as flush:
+            self.counter.record(["a"], now=self.now)
+            flush.assert_not_called()
+            for _ in range(100):
+                if flush.called:
+                    break
+                time.sleep(0.01)
+            self.counter.stop()
+        flush.assert_called_with()
+
+    def test_rebuild_stale_snapshot(self):
+        """
+        数えたものがないプロセスでも古いスナップショットをバックグラウンドで作り直す場合
+        """
+
+        self.addCleanup(trend_counter.stop)
+        trend_counter.reset()
+        cache.set(SNAPSHOT_KEY, (time.time() + 60, [("a", 1)]))
+        with self.settings(TRENDS_FLUSH_INTERVAL=0.01), mock.patch(
+            "tweet.trends.update_snapshot"
+        ) as rebuild:
+            self.assertEqual(get_trends(), [("a", 1)])
+            time.sleep(0.05)
+            rebuild.assert_not_called()
+
+            cache.set(SNAPSHOT_KEY, (time.time() - 1, [("a", 1)]))
+            for _ in range(100):
+                if rebuild.called:
+                    break
+                time.sleep(0.01)
+            trend_counter.stop()
+        rebuild.assert_called_with()
+
+    def test_merge_processes(self):
+        """
+        複数のプロセスの件数を合計する場合
+        """
+
+        other = TrendCounter()
+        self.counter.record(["a"], now=self.now)
+        other.record(["a", "b"], now=self.now + timedelta(minutes=1))
+        self.counter.flush(now=self.now)
+        self.assertEqual(other.flush(now=self.now), [("a", 2), ("b", 1)])
+
+    def test_sliding_window(self):
+        """
+        窓から外れたバケットが集計されない場合
+        """
+
+        with self.settings(TRENDS_WINDOW_MINUTES=5):
+            self.counter.record(["old"], now=self.now)
+            self.counter.record(["new"], now=self.now + timedelta(minutes=3))
+            self.counter.flush(now=self.now + timedelta(minutes=3))
+            self.assertEqual(get_trends(), [("new", 1), ("old", 1)])
+
+            self.assertEqual(
+                update_snapshot(now=self.now + timedelta(minutes=5)), [("new", 1)]
+            )
+        self.assertEqual(TrendBucket.objects.count(), 1)
+
+    def test_trends_box(self):
+        """
+        ホームにトレンドがクエリを実行せずに表示される場合
+        """
+
+        trend_counter.reset()
+        self.client.post(reverse("account:home"), data={"content": "#django"})
+        trend_counter.flush()
+
+        response = self.client.get(reverse("account:home"))
+        self.assertEqual(response.context["trend_list"], [("django", 1)])
+        self.assertContains(response, reverse("tweet:hashtag", args=["django"]))
+        with self.assertNumQueries(0):
+            get_trends()
+
+
+class TweetQueryBudgetTest(QueryBudgetMixin, TestCase):
+    """
+    tweet.urls の各ページのクエリの数と読み込む行数に対するテスト
+
+    1ページより多いデータを用意し，データを増やしてもクエリの数が変わらないことを確かめる．
+    """
+
+    def setUp(self):
+        trend_counter.reset()
+        self.addCleanup(trend_counter.reset)
+        self.user = Account.objects.create_user(
+            email="sample@example.com", username="sample", password="instance1"
+        )
+        Profile.objects.create(user=self.user)
+        self.tweet = self.seed(max(SEARCH_PAGE_SIZE, ENTITY_PAGE_SIZE) + 5)
+        self.client.force_login(self.user)
+
+    def seed(self, n):
+        """
+        ハッシュタグとユーザへのメンションを含むツイートを別々のアカウントで n 件作る
+        """
+
+        start = Account.objects.count()
+        for i in range(start, start + n):
+            account = Account.objects.create_user(
+                email=f"user{i}@example.com", username=f"user{i}", password=None
+            )
+            tweet = Tweet.objects.create(user=account, content=f"#tag @sample {i}")
+            index_tweet_entities(tweet)
+            FavoriteConnection.objects.create(
+                favorite_account=self.user, favorited_tweet=tweet
+            )
+        return tweet
+
+    def get(self, name, *args, **data):
+        return lambda: self.client.get(reverse(name, args=args), data)
+
+    def post(self, name, *args, **data):
+        return lambda: self.client.post(reverse(name, args=args), data)
+
+    def grow(self):
+        self.seed(10)
+
+    def test_search(self):
+        # セッション・ユーザ・1ページ分のツイートと投稿者
+        rows = 2 + 2 * SEARCH_PAGE_SIZE
+        self.assertQueryBudget(self.get("tweet:search", q="tag"), 3, rows=rows)
+        self.assertQueriesDoNotScale(self.get("tweet:search", q="tag"), self.grow)
+        self.assertQueryBudget(self.get("tweet:search", q="ta"), 3, rows=rows)
+
+    def test_hashtag(self):
+        # セッション・ユーザ・1ページ分の関連とツイートと投稿者
+        rows = 2 + 3 * ENTITY_PAGE_SIZE
+        self.assertQueryBudget(self.get("tweet:hashtag", "tag"), 4, rows=rows)
+        self.assertQueriesDoNotScale(self.get("tweet:hashtag", "tag"), self.grow)
+
+    def test_mentions(self):
+        rows = 2 + 3 * ENTITY_PAGE_SIZE
+        self.assertQueryBudget(self.get("tweet:mentions"), 4, rows=rows)
+        self.assertQueriesDoNotScale(self.get("tweet:mentions"), self.grow)
+
+    def test_tweet_detail(self):
+        self.assertQueryBudget(self.get("tweet:tweet_detail", self.tweet.pk), 4, rows=4)
+        self.assertQueriesDoNotScale(
+            self.get("tweet:tweet_detail", self.tweet.pk), self.grow
+        )
+
+    def test_favorite(self):
+        tweet = Tweet.objects.create(user=self.user, content="tweet")
+        self.assertQueryBudget(self.post("tweet:favorite_tweet", tweet.pk), 7, rows=3)
+        self.assertQueryBudget(self.post("tweet:unfavorite_tweet", tweet.pk), 5, rows=4)
+
+    def test_delete_tweet(self):
+        tweet = Tweet.objects.create(user=self.user, content="tweet")
+        self.assertQueryBudget(self.get("tweet:delete_tweet", tweet.pk), 7, rows=3)
+
+    def test_delete_all_tweets(self):
+        for i in range(5):
+            Tweet.objects.create(user=self.user, content=f"tweet {i}")
+        self.assertQueryBudget(self.post("tweet:delete_all_tweets"), 7, rows=2)
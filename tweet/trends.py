@@ -0,0 +1,199 @@
+import heapq
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, IntegrityError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import TrendBucket
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = "trends:snapshot"
+
+
+def _minute(now):
+    return now.replace(second=0, microsecond=0)
+
+
+def _window_start(now):
+    return _minute(now) - timedelta(minutes=settings.TRENDS_WINDOW_MINUTES - 1)
+
+
+class TrendCounter:
+    """
+    プロセス内でハッシュタグの件数を1分ごとのバケットに数え，定期的にデータベースへ書き出す
+
+    書き出しはリクエストの処理を待たせないよう，TRENDS_FLUSH_INTERVAL 秒ごとに
+    バックグラウンドのスレッドで行う（最初に数えたとき・トレンドを読んだときに起動する）．
+    書き出すものがなくても，スナップショットが TRENDS_FLUSH_INTERVAL 秒より古ければ
+    他のプロセスが書き出したバケットから作り直す．
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def record(self, hashtags, now=None):
+        """
+        ツイートに含まれるハッシュタグを数える
+        """
+
+        if not hashtags:
+            return
+        minute = _minute(now or timezone.now())
+        with self._lock:
+            self._buckets.setdefault(minute, Counter()).update(hashtags)
+        self._ensure_started()
+
+    def _ensure_started(self):
+        interval = settings.TRENDS_FLUSH_INTERVAL
+        if interval is None:
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped.clear()
+                self._thread = threading.Thread(
+                    target=self._run,
+                    args=(interval,),
+                    name="trend-flusher",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def _run(self, interval):
+        while not self._stopped.wait(interval):
+            try:
+                if self._buckets:
+                    self.flush()
+                elif snapshot_age() >= interval:
+                    update_snapshot()
+                else:
+                    continue
+            except Exception:
+                logger.exception("failed to flush trends")
+            finally:
+                connections.close_all()
+
+    def stop(self):
+        """
+        書き出しのスレッドを止める（数えた件数は残る）
+        """
+
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def pending(self):
+        with self._lock:
+            return {minute: Counter(counts) for minute, counts in self._buckets.items()}
+
+    def reset(self):
+        with self._lock:
+            self._buckets = {}
+
+    def flush(self, now=None):
+        """
+        数えた件数をデータベースへ書き出し，トレンドのスナップショットを作り直す
+        """
+
+        now = now or timezone.now()
+        with self._lock:
+            buckets, self._buckets = self._buckets, {}
+        start = _window_start(now)
+        buckets = {
+            minute: counts for minute, counts in buckets.items() if minute >= start
+        }
+        try:
+            persist_buckets(buckets)
+        except DatabaseError:
+            logger.exception("failed to persist trend buckets")
+            with self._lock:
+                for minute, counts in buckets.items():
+                    self._buckets.setdefault(minute, Counter()).update(counts)
+            return None
+        return update_snapshot(now)
+
+
+def persist_buckets(buckets):
+    """
+    1分ごとの件数を（他のプロセスの件数に加算して）保存する
+    """
+
+    for minute, counts in buckets.items():
+        for name, count in counts.items():
+            bucket = TrendBucket.objects.filter(minute=minute, name=name)
+            if bucket.update(count=F("count") + count):
+                continue
+            try:
+                with transaction.atomic():
+                    TrendBucket.objects.create(minute=minute, name=name, count=count)
+            except IntegrityError:
+                bucket.update(count=F("count") + count)
+
+
+def compute_trends(now=None, size=None):
+    """
+    直近 TRENDS_WINDOW_MINUTES 分のバケットから件数の多いハッシュタグを返す
+    """
+
+    start = _window_start(now or timezone.now())
+    totals = Counter()
+    for name, count in (
+        TrendBucket.objects.filter(minute__gte=start)
+        .order_by("name")
+        .values_list("name", "count")
+    ):
+        totals[name] += count
+    return heapq.nlargest(
+        size or settings.TRENDS_SIZE, totals.items(), key=itemgetter(1)
+    )
+
+
+def update_snapshot(now=None):
+    """
+    トレンドを計算してキャッシュに保存し，古いバケットを削除する
+    """
+
+    now = now or timezone.now()
+    TrendBucket.objects.filter(minute__lt=_window_start(now)).delete()
+    trends = compute_trends(now)
+    cache.set(SNAPSHOT_KEY, (time.time(), trends), timeout=None)
+    return trends
+
+
+def snapshot_age():
+    """
+    スナップショットを作ってからの秒数を返す（まだない場合は無限大）
+    """
+
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot is None:
+        return float("inf")
+    return time.time() - snapshot[0]
+
+
+def get_trends():
+    """
+    作成済みのスナップショットからトレンドを返す（リクエスト中に集計はしない）
+
+    スナップショットはプロセスごとのキャッシュにあるため，書き出しのスレッドを起動して
+    他のプロセスで数えた件数も定期的に取り込む．
+    """
+
+    trend_counter._ensure_started()
+    snapshot = cache.get(SNAPSHOT_KEY)
+    return snapshot[1] if snapshot is not None else []
+
+
+trend_counter = TrendCounter()
@@ -1,13 +1,22 @@
 from django.urls import path
 
-from . import views
+from . import async_views, views
+from twitter_clone.async_views import select_view
 
 app_name = "tweet"
 
 
 urlpatterns = [
-    path("tweets/<int:tweet_id>", views.tweet_detail_view, name="tweet_detail"),
+    path("search", views.search_view, name="search"),
+    path("hashtags/<str:name>", views.hashtag_view, name="hashtag"),
+    path("mentions", views.mentions_view, name="mentions"),
+    path(
+        "tweets/<int:tweet_id>",
+        select_view(views.tweet_detail_view, async_views.tweet_detail_view),
+        name="tweet_detail",
+    ),
     path("tweets/<int:tweet_id>/delete", views.delete_tweet_view, name="delete_tweet"),
+    path("tweets/delete_all", views.delete_all_tweets_view, name="delete_all_tweets"),
     path(
         "tweets/<int:tweet_id>/favorite",
         views.favorite_tweet_view,
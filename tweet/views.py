@@ -1,20 +1,50 @@
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
-from django.http import JsonResponse, HttpResponseBadRequest
-from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.http import require_http_methods
+from django.http import Http404, JsonResponse, HttpResponseBadRequest
+from django.shortcuts import redirect, render
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods
 
-from .models import Tweet, FavoriteConnection
+from .deletion import tombstone_tweet, tombstone_user_tweets
+from .models import FavoriteConnection
+from .cache import get_cached_tweet
+from .entities import (
+    ENTITY_PAGE_SIZE,
+    hashtag_timeline,
+    mention_timeline,
+    normalize_hashtag,
+)
+from .search import SEARCH_PAGE_SIZE, decode_cursor, encode_cursor, search_tweets
+from .sharding import get_tweet_or_404
+from jobqueue.queue import enqueue
+from notification.notify import notify_favorite
+from twitter_clone.conditional import viewer_etag
+from twitter_clone.pagination import parse_before
+
+
+def tweet_etag(request, tweet_id):
+    """
+    キャッシュしたツイートの投稿日時からETagを計算する（ツイートの内容は変更されない）
+    """
+
+    tweet = get_cached_tweet(tweet_id)
+    if tweet is None:
+        return None
+    return viewer_etag(request, tweet_id, tweet.created_at.isoformat())
 
 
 @login_required
 @require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=tweet_etag)
 def tweet_detail_view(request, tweet_id):
     """
     ツイートの詳細を編集するページ
     """
 
-    tweet = get_object_or_404(Tweet, pk=tweet_id)
+    tweet = get_cached_tweet(tweet_id)
+    if tweet is None:
+        raise Http404("No Tweet matches the given query.")
     return render(request, "tweet/tweet_detail.html", {"tweet": tweet})
 
 
@@ -25,14 +55,27 @@ def delete_tweet_view(request, tweet_id):
     ツイートを削除するページ
     """
 
-    tweet = get_object_or_404(Tweet, pk=tweet_id)
-    if tweet.user == request.user:
-        tweet.delete()
+    tweet = get_tweet_or_404(tweet_id)
+    if tweet.user_id == request.user.id:
+        tombstone_tweet(tweet)
+        enqueue("tweet.purge_deleted_tweets", unique=True)
         return redirect("/home/")
     else:
         raise PermissionDenied
 
 
+@login_required
+@require_http_methods(["POST"])
+def delete_all_tweets_view(request):
+    """
+    自分のツイートをすべて削除するページ
+    """
+
+    tombstone_user_tweets(request.user)
+    enqueue("tweet.purge_deleted_tweets", unique=True)
+    return redirect("/home/")
+
+
 @login_required
 @require_http_methods(["POST"])
 def favorite_tweet_view(request, tweet_id):
@@ -42,13 +85,16 @@ def favorite_tweet_view(request, tweet_id):
 
     if request.method == "POST":
         favorite_account = request.user
-        favorited_tweet = get_object_or_404(Tweet, pk=tweet_id)
+        favorited_tweet = get_tweet_or_404(tweet_id)
 
-        _, is_created = FavoriteConnection.objects.get_or_create(
+        _, is_created = FavoriteConnection.objects.using(
+            favorited_tweet._state.db
+        ).get_or_create(
             favorite_account=favorite_account, favorited_tweet=favorited_tweet
         )
         if not is_created:
             return HttpResponseBadRequest()
+        notify_favorite(favorite_account, favorited_tweet)
         return JsonResponse({}, status=201)
 
 
@@ -61,13 +107,81 @@ def unfavorite_tweet_view(request, tweet_id):
 
     if request.method == "POST":
         favorite_account = request.user
-        favorited_tweet = get_object_or_404(Tweet, pk=tweet_id)
+        favorited_tweet = get_tweet_or_404(tweet_id)
 
-        favorite_connection = FavoriteConnection.objects.filter(
-            favorite_account=favorite_account,
-            favorited_tweet=favorited_tweet,
-        ).first()
+        favorite_connection = (
+            FavoriteConnection.objects.using(favorited_tweet._state.db)
+            .filter(
+                favorite_account=favorite_account,
+                favorited_tweet=favorited_tweet,
+            )
+            .first()
+        )
         if not favorite_connection:
             return HttpResponseBadRequest()
         favorite_connection.delete()
         return JsonResponse({}, status=204)
+
+
+@login_required
+@require_http_methods(["GET"])
+def search_view(request):
+    """
+    ツイートを検索するページ
+    """
+
+    query = request.GET.get("q", "").strip()
+    cursor = decode_cursor(request.GET.get("cursor"))
+    tweet_list = search_tweets(query, cursor=cursor) if query else []
+    next_cursor = None
+    if len(tweet_list) == SEARCH_PAGE_SIZE:
+        next_cursor = encode_cursor(tweet_list[-1])
+    return render(
+        request,
+        "tweet/search.html",
+        {"query": query, "tweet_list": tweet_list, "next_cursor": next_cursor},
+    )
+
+
+def _next_before(tweet_list):
+    if len(tweet_list) == ENTITY_PAGE_SIZE:
+        return tweet_list[-1].pk
+    return None
+
+
+@login_required
+@require_http_methods(["GET"])
+def hashtag_view(request, name):
+    """
+    ハッシュタグの付いたツイートの一覧ページ
+    """
+
+    tweet_list = hashtag_timeline(name, before=parse_before(request))
+    return render(
+        request,
+        "tweet/tweet_list.html",
+        {
+            "title": f"#{normalize_hashtag(name)}",
+            "tweet_list": tweet_list,
+            "next_before": _next_before(tweet_list),
+        },
+    )
+
+
+@login_required
+@require_http_methods(["GET"])
+def mentions_view(request):
+    """
+    ログインしているユーザがメンションされたツイートの一覧ページ
+    """
+
+    tweet_list = mention_timeline(request.user.pk, before=parse_before(request))
+    return render(
+        request,
+        "tweet/tweet_list.html",
+        {
+            "title": "あなたへのメンション",
+            "tweet_list": tweet_list,
+            "next_before": _next_before(tweet_list),
+        },
+    )
@@ -0,0 +1,98 @@
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections
+from django.http import HttpResponseNotAllowed
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from .profiling import watch_task, watch_thread
+
+
+def _in_worker_thread(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # リクエストのスレッドとは別の接続を使うため，古い接続はここで閉じる
+        close_old_connections()
+        try:
+            with watch_thread():
+                return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return wrapper
+
+
+async def gather_queries(*funcs):
+    """
+    互いに依存しないクエリ（引数なしの関数）をスレッドプールで同時に実行し，結果を順に返す
+    """
+
+    return await asyncio.gather(
+        *(
+            sync_to_async(_in_worker_thread(func), thread_sensitive=False)()
+            for func in funcs
+        )
+    )
+
+
+async def async_render(request, template_name, context):
+    """
+    テンプレートを（遅延評価されるクエリも含めて）同期のスレッドで描画する
+    """
+
+    return await sync_to_async(render)(request, template_name, context)
+
+
+def async_read_view(etag_func=None):
+    """
+    非同期の閲覧用ビューのデコレータ
+
+    login_required・require_http_methods(["GET"])・cache_control・condition は
+    Django 3.2 では非同期のビューに使えないため，ここでまとめて同じことを行う．
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            watch_task()
+            if request.method not in ("GET", "HEAD"):
+                return HttpResponseNotAllowed(["GET"])
+            # request.user はセッションやデータベースを読むため同期のスレッドで評価する
+            is_authenticated = await sync_to_async(
+                lambda: request.user.is_authenticated
+            )()
+            if not is_authenticated:
+                return redirect_to_login(request.get_full_path())
+
+            etag = None
+            if etag_func is not None:
+                etag = await sync_to_async(etag_func)(request, *args, **kwargs)
+                if etag is not None:
+                    etag = quote_etag(etag)
+                    response = get_conditional_response(request, etag=etag)
+                    if response is not None:
+                        patch_cache_control(response, private=True, no_cache=True)
+                        return response
+
+            response = await view(request, *args, **kwargs)
+            if etag is not None and response.status_code == 200:
+                response.headers.setdefault("ETag", etag)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def select_view(sync_view, async_view):
+    """
+    ASYNC_READ_VIEWS の設定に応じて同期・非同期のビューを選ぶ
+    """
+
+    return async_view if settings.ASYNC_READ_VIEWS else sync_view
@@ -0,0 +1,240 @@
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from account.models import FollowConnection
+from tweet.models import FavoriteConnection
+
+from .instrumentation import collect_queries
+
+BENCH_VIEWS = [
+    "home",
+    "home_post",
+    "account_detail",
+    "followings",
+    "followers",
+    "tweet_detail",
+    "favorite",
+    "follow",
+]
+
+
+def percentile(values, p):
+    """
+    最近傍順位法でパーセンタイルを求める（values は並べ替え済み）
+    """
+
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * p // 100))
+    return values[int(rank) - 1]
+
+
+def client_host():
+    # ALLOWED_HOSTS で許可されたホスト名でリクエストを送る
+    for host in settings.ALLOWED_HOSTS:
+        if host != "*":
+            return host.lstrip(".")
+    return "localhost"
+
+
+class _Worker:
+    """
+    1人の閲覧者としてリクエストを送るクライアント
+    """
+
+    def __init__(self, viewer, subject, tweet):
+        self.viewer = viewer
+        self.subject = subject
+        self.tweet = tweet
+        self.client = None
+
+    def _ensure_client(self):
+        if self.client is None:
+            self.client = Client(HTTP_HOST=client_host())
+            self.client.force_login(self.viewer)
+            # いいね・フォローの状態は1回の操作で元に戻す
+            self.favorited = (
+                self.tweet is not None
+                and FavoriteConnection.objects.filter(
+                    favorite_account=self.viewer, favorited_tweet_id=self.tweet.pk
+                ).exists()
+            )
+            self.following = FollowConnection.objects.filter(
+                follower=self.viewer, followee=self.subject
+            ).exists()
+
+    def _toggle(self, on, off, is_on):
+        return [off, on] if is_on else [on, off]
+
+    def requests(self, view):
+        """
+        view の1回の操作を (名前, リクエストを送る関数) のリストで返す
+        """
+
+        self._ensure_client()
+        client = self.client
+        subject_id = self.subject.pk
+        tweet_id = self.tweet.pk if self.tweet is not None else None
+        if view == "home":
+            return [("home", lambda: client.get(reverse("account:home")))]
+        if view == "home_post":
+            return [
+                (
+                    "home_post",
+                    lambda: client.post(
+                        reverse("account:home"), {"content": "benchmark #bench"}
+                    ),
+                )
+            ]
+        if view in ("account_detail", "followings", "followers"):
+            path = reverse(f"account:{view}", args=[subject_id])
+            return [(view, lambda: client.get(path))]
+        if view == "tweet_detail":
+            path = reverse("tweet:tweet_detail", args=[tweet_id])
+            return [(view, lambda: client.get(path))]
+        if view == "favorite":
+            return self._toggle(
+                (
+                    "favorite",
+                    lambda: client.post(
+                        reverse("tweet:favorite_tweet", args=[tweet_id])
+                    ),
+                ),
+                (
+                    "unfavorite",
+                    lambda: client.post(
+                        reverse("tweet:unfavorite_tweet", args=[tweet_id])
+                    ),
+                ),
+                self.favorited,
+            )
+        if view == "follow":
+            return self._toggle(
+                (
+                    "follow",
+                    lambda: client.post(reverse("account:follow", args=[subject_id])),
+                ),
+                (
+                    "unfollow",
+                    lambda: client.post(reverse("account:unfollow", args=[subject_id])),
+                ),
+                self.following,
+            )
+        raise ValueError(f"Unknown view: {view}")
+
+
+class Benchmark:
+    """
+    Django のテストクライアントで各ビューに同時にリクエストを送り，
+    スループット・レイテンシ・1リクエストあたりのクエリ数を計測する
+
+    閲覧者ごとに別のスレッド（とデータベース接続）を使う．いいね・フォローの状態が
+    スレッドの間で食い違わないよう，スレッドごとに別の閲覧者を concurrency 人以上渡す．
+    """
+
+    def __init__(self, viewers, subject, tweet, concurrency=1, requests=100, warmup=5):
+        if len(viewers) < concurrency:
+            raise ValueError(
+                f"{concurrency} viewers are required, but {len(viewers)} were given."
+            )
+        self.workers = [
+            _Worker(viewer, subject, tweet) for viewer in viewers[:concurrency]
+        ]
+        self.requests = requests
+        self.warmup = warmup
+
+    def _call(self, worker, view):
+        samples = []
+        for name, send in worker.requests(view):
+            with collect_queries(track_shapes=False) as queries:
+                start = time.perf_counter()
+                response = send()
+                elapsed = time.perf_counter() - start
+            samples.append((name, elapsed, queries.count, response.status_code))
+        return samples
+
+    def _run_view(self, view):
+        if len(self.workers) == 1:
+            # 1並列の場合は（テストのトランザクション内でも動くよう）このスレッドで実行する
+            worker = self.workers[0]
+            for _ in range(self.warmup):
+                self._call(worker, view)
+            start = time.perf_counter()
+            samples = [
+                sample
+                for _ in range(self.requests)
+                for sample in self._call(worker, view)
+            ]
+            return samples, time.perf_counter() - start
+
+        remaining = iter(range(self.requests))
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(self.workers) + 1)
+        samples = []
+        errors = []
+
+        def run(worker):
+            try:
+                for _ in range(self.warmup):
+                    self._call(worker, view)
+                barrier.wait()
+                while True:
+                    with lock:
+                        if next(remaining, None) is None:
+                            break
+                    result = self._call(worker, view)
+                    with lock:
+                        samples.extend(result)
+            except Exception as e:
+                errors.append(e)
+                barrier.abort()
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=run, args=(worker,)) for worker in self.workers
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        if errors:
+            raise errors[0]
+        return samples, elapsed
+
+    def run(self, views=BENCH_VIEWS):
+        """
+        ビューごとの結果を返す
+        """
+
+        results = {}
+        for view in views:
+            samples, elapsed = self._run_view(view)
+            by_name = {}
+            for name, latency, queries, status in samples:
+                by_name.setdefault(name, []).append((latency, queries, status))
+            for name, rows in by_name.items():
+                latencies = sorted(latency for latency, _, _ in rows)
+                results[name] = {
+                    "requests": len(rows),
+                    "errors": sum(1 for _, _, status in rows if status >= 400),
+                    "throughput": len(rows) / elapsed if elapsed else None,
+                    "mean_ms": statistics.fmean(latencies) * 1000,
+                    "p50_ms": percentile(latencies, 50) * 1000,
+                    "p95_ms": percentile(latencies, 95) * 1000,
+                    "p99_ms": percentile(latencies, 99) * 1000,
+                    "queries_per_request": statistics.fmean(q for _, q, _ in rows),
+                }
+        return results
@@ -0,0 +1,130 @@
+import math
+import random
+import threading
+import time
+import weakref
+
+from django.conf import settings
+from django.core.cache import caches
+
+_process_locks = weakref.WeakValueDictionary()
+_process_locks_guard = threading.Lock()
+
+
+def _process_lock(key):
+    with _process_locks_guard:
+        lock = _process_locks.get(key)
+        if lock is None:
+            lock = threading.Lock()
+            _process_locks[key] = lock
+        return lock
+
+
+def _is_fresh(entry, now, beta):
+    """
+    確率的な早期失効（XFetch）で，期限が近いほど高い確率で再計算させる
+    """
+
+    _, expires_at, delta = entry
+    if beta <= 0:
+        return now < expires_at
+    return now - delta * beta * math.log(1.0 - random.random()) < expires_at
+
+
+def get_or_compute(
+    key,
+    compute,
+    timeout,
+    stale_timeout=None,
+    local_timeout=None,
+    beta=1.0,
+):
+    """
+    キャッシュから値を返し，必要な場合は1つのワーカーだけが再計算する
+
+    - 期限切れ後も stale_timeout 秒は古い値を残し，再計算中の他のワーカー・スレッドへ
+      待たせずに返す
+    - 古い値がない場合，他のワーカーは再計算の完了を少しだけ待つ
+    - 計算結果が None の場合（対象がないなど）は NONE_CACHE_TIMEOUT 秒だけ保存する
+    - local_timeout を指定すると，プロセス内のキャッシュ（"local"）も前段で使う
+    """
+
+    shared = caches["default"]
+    local = caches["local"] if local_timeout else None
+    if stale_timeout is None:
+        stale_timeout = settings.STALE_CACHE_TIMEOUT
+
+    now = time.time()
+    if local is not None:
+        entry = local.get(key)
+        if entry is not None and now < entry[1]:
+            return entry[0]
+
+    entry = shared.get(key)
+    if entry is not None and _is_fresh(entry, now, beta):
+        if local is not None:
+            local.set(key, entry, local_timeout)
+        return entry[0]
+
+    # 同じプロセス内のスレッドはここで1つにまとめる．古い値があれば再計算を待たずに返す
+    lock = _process_lock(key)
+    if not lock.acquire(blocking=entry is None):
+        return entry[0]
+    try:
+        latest = shared.get(key)
+        refreshed = latest is not None and (entry is None or latest[1] != entry[1])
+        if refreshed and time.time() < latest[1]:
+            return latest[0]
+
+        lock_key = f"{key}:lock"
+        if shared.add(lock_key, 1, settings.STAMPEDE_LOCK_TIMEOUT):
+            try:
+                return _compute_and_store(
+                    shared, local, key, compute, timeout, stale_timeout, local_timeout
+                )
+            finally:
+                shared.delete(lock_key)
+
+        # 他のワーカーが再計算している
+        if entry is not None:
+            return entry[0]
+        deadline = time.time() + settings.STAMPEDE_WAIT_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(0.01)
+            latest = shared.get(key)
+            if latest is not None:
+                return latest[0]
+        return _compute_and_store(
+            shared, local, key, compute, timeout, stale_timeout, local_timeout
+        )
+    finally:
+        lock.release()
+
+
+def _compute_and_store(
+    shared, local, key, compute, timeout, stale_timeout, local_timeout
+):
+    start = time.time()
+    value = compute()
+    now = time.time()
+    if value is None:
+        # 対象がないという結果は作成されればすぐ古くなるため，短い期限で保存し，
+        # 期限切れ後の古い値としても残さない
+        timeout = min(timeout, settings.NONE_CACHE_TIMEOUT)
+        stale_timeout = 0
+        if local_timeout:
+            local_timeout = min(local_timeout, settings.NONE_CACHE_TIMEOUT)
+    entry = (value, now + timeout, now - start)
+    shared.set(key, entry, timeout + stale_timeout)
+    if local is not None:
+        local.set(key, (value, now + local_timeout, now - start), local_timeout)
+    return value
+
+
+def delete(*keys):
+    """
+    共有キャッシュから値を消す（他のプロセス内のキャッシュは local_timeout 後に消える）
+    """
+
+    caches["default"].delete_many(keys)
+    caches["local"].delete_many(keys)
@@ -0,0 +1,39 @@
+from django.core.cache.backends.locmem import LocMemCache
+
+from .metrics import CACHE_REQUESTS
+
+_MISSING = object()
+
+
+def _prefix(key):
+    # キーの種類（"tweet:1" の "tweet" など）ごとに数える．":" のないキーはまとめる
+    prefix, separator, _ = str(key).partition(":")
+    return prefix if separator else "other"
+
+
+class InstrumentedCacheMixin:
+    """
+    キャッシュのヒット・ミスの回数をメトリクスに記録する
+
+    get_many() などは get() を使って実装されているため，get() だけを記録すればよい．
+    """
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self.metrics_name = location or "default"
+
+    def _record(self, key, hit):
+        CACHE_REQUESTS.inc(
+            cache=self.metrics_name,
+            prefix=_prefix(key),
+            result="hit" if hit else "miss",
+        )
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version=version)
+        self._record(key, value is not _MISSING)
+        return default if value is _MISSING else value
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
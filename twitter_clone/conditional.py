@@ -0,0 +1,16 @@
+import hashlib
+
+
+def viewer_etag(request, *parts):
+    """
+    閲覧者ごとに異なるページのETagを作る
+
+    CSRFトークンを埋め込むページもあるため，閲覧者のIDとCSRFのCookieも含める．
+    """
+
+    values = [
+        str(request.user.pk),
+        request.META.get("CSRF_COOKIE", ""),
+        *(str(part) for part in parts),
+    ]
+    return hashlib.md5(":".join(values).encode()).hexdigest()
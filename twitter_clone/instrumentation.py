@@ -0,0 +1,191 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .middleware import WrappingMiddleware
+
+logger = logging.getLogger(__name__)
+
+_collector = ContextVar("sql_collector", default=None)
+_install_lock = threading.Lock()
+_installed = False
+
+_PLACEHOLDER_LIST_RE = re.compile(r"IN \(%s(?:\s*,\s*%s)*\)")
+_NUMBER_RE = re.compile(r"\b\d+\b")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def query_shape(sql):
+    """
+    パラメータやIN句の要素数・LIMITの値が異なるだけのクエリを同じ形にまとめる
+    """
+
+    shape = _PLACEHOLDER_LIST_RE.sub("IN (...)", sql)
+    shape = _NUMBER_RE.sub("N", shape)
+    return _SPACE_RE.sub(" ", shape).strip()
+
+
+class QueryCollector:
+    """
+    1つのリクエストで実行されたクエリの件数・時間・形を集める
+
+    track_queries に件数を指定すると，その件数までクエリと時間を queries に残す．
+    parent を指定すると，記録したクエリを外側の collect_queries にも渡す．
+    """
+
+    def __init__(self, track_shapes=True, track_queries=0, parent=None):
+        self.track_shapes = track_shapes
+        self.track_queries = track_queries
+        self.parent = parent
+        self.queries = []
+        self._lock = threading.Lock()
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_sql = None
+        self.slowest_duration = 0.0
+        self.shapes = Counter()
+
+    def record(self, sql, duration):
+        shape = query_shape(sql) if self.track_shapes else None
+        with self._lock:
+            self.count += 1
+            self.duration += duration
+            if shape is not None:
+                self.shapes[shape] += 1
+            if len(self.queries) < self.track_queries:
+                self.queries.append((sql, duration))
+            if duration >= self.slowest_duration:
+                self.slowest_sql = sql
+                self.slowest_duration = duration
+        if self.parent is not None:
+            self.parent.record(sql, duration)
+
+    def repeated_shapes(self, threshold=None):
+        """
+        threshold 回以上実行された同じ形のクエリ（N+1の疑いがあるもの）を返す
+        """
+
+        threshold = threshold or settings.SQL_N_PLUS_ONE_THRESHOLD
+        return [
+            (shape, count)
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    collector = _collector.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        collector.record(sql, time.perf_counter() - start)
+
+
+def _add_wrapper(connection):
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_wrapper)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    _add_wrapper(connection)
+
+
+def install():
+    """
+    データベースの接続にクエリを記録するラッパーを登録する（何度呼んでもよい）
+
+    接続はスレッドごとに作られるため，新しい接続には connection_created で登録する．
+    """
+
+    global _installed
+    with _install_lock:
+        if not _installed:
+            connection_created.connect(_on_connection_created)
+            _installed = True
+    for connection in connections.all():
+        _add_wrapper(connection)
+
+
+class collect_queries:
+    """
+    with ブロック内で実行されたクエリを集める（別のスレッドで実行されたクエリも含む）
+    """
+
+    def __init__(self, track_shapes=True, track_queries=0):
+        self.track_shapes = track_shapes
+        self.track_queries = track_queries
+
+    def __enter__(self):
+        install()
+        self.collector = QueryCollector(
+            track_shapes=self.track_shapes,
+            track_queries=self.track_queries,
+            parent=_collector.get(),
+        )
+        self._token = _collector.set(self.collector)
+        return self.collector
+
+    def __exit__(self, *exc_info):
+        _collector.reset(self._token)
+
+
+def _server_timing(collector, repeated):
+    metrics = [
+        f'db;dur={collector.duration * 1000:.1f};desc="{collector.count} queries"',
+        f"db-slowest;dur={collector.slowest_duration * 1000:.1f}",
+    ]
+    if repeated:
+        metrics.append(f'db-repeated;desc="{len(repeated)} repeated shapes"')
+    return ", ".join(metrics)
+
+
+class QueryInstrumentationMiddleware(WrappingMiddleware):
+    """
+    リクエストごとにクエリの件数・合計時間・最も遅いクエリを記録し，
+    同じ形のクエリが繰り返される（N+1の）場合は警告する
+
+    SQL_INSTRUMENTATION_SAMPLE_RATE の割合のリクエストだけを記録する（0の場合は何もしない）．
+    結果は Server-Timing ヘッダと "twitter_clone.instrumentation" のログに出力する．
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.sample_rate = settings.SQL_INSTRUMENTATION_SAMPLE_RATE
+        if self.sample_rate > 0:
+            install()
+
+    def wrap(self, request):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            response = yield
+            return response
+
+        with collect_queries() as collector:
+            response = yield
+        repeated = collector.repeated_shapes()
+        response["Server-Timing"] = _server_timing(collector, repeated)
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": getattr(request.resolver_match, "view_name", None),
+            "status": response.status_code,
+            "queries": collector.count,
+            "db_ms": round(collector.duration * 1000, 2),
+            "slowest_ms": round(collector.slowest_duration * 1000, 2),
+            "slowest_sql": collector.slowest_sql,
+            "repeated": [{"shape": shape, "count": count} for shape, count in repeated],
+        }
+        level = logging.WARNING if repeated else logging.INFO
+        logger.log(level, json.dumps(record, ensure_ascii=False))
+        return response
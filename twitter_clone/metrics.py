@@ -0,0 +1,353 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+
+from .instrumentation import collect_queries
+from .middleware import WrappingMiddleware
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_INITIAL_SIZE = 64 * 1024
+_HEADER = struct.Struct("i")
+_KEY_LENGTH = struct.Struct("i")
+_VALUE = struct.Struct("d")
+
+
+def metrics_dir():
+    path = settings.METRICS_DIR or os.path.join(
+        tempfile.gettempdir(), "twitter_clone_metrics"
+    )
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _padded(encoded):
+    # 値を8バイト境界に置くため，キーの長さ（4バイト）とキーの合計を8の倍数にする
+    return encoded + b" " * (8 - (len(encoded) + _KEY_LENGTH.size) % 8)
+
+
+class ProcessFile:
+    """
+    プロセスごとのメトリクスの値をメモリマップしたファイルに保存する
+
+    ファイルは「使用済みのバイト数」のヘッダの後に（キーの長さ・キー・値）を並べた形式で，
+    書き込むのはこのプロセスだけ，読むのは /metrics を処理するすべてのプロセス．
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a+b")
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.truncate(_INITIAL_SIZE)
+        self._capacity = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        self._used = _HEADER.unpack_from(self._map, 0)[0] or 8
+        self._positions = {
+            key: position for key, _, position in _read_entries(self._map, self._used)
+        }
+
+    def _position(self, key):
+        position = self._positions.get(key)
+        if position is not None:
+            return position
+        encoded = _padded(key.encode())
+        size = _KEY_LENGTH.size + len(encoded) + _VALUE.size
+        while self._used + size > self._capacity:
+            self._capacity *= 2
+            self._file.truncate(self._capacity)
+            self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        _KEY_LENGTH.pack_into(self._map, self._used, len(encoded))
+        self._map[self._used + 4 : self._used + 4 + len(encoded)] = encoded
+        position = self._used + 4 + len(encoded)
+        _VALUE.pack_into(self._map, position, 0.0)
+        self._used += size
+        # エントリを書き終えてからヘッダを更新する（読み手が書きかけのエントリを読まない）
+        _HEADER.pack_into(self._map, 0, self._used)
+        self._positions[key] = position
+        return position
+
+    def inc(self, key, amount):
+        with self._lock:
+            position = self._position(key)
+            value = _VALUE.unpack_from(self._map, position)[0]
+            _VALUE.pack_into(self._map, position, value + amount)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def _read_entries(data, used):
+    position = 8
+    while position < used:
+        length = _KEY_LENGTH.unpack_from(data, position)[0]
+        key = bytes(data[position + 4 : position + 4 + length]).decode().rstrip()
+        value_position = position + 4 + length
+        yield key, _VALUE.unpack_from(data, value_position)[0], value_position
+        position = value_position + _VALUE.size
+
+
+def read_file(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < 8:
+        return
+    for key, value, _ in _read_entries(data, _HEADER.unpack_from(data, 0)[0]):
+        yield key, value
+
+
+_process_file = None
+_process_file_lock = threading.Lock()
+
+
+def _get_process_file():
+    global _process_file
+    path = os.path.join(metrics_dir(), f"{os.getpid()}.db")
+    if _process_file is None or _process_file.path != path:
+        with _process_file_lock:
+            if _process_file is None or _process_file.path != path:
+                _process_file = ProcessFile(path)
+    return _process_file
+
+
+def _reset_after_fork():
+    # 子プロセスは親のファイルに書き込まないよう，次に記録するときに自分のファイルを開く
+    global _process_file
+    _process_file = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _key(name, labels):
+    return json.dumps([name, sorted(labels.items())])
+
+
+_registry = {}
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        _registry[name] = self
+
+    def _inc(self, sample, amount, labels):
+        if settings.METRICS_ENABLED:
+            _get_process_file().inc(_key(sample, labels), amount)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        self._inc(f"{self.name}_total", amount, labels)
+
+
+class Gauge(_Metric):
+    """
+    実行中のプロセスの値の合計を返すゲージ（停止したプロセスの値は含めない）
+    """
+
+    type = "gauge"
+
+    def inc(self, amount=1, **labels):
+        self._inc(self.name, amount, labels)
+
+    def dec(self, amount=1, **labels):
+        self._inc(self.name, -amount, labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if not settings.METRICS_ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        le = str(self.buckets[index]) if index < len(self.buckets) else "+Inf"
+        self._inc(f"{self.name}_bucket", 1, {**labels, "le": le})
+        self._inc(f"{self.name}_sum", value, labels)
+        self._inc(f"{self.name}_count", 1, labels)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect():
+    """
+    全プロセスのファイルを読み，(サンプル名, ラベル) ごとの値を合計して返す
+    """
+
+    gauges = {name for name, metric in _registry.items() if metric.type == "gauge"}
+    values = {}
+    for path in Path(metrics_dir()).glob("*.db"):
+        alive = None
+        for key, value in read_file(path):
+            name, labels = json.loads(key)
+            if name in gauges:
+                if alive is None:
+                    alive = _pid_alive(int(path.stem))
+                if not alive:
+                    continue
+            labels = tuple(tuple(label) for label in labels)
+            values[(name, labels)] = values.get((name, labels), 0.0) + value
+    return values
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def _histogram_lines(metric, values):
+    series = {}
+    for (name, labels), value in values.items():
+        if name == f"{metric.name}_bucket":
+            le = dict(labels)["le"]
+            base = tuple(label for label in labels if label[0] != "le")
+            series.setdefault(base, {})[le] = value
+    lines = []
+    for base, counts in sorted(series.items()):
+        cumulative = 0.0
+        for le in [str(bucket) for bucket in metric.buckets] + ["+Inf"]:
+            cumulative += counts.get(le, 0.0)
+            labels = base + (("le", le),)
+            lines.append(f"{metric.name}_bucket{_format_labels(labels)} {cumulative:g}")
+        for suffix in ("_sum", "_count"):
+            value = values.get((f"{metric.name}{suffix}", base), 0.0)
+            lines.append(f"{metric.name}{suffix}{_format_labels(base)} {value:g}")
+    return lines
+
+
+_collectors = []
+
+
+def register_collector(func):
+    """
+    /metrics を処理するときに値を計算するメトリクスを登録する
+
+    func は (名前, 種類, 説明, [(ラベル, 値), ...]) のリストを返す．
+    """
+
+    _collectors.append(func)
+    return func
+
+
+def render():
+    """
+    Prometheus のテキスト形式でメトリクスを返す
+    """
+
+    values = collect()
+    lines = []
+    for name, metric in sorted(_registry.items()):
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.type}")
+        if metric.type == "histogram":
+            lines.extend(_histogram_lines(metric, values))
+            continue
+        sample = f"{name}_total" if metric.type == "counter" else name
+        for (sample_name, labels), value in sorted(values.items()):
+            if sample_name == sample:
+                lines.append(f"{sample}{_format_labels(labels)} {value:g}")
+    for collector in _collectors:
+        for name, metric_type, documentation, samples in collector():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                lines.append(
+                    f"{name}{_format_labels(sorted(labels.items()))} {value:g}"
+                )
+    return "\n".join(lines) + "\n"
+
+
+def clear():
+    """
+    すべてのプロセスのファイルを削除する（デプロイ時やテストで使う）
+    """
+
+    global _process_file
+    with _process_file_lock:
+        if _process_file is not None:
+            _process_file.close()
+            _process_file = None
+    for path in Path(metrics_dir()).glob("*.db"):
+        path.unlink()
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by URL name."
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests currently being processed."
+)
+DB_QUERIES = Histogram(
+    "db_queries_per_request",
+    "Number of SQL queries per request by URL name.",
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+DB_TIME = Histogram(
+    "db_time_per_request_seconds", "Total SQL time per request by URL name."
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests", "Cache lookups by cache, key prefix and result (hit/miss)."
+)
+
+
+class MetricsMiddleware(WrappingMiddleware):
+    """
+    URLの名前ごとのレイテンシ・クエリの件数と時間，処理中のリクエスト数を記録する
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.enabled = settings.METRICS_ENABLED
+
+    def wrap(self, request):
+        if not self.enabled:
+            response = yield
+            return response
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            with collect_queries(track_shapes=False) as queries:
+                response = yield
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+        view = getattr(request.resolver_match, "view_name", None) or "<unresolved>"
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - start, view=view, method=request.method
+        )
+        DB_QUERIES.observe(queries.count, view=view)
+        DB_TIME.observe(queries.duration, view=view)
+        return response
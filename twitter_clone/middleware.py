@@ -0,0 +1,55 @@
+import asyncio
+
+
+class WrappingMiddleware:
+    """
+    同期・非同期のどちらのリクエストでも動くミドルウェアの基底クラス
+
+    Django は同期専用のミドルウェアを ASGI では1つの共有スレッドで実行するため，
+    非同期のビューを使っていてもリクエストが1件ずつしか処理されなくなる．
+    サブクラスは wrap(request) を「前処理 → response = yield → 後処理 → return response」
+    のジェネレータとして書き，同期・非同期の呼び出しは基底クラスが行う．
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Django に非同期のミドルウェアとして扱わせる（MiddlewareMixin と同じ方法）
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def wrap(self, request):
+        response = yield
+        return response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        steps = self.wrap(request)
+        next(steps)
+        try:
+            response = self.get_response(request)
+        except BaseException as e:
+            steps.throw(e)
+            raise
+        return self._finish(steps, response)
+
+    async def __acall__(self, request):
+        steps = self.wrap(request)
+        next(steps)
+        try:
+            response = await self.get_response(request)
+        except BaseException as e:
+            steps.throw(e)
+            raise
+        return self._finish(steps, response)
+
+    def _finish(self, steps, response):
+        try:
+            steps.send(response)
+        except StopIteration as stop:
+            return stop.value
+        raise RuntimeError(f"{type(self).__name__}.wrap() must yield only once")
@@ -0,0 +1,7 @@
+def parse_before(request):
+    """
+    クエリパラメータ `before`（これより古いものを表示するID）を読む（不正な値は None）
+    """
+
+    before = request.GET.get("before", "")
+    return int(before) if before.isdigit() else None
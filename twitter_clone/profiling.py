@@ -0,0 +1,252 @@
+import asyncio
+import cProfile
+import io
+import json
+import logging
+import pstats
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+
+from .instrumentation import collect_queries
+from .middleware import WrappingMiddleware
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PARAM = "_profile"
+PROFILE_HEADER = "HTTP_X_PROFILE"
+
+
+class ProfilingMiddleware(WrappingMiddleware):
+    """
+    スタッフのリクエストを cProfile で計測し，結果をレスポンスとして返す
+
+    クエリパラメータ `_profile` またはヘッダ `X-Profile` で有効にする．
+    値に "tottime" などを指定すると並び順を変えられる（既定は cumulative）．
+    結果はどのサーバで計測しても見られるよう，ファイルには保存せず
+    本来のレスポンスの代わりにテキストで返す．本来のステータスコードと概要は
+    ヘッダ `X-Profile-Status`・`X-Profile-Summary` に付ける．
+    """
+
+    def _sort(self, request):
+        return request.GET.get(PROFILE_PARAM) or request.META.get(PROFILE_HEADER)
+
+    async def __acall__(self, request):
+        if self._sort(request):
+            # request.user はセッションやデータベースを読むため同期のスレッドで評価しておく
+            await sync_to_async(lambda: request.user.is_staff)()
+        return await super().__acall__(request)
+
+    def wrap(self, request):
+        sort = self._sort(request)
+        if not sort or not request.user.is_staff:
+            response = yield
+            return response
+
+        profiler = cProfile.Profile()
+        with collect_queries(track_shapes=False) as queries:
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = yield
+            finally:
+                profiler.disable()
+            elapsed = time.perf_counter() - start
+
+        if sort not in pstats.Stats.sort_arg_dict_default:
+            sort = "cumulative"
+        summary = (
+            f"{elapsed * 1000:.1f}ms, {queries.count} queries "
+            f"({queries.duration * 1000:.1f}ms)"
+        )
+        out = io.StringIO()
+        out.write(
+            f"{request.method} {request.get_full_path()} -> {response.status_code}\n"
+            f"{summary}\n\n"
+        )
+        stats = pstats.Stats(profiler, stream=out)
+        stats.strip_dirs().sort_stats(sort).print_stats(settings.PROFILING_TOP)
+        logger.info("profiled %s %s: %s", request.method, request.path, summary)
+        report = HttpResponse(out.getvalue(), content_type="text/plain; charset=utf-8")
+        report["X-Profile-Status"] = response.status_code
+        report["X-Profile-Summary"] = summary
+        return report
+
+
+# 処理中の遅いリクエストの監視の状態（非同期のビューやスレッドプールにも引き継がれる）
+_slow_request = ContextVar("slow_request", default=None)
+
+
+def watch_task():
+    """
+    非同期のビューを実行しているタスクを監視の対象にする
+
+    非同期のビューはミドルウェアとは別のスレッド（イベントループ）で実行されるため，
+    ミドルウェアのスレッドのスタックではなくタスクのスタックを記録する．
+    """
+
+    state = _slow_request.get()
+    if state is not None:
+        state["task"] = asyncio.current_task()
+
+
+@contextmanager
+def watch_thread():
+    """
+    リクエストのためにスレッドプールで実行している処理のスレッドを監視の対象にする
+    """
+
+    state = _slow_request.get()
+    if state is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    state["threads"].add(thread_id)
+    try:
+        yield
+    finally:
+        state["threads"].discard(thread_id)
+
+
+def _format_task(task):
+    # 中断しているコルーチンは await している先をたどってスタックを作る
+    frames = []
+    awaitable = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(
+            awaitable, "gi_frame", None
+        )
+        if frame is None:
+            break
+        frames.append((frame, frame.f_lineno))
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(
+            awaitable, "gi_yieldfrom", None
+        )
+    return "".join(traceback.StackSummary.extract(frames).format())
+
+
+class _Watchdog:
+    """
+    処理中のリクエストを監視し，しきい値を超えたものの実行中のスタックを記録する
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="slow-request-watchdog", daemon=True
+            )
+            self._thread.start()
+
+    def watch(self, thread_id, deadline):
+        state = {
+            "deadline": deadline,
+            "stack": None,
+            "thread_id": thread_id,
+            "task": None,
+            "threads": set(),
+        }
+        with self._lock:
+            self._ensure_started()
+            self._requests[id(state)] = state
+        return state
+
+    def unwatch(self, state):
+        with self._lock:
+            self._requests.pop(id(state), None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            now = time.monotonic()
+            with self._lock:
+                overdue = [
+                    state
+                    for state in self._requests.values()
+                    if state["stack"] is None and now >= state["deadline"]
+                ]
+            if not overdue:
+                continue
+            frames = sys._current_frames()
+            for state in overdue:
+                state["stack"] = self._format(state, frames)
+
+    def _format(self, state, frames):
+        task = state["task"]
+        if task is not None and not task.done():
+            stacks = [_format_task(task)]
+        else:
+            frame = frames.get(state["thread_id"])
+            stacks = [] if frame is None else ["".join(traceback.format_stack(frame))]
+        for thread_id in list(state["threads"]):
+            frame = frames.get(thread_id)
+            if frame is not None:
+                stacks.append(
+                    f"Thread {thread_id}:\n" + "".join(traceback.format_stack(frame))
+                )
+        return "\n".join(stacks) or None
+
+
+_watchdog = _Watchdog()
+
+
+class SlowRequestMiddleware(WrappingMiddleware):
+    """
+    SLOW_REQUEST_THRESHOLD 秒を超えたリクエストを，クエリの一覧と
+    しきい値を超えた時点のスタックとともにログに記録する
+
+    非同期のビューでは，watch_task・watch_thread で登録したタスクと
+    スレッドプールのスレッドのスタックを記録する．
+    """
+
+    def wrap(self, request):
+        threshold = settings.SLOW_REQUEST_THRESHOLD
+        if threshold is None:
+            response = yield
+            return response
+
+        thread_id = threading.get_ident()
+        start = time.monotonic()
+        state = _watchdog.watch(thread_id, start + threshold)
+        if self.is_async:
+            # イベントループのスレッドは他のリクエストも処理するため，このタスクを記録する
+            state["task"] = asyncio.current_task()
+        token = _slow_request.set(state)
+        try:
+            with collect_queries(
+                track_shapes=False, track_queries=settings.SLOW_REQUEST_MAX_QUERIES
+            ) as queries:
+                response = yield
+        finally:
+            _slow_request.reset(token)
+            _watchdog.unwatch(state)
+        elapsed = time.monotonic() - start
+        if elapsed >= threshold:
+            record = {
+                "method": request.method,
+                "path": request.path,
+                "view": getattr(request.resolver_match, "view_name", None),
+                "status": response.status_code,
+                "duration_ms": round(elapsed * 1000, 1),
+                "queries": queries.count,
+                "db_ms": round(queries.duration * 1000, 2),
+                "query_list": [
+                    {"sql": sql, "ms": round(duration * 1000, 2)}
+                    for sql, duration in queries.queries
+                ],
+                "stack": state["stack"],
+            }
+            logger.warning(json.dumps(record, ensure_ascii=False))
+        return response
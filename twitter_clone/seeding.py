@@ -0,0 +1,246 @@
+import itertools
+import time
+from bisect import bisect_right
+from collections import defaultdict
+from random import Random
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from account.models import Account, FollowConnection, Profile
+from tweet.entities import index_tweets
+from tweet.models import FavoriteConnection, Tweet
+from tweet.sharding import shard_for_user
+
+SEED_BATCH_SIZE = 5000
+SEED_HASHTAGS = [
+    "django",
+    "python",
+    "sqlite",
+    "performance",
+    "benchmark",
+    "cache",
+    "database",
+    "music",
+    "travel",
+    "coffee",
+]
+
+
+class ZipfSampler:
+    """
+    items の先頭ほど選ばれやすい（順位の exponent 乗に反比例する）重み付きの抽出
+    """
+
+    def __init__(self, items, exponent, rng):
+        self.items = items
+        self.rng = rng
+        self.cum_weights = list(
+            itertools.accumulate(
+                1.0 / rank**exponent for rank in range(1, len(items) + 1)
+            )
+        )
+        self.total = self.cum_weights[-1] if self.cum_weights else 0.0
+
+    def choice(self):
+        index = bisect_right(self.cum_weights, self.rng.random() * self.total)
+        return self.items[min(index, len(self.items) - 1)]
+
+    def sample(self, k, exclude=None):
+        """
+        重複のない k 件を選ぶ（人気の偏りが大きい場合は k 件に満たないことがある）
+        """
+
+        chosen = {}
+        for _ in range(k * 4):
+            if len(chosen) >= k:
+                break
+            item = self.choice()
+            if item != exclude:
+                chosen[item] = None
+        return list(chosen)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _bulk_create(model, objs, batch_size, using="default"):
+    created = 0
+    for chunk in _chunks(objs, batch_size):
+        with transaction.atomic(using=using):
+            model.objects.using(using).bulk_create(chunk, batch_size=batch_size)
+        created += len(chunk)
+    return created
+
+
+class Seeder:
+    """
+    アカウント・プロフィール・ツイート・フォロー・いいねの大量のデータを作る
+
+    フォローといいねの相手は Zipf 分布で選ぶため，一部のアカウントやツイートに
+    人気が集中する．同じ seed からは（ID と日時を除いて）同じデータが作られる．
+    """
+
+    def __init__(
+        self,
+        accounts,
+        tweets_per_account=10,
+        follows_per_account=20,
+        favorites_per_account=20,
+        exponent=1.1,
+        seed=0,
+        prefix="seed",
+        password="password",
+        batch_size=SEED_BATCH_SIZE,
+    ):
+        self.accounts = accounts
+        self.tweets_per_account = tweets_per_account
+        self.follows_per_account = follows_per_account
+        self.favorites_per_account = favorites_per_account
+        self.exponent = exponent
+        self.prefix = prefix
+        self.password = password
+        self.batch_size = batch_size
+        self.rng = Random(seed)
+
+    def _count(self, mean):
+        # 1人あたりの件数も裾の長い分布にする
+        if mean <= 0:
+            return 0
+        return int(self.rng.expovariate(1.0 / mean))
+
+    def _popular(self, items):
+        items = list(items)
+        self.rng.shuffle(items)
+        return ZipfSampler(items, self.exponent, self.rng)
+
+    def create_accounts(self):
+        # ハッシュの計算は遅いため，全員に同じハッシュを使う
+        password = make_password(self.password)
+        usernames = [f"{self.prefix}{i}" for i in range(self.accounts)]
+        _bulk_create(
+            Account,
+            (
+                Account(
+                    username=username,
+                    email=f"{username}@example.com",
+                    password=password,
+                )
+                for username in usernames
+            ),
+            self.batch_size,
+        )
+        account_ids = []
+        for chunk in _chunks(usernames, self.batch_size):
+            ids = dict(
+                Account.objects.filter(username__in=chunk).values_list("username", "id")
+            )
+            account_ids.extend(ids[username] for username in chunk)
+        _bulk_create(
+            Profile,
+            (
+                Profile(user_id=account_id, profile=f"{self.prefix} profile {i}")
+                for i, account_id in enumerate(account_ids)
+            ),
+            self.batch_size,
+        )
+        return account_ids
+
+    def create_follows(self, account_ids):
+        popular = self._popular(account_ids)
+
+        def follows():
+            for follower_id in account_ids:
+                k = min(self._count(self.follows_per_account), len(account_ids) - 1)
+                for followee_id in popular.sample(k, exclude=follower_id):
+                    yield FollowConnection(
+                        follower_id=follower_id, followee_id=followee_id
+                    )
+
+        return _bulk_create(FollowConnection, follows(), self.batch_size)
+
+    def _tweet_content(self, number):
+        content = f"{self.prefix} tweet {number}"
+        if self.rng.random() < 0.2:
+            content += f" #{self.hashtags.choice()}"
+        return content
+
+    def create_tweets(self, account_ids):
+        """
+        投稿の多いアカウントほど多くのツイートを持つようにツイートを作り，
+        (ID, シャード) のリストを返す
+        """
+
+        authors = self._popular(account_ids)
+        self.hashtags = ZipfSampler(SEED_HASHTAGS, self.exponent, self.rng)
+        by_shard = defaultdict(list)
+        for number in range(self.accounts * self.tweets_per_account):
+            user_id = authors.choice()
+            by_shard[shard_for_user(user_id)].append(
+                (user_id, self._tweet_content(number))
+            )
+
+        tweet_refs = []
+        for shard, rows in by_shard.items():
+            for chunk in _chunks(rows, self.batch_size):
+                tweets = [
+                    Tweet(user_id=user_id, content=content)
+                    for user_id, content in chunk
+                ]
+                with transaction.atomic(using=shard):
+                    Tweet.objects.using(shard).bulk_create(tweets)
+                    index_tweets(tweets, using=shard)
+                tweet_refs.extend((tweet.pk, shard) for tweet in tweets)
+        return tweet_refs
+
+    def create_favorites(self, account_ids, tweet_refs):
+        if not tweet_refs:
+            return 0
+        popular = self._popular(tweet_refs)
+        by_shard = defaultdict(list)
+        for account_id in account_ids:
+            k = min(self._count(self.favorites_per_account), len(tweet_refs))
+            for tweet_id, shard in popular.sample(k):
+                by_shard[shard].append(
+                    FavoriteConnection(
+                        favorite_account_id=account_id, favorited_tweet_id=tweet_id
+                    )
+                )
+        return sum(
+            _bulk_create(FavoriteConnection, favorites, self.batch_size, using=shard)
+            for shard, favorites in by_shard.items()
+        )
+
+    def run(self):
+        """
+        データを作り，モデルごとの件数と所要時間（秒）を返す
+        """
+
+        timings = {}
+        counts = {}
+
+        start = time.perf_counter()
+        account_ids = self.create_accounts()
+        counts["accounts"] = len(account_ids)
+        timings["accounts"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        counts["follows"] = self.create_follows(account_ids)
+        timings["follows"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        tweet_refs = self.create_tweets(account_ids)
+        counts["tweets"] = len(tweet_refs)
+        timings["tweets"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        counts["favorites"] = self.create_favorites(account_ids, tweet_refs)
+        timings["favorites"] = time.perf_counter() - start
+
+        return counts, timings
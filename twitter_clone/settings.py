@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,14 +40,21 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "account.apps.AccountConfig",
     "tweet.apps.TweetConfig",
+    "notification.apps.NotificationConfig",
+    "jobqueue.apps.JobqueueConfig",
 ]
 
 MIDDLEWARE = [
+    "twitter_clone.profiling.SlowRequestMiddleware",
+    "twitter_clone.metrics.MetricsMiddleware",
+    "twitter_clone.instrumentation.QueryInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "twitter_clone.profiling.ProfilingMiddleware",
+    "account.middleware.ProfileMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -57,8 +65,17 @@ TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [],
-        "APP_DIRS": True,
         "OPTIONS": {
+            # 起動時の warm_up() でコンパイルしたテンプレートを使い回す
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    [
+                        "django.template.loaders.filesystem.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ],
+                ),
+            ],
             "context_processors": [
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
@@ -71,6 +88,39 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "twitter_clone.wsgi.application"
 
+# WSGI/ASGI の起動時にテンプレートやURLの逆引き表を事前に読み込む
+WARMUP_ON_STARTUP = True
+
+# ASGI（twitter_clone/asgi.py）で動かす場合は True にすると，ホーム・アカウントの詳細・
+# フォロー／フォロワーの一覧・ツイートの詳細を非同期のビュー（async_views.py）で処理し，
+# 互いに依存しないクエリを同時に実行する
+ASYNC_READ_VIEWS = False
+
+# リクエストごとのクエリの件数・時間を記録する割合（0〜1，twitter_clone/instrumentation.py）．
+# 同じ形のクエリが SQL_N_PLUS_ONE_THRESHOLD 回以上実行されたリクエストは警告する．
+SQL_INSTRUMENTATION_SAMPLE_RATE = 0.0
+SQL_N_PLUS_ONE_THRESHOLD = 5
+
+# Profiling
+# スタッフは `?_profile=1`（または `X-Profile: 1` ヘッダ）を付けるとリクエストを
+# cProfile で計測できる．結果（上位 PROFILING_TOP 件）は本来のレスポンスの代わりに
+# テキストで返す（サーバにファイルは残さない）．
+# SLOW_REQUEST_THRESHOLD 秒を超えたリクエストは，クエリの一覧（最大
+# SLOW_REQUEST_MAX_QUERIES 件）としきい値を超えた時点のスタックをログに出力する（None で無効）．
+PROFILING_TOP = 50
+SLOW_REQUEST_THRESHOLD = 1.0
+SLOW_REQUEST_MAX_QUERIES = 100
+
+# Metrics
+# 各プロセスは METRICS_DIR のプロセスごとのファイル（メモリマップ）に値を書き込み，
+# /metrics は全プロセスのファイルを合計して返す．デプロイ時にはこのディレクトリを空にすること．
+# /metrics にはスタッフと `Authorization: Bearer <METRICS_TOKEN>` を付けたリクエストだけが
+# アクセスできる（METRICS_TOKEN が空の場合はスタッフだけ）．同じホストのリバースプロキシを
+# 経由すると接続元が 127.0.0.1 になるため，接続元のアドレスでは許可しない．
+METRICS_ENABLED = True
+METRICS_DIR = os.environ.get("METRICS_DIR")
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
@@ -82,6 +132,114 @@ DATABASES = {
     }
 }
 
+# Tweet sharding
+# ツイートといいねは投稿者のIDで TWEET_SHARDS のいずれかに保存される．
+# シャードを追加した場合は `migrate --database=<alias>` の後に
+# `rebalance_tweet_shards` で既存のツイートを移動する．
+
+TWEET_SHARD_DATABASES = ["tweet_shard_1", "tweet_shard_2"]
+
+for shard_alias in TWEET_SHARD_DATABASES:
+    DATABASES[shard_alias] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / f"{shard_alias}.sqlite3",
+    }
+
+TWEET_SHARDS = ["default"]
+
+DATABASE_ROUTERS = ["tweet.routers.TweetShardRouter"]
+
+# Tweet ids
+# ツイートのIDは時刻・ワーカーID・シーケンスから生成する（tweet/ids.py）．
+# TWEET_ID_WORKER_ID が None の場合は TWEET_ID_WORKER_ID_RANGE の中から
+# ロックファイルで空いているワーカーIDを確保する．ホストごとに範囲を分けること．
+
+TWEET_ID_WORKER_ID = None
+TWEET_ID_WORKER_ID_RANGE = (0, 1024)
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# 複数のプロセスで動かす場合は Memcached などの共有キャッシュを指定すること
+# （ログインの試行の制限は共有キャッシュがないとプロセスごとにしか効かない）
+
+CACHES = {
+    "default": {
+        "BACKEND": "twitter_clone.cache_backends.InstrumentedLocMemCache",
+    },
+    # プロセス内のキャッシュ（共有キャッシュの前段で短時間だけ使う）
+    "local": {
+        "BACKEND": "twitter_clone.cache_backends.InstrumentedLocMemCache",
+        "LOCATION": "local",
+    },
+    # ログインの試行回数（account/throttling.py）．全プロセスで共有するキャッシュを指定する
+    "throttle": {
+        "BACKEND": os.environ.get(
+            "THROTTLE_CACHE_BACKEND",
+            "twitter_clone.cache_backends.InstrumentedLocMemCache",
+        ),
+        "LOCATION": os.environ.get("THROTTLE_CACHE_LOCATION", "throttle"),
+    },
+}
+
+# よく読まれるキャッシュの再計算は1つのワーカーだけが行い（twitter_clone/cache.py），
+# 他のワーカーは STALE_CACHE_TIMEOUT 秒以内の古い値を返すか，
+# STAMPEDE_WAIT_TIMEOUT 秒まで再計算の完了を待つ
+STALE_CACHE_TIMEOUT = 60
+STAMPEDE_LOCK_TIMEOUT = 10
+STAMPEDE_WAIT_TIMEOUT = 0.5
+LOCAL_CACHE_TIMEOUT = 5
+# 計算結果が None の値（存在しないツイートなど）は NONE_CACHE_TIMEOUT 秒だけ保存する
+NONE_CACHE_TIMEOUT = 5
+
+TWEET_CACHE_TIMEOUT = 300
+
+ACCOUNT_PAGE_CACHE_TIMEOUT = 300
+PROFILE_CACHE_TIMEOUT = 60 * 60
+AUTH_USER_CACHE_TIMEOUT = 60 * 60
+
+# Trends
+# 各プロセスはハッシュタグの件数を1分ごとにメモリ上で数え，TRENDS_FLUSH_INTERVAL 秒ごとに
+# バックグラウンドのスレッドでデータベースへ書き出してトレンドのスナップショットを作り直す
+# （tweet/trends.py．None の場合は書き出さない）．書き出すものがないプロセスでも，
+# スナップショットが TRENDS_FLUSH_INTERVAL 秒より古ければ同じスレッドで作り直す．
+# ツイートがない間も更新する場合は `update_trends --interval` を動かす．
+TRENDS_WINDOW_MINUTES = 60
+TRENDS_FLUSH_INTERVAL = 10
+TRENDS_SIZE = 10
+
+# ユーザ名の補完に使う索引（account/autocomplete.py）は各プロセスのメモリ上にあり，
+# 他のプロセスで登録されたアカウントを AUTOCOMPLETE_REFRESH_INTERVAL 秒ごとに取り込む．
+# 他のプロセスでのフォロワー数の変化や削除は，AUTOCOMPLETE_REBUILD_INTERVAL 秒ごとに
+# 全件を読み込み直して反映する．
+AUTOCOMPLETE_REFRESH_INTERVAL = 60
+AUTOCOMPLETE_REBUILD_INTERVAL = 10 * 60
+
+# Notifications
+# フォローやいいねはリクエスト中には記録だけを行い，ジョブキューで
+# 受信者ごとの通知にまとめる．同じ種類（同じツイートへのいいねなど）の通知は
+# 最初の出来事から NOTIFICATION_COALESCE_WINDOW 秒の間は1件にまとめる．
+NOTIFICATION_COALESCE_WINDOW = 60 * 60
+NOTIFICATION_PROCESS_DELAY = 5
+
+# Job queue
+# 重い処理はジョブとして jobqueue_job テーブルに登録し，`runworker --processes N` で実行する．
+# 失敗したジョブは JOB_RETRY_BASE_DELAY 秒から倍々に（JOB_RETRY_MAX_DELAY 秒まで）
+# 間隔を空けて JOB_MAX_ATTEMPTS 回まで実行し，JOB_LOCK_TIMEOUT 秒を過ぎても locked_at が
+# 更新されないジョブは（ワーカーが停止したとみなして）実行待ちに戻す．
+# 実行中のジョブは JOB_HEARTBEAT_INTERVAL 秒ごとに locked_at を更新するため，
+# JOB_HEARTBEAT_INTERVAL は JOB_LOCK_TIMEOUT より十分に短くする．
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_DELAY = 10
+JOB_RETRY_MAX_DELAY = 60 * 60
+JOB_LOCK_TIMEOUT = 10 * 60
+JOB_HEARTBEAT_INTERVAL = 60
+
+# セッションはキャッシュを優先して読み，変更があったときだけデータベースにも書き込む
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+
+TEST_RUNNER = "twitter_clone.test_runner.CacheClearingTestRunner"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -129,10 +287,50 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "account.Account"
 
+# ModelBackend はキャッシュを使う前にログインしたセッション（セッションにバックエンドの
+# パスが保存されている）を無効にしないために残す（認証には使われない）
+AUTHENTICATION_BACKENDS = [
+    "account.backends.CachedModelBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+
+# ログインの試行は（パスワードのハッシュを計算する前に）IPアドレスとユーザ名ごとに
+# 区間内の回数で制限する．(回数, 区間の秒数)
+# 回数は CACHES["throttle"] に保存する．プロセスごとの LocMemCache ではプロセスの数だけ
+# 上限が緩くなるため，THROTTLE_REQUIRE_SHARED_CACHE の場合は共有キャッシュ（Memcached など）
+# でなければ起動しない（account.E001）．
+# IPアドレスは REMOTE_ADDR を使い，それが LOGIN_THROTTLE_TRUSTED_PROXIES のアドレス
+# （またはネットワーク）の場合だけ X-Forwarded-For から信頼できるプロキシを除いた
+# 最後のアドレスを使う．
+LOGIN_THROTTLE_IP_RATE = (20, 60)
+LOGIN_THROTTLE_USERNAME_RATE = (10, 10 * 60)
+LOGIN_THROTTLE_TRUSTED_PROXIES = []
+THROTTLE_REQUIRE_SHARED_CACHE = not DEBUG
+
 LOGIN_URL = "account:login"
 LOGIN_REDIRECT_URL = "account:home"
 LOGOUT_REDIRECT_URL = "account:login"
 
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+        },
+    },
+    "loggers": {
+        "twitter_clone": {
+            "handlers": ["console"],
+            "level": "INFO",
+        },
+        "jobqueue": {
+            "handlers": ["console"],
+            "level": "INFO",
+        },
+    },
+}
+
 """LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
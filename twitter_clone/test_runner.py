@@ -0,0 +1,40 @@
+import shutil
+import tempfile
+import unittest
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test.runner import DiscoverRunner
+
+
+class CacheClearingTestRunner(DiscoverRunner):
+    """
+    テストごとにキャッシュを空にするテストランナー
+
+    テストケースごとにデータベースは巻き戻されるが，キャッシュは残るため
+    （同じIDのアカウントが前のテストのキャッシュを参照しないように）毎回消去する．
+    メトリクスは一時ディレクトリに書き込む．
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        # メトリクスのファイルは実行中のサーバと混ざらないよう一時ディレクトリに書く
+        self._metrics_dir = tempfile.mkdtemp(prefix="twitter_clone_metrics_")
+        settings.METRICS_DIR = self._metrics_dir
+        # トレンドの書き出しのスレッドはテストのトランザクションの外から書き込むため止める
+        settings.TRENDS_FLUSH_INTERVAL = None
+
+    def teardown_test_environment(self, **kwargs):
+        shutil.rmtree(self._metrics_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
+
+    def get_resultclass(self):
+        base = super().get_resultclass() or unittest.TextTestResult
+
+        class CacheClearingTestResult(base):
+            def startTest(self, test):
+                for cache in caches.all():
+                    cache.clear()
+                super().startTest(test)
+
+        return CacheClearingTestResult
@@ -0,0 +1,95 @@
+from django.core.cache import caches
+from django.db.models.signals import post_init, post_save
+
+from .instrumentation import collect_queries
+
+
+class count_rows:
+    """
+    with ブロック内でモデルのインスタンスとして読み込まれた行を数える
+
+    values() や values_list() で読み込んだ行は含まない．
+    """
+
+    def __enter__(self):
+        self.count = 0
+        self._instances = []
+        self._created = set()
+        post_init.connect(self._initialized, weak=False)
+        post_save.connect(self._saved, weak=False)
+        return self
+
+    def __exit__(self, *exc_info):
+        post_init.disconnect(self._initialized)
+        post_save.disconnect(self._saved)
+        # データベースから読み込まれた（from_db で adding が False になった）ものだけを数える
+        self.count = sum(
+            1
+            for instance in self._instances
+            if not instance._state.adding and id(instance) not in self._created
+        )
+        self._instances = []
+
+    def _initialized(self, sender, instance, **kwargs):
+        self._instances.append(instance)
+
+    def _saved(self, sender, instance, created, **kwargs):
+        if created:
+            self._created.add(id(instance))
+
+
+class QueryBudgetMixin:
+    """
+    ビューが実行するクエリの数と読み込む行数を検査するテスト用の Mixin
+
+    キャッシュを空にした（最も多くのクエリを実行する）状態で数える．
+    """
+
+    def measure(self, func):
+        for cache in caches.all():
+            cache.clear()
+        with collect_queries(track_shapes=False, track_queries=1000) as queries:
+            with count_rows() as rows:
+                response = func()
+        return response, queries, rows.count
+
+    def _format_queries(self, queries):
+        return "\n".join(f"  {sql}" for sql, _ in queries.queries)
+
+    def assertQueryBudget(self, func, queries, rows=None):
+        """
+        func() がちょうど queries 件のクエリを実行し，rows 行以下しか読み込まない
+        """
+
+        response, collector, row_count = self.measure(func)
+        self.assertEqual(
+            collector.count,
+            queries,
+            f"{collector.count} queries executed, expected {queries}:\n"
+            f"{self._format_queries(collector)}",
+        )
+        if rows is not None:
+            self.assertLessEqual(
+                row_count, rows, f"{row_count} rows fetched, expected <= {rows}"
+            )
+        return response
+
+    def assertQueriesDoNotScale(self, func, grow):
+        """
+        grow() でデータを増やしても func() のクエリの数と読み込む行数が変わらない
+        """
+
+        _, before, rows_before = self.measure(func)
+        grow()
+        _, after, rows_after = self.measure(func)
+        self.assertEqual(
+            before.count,
+            after.count,
+            f"query count grew from {before.count} to {after.count}:\n"
+            f"{self._format_queries(after)}",
+        )
+        self.assertEqual(
+            rows_before,
+            rows_after,
+            f"rows fetched grew from {rows_before} to {rows_after}",
+        )
@@ -16,8 +16,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from . import views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', views.metrics_view, name='metrics'),
     path('', include('account.urls')),
     path('', include('tweet.urls')),
+    path('', include('notification.urls')),
 ]
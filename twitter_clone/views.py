@@ -0,0 +1,31 @@
+import hmac
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.views.decorators.http import require_http_methods
+
+from .metrics import render
+
+
+def _has_metrics_token(request):
+    token = settings.METRICS_TOKEN
+    if not token:
+        return False
+    scheme, _, credentials = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(
+        credentials.encode(), token.encode()
+    )
+
+
+@require_http_methods(["GET"])
+def metrics_view(request):
+    """
+    全プロセスのメトリクスを Prometheus のテキスト形式で返す
+
+    スタッフと，`Authorization: Bearer <METRICS_TOKEN>` を付けたリクエストだけが見られる．
+    """
+
+    if not (request.user.is_staff or _has_metrics_token(request)):
+        raise PermissionDenied
+    return HttpResponse(render(), content_type="text/plain; version=0.0.4")
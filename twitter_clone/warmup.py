@@ -0,0 +1,82 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.conf import settings
+from django.template import TemplateSyntaxError, engines
+from django.template.utils import get_app_template_dirs
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _timer(timings, name):
+    start = time.perf_counter()
+    yield
+    timings[name] = (time.perf_counter() - start) * 1000
+
+
+def _template_names(engine):
+    dirs = list(engine.engine.dirs) + list(get_app_template_dirs("templates"))
+    for template_dir in dirs:
+        # プロジェクト内（account/templates, tweet/templates など）のテンプレートだけを対象にする
+        if not str(template_dir).startswith(str(settings.BASE_DIR)):
+            continue
+        for root, _, files in os.walk(template_dir):
+            for filename in files:
+                if filename.endswith(".html"):
+                    path = os.path.join(root, filename)
+                    yield os.path.relpath(path, template_dir).replace(os.sep, "/")
+
+
+def warm_up_models():
+    for model in apps.get_models():
+        model._meta.get_fields()
+        model._meta.concrete_fields
+        model._meta.related_objects
+
+
+def warm_up_urls():
+    resolver = get_resolver()
+    resolver.reverse_dict
+    for namespace in resolver.namespace_dict:
+        resolver.namespace_dict[namespace][1].reverse_dict
+
+
+def warm_up_templates():
+    count = 0
+    for engine in engines.all():
+        if not hasattr(engine, "engine"):
+            continue
+        for name in _template_names(engine):
+            try:
+                engine.get_template(name)
+            except TemplateSyntaxError:
+                logger.exception("failed to compile template %s", name)
+                continue
+            count += 1
+    return count
+
+
+def warm_up():
+    """
+    起動直後のワーカーで最初のリクエストが遅くならないよう，
+    モデルのメタ情報・URLの逆引き表・テンプレートを事前に読み込む
+    """
+
+    timings = {}
+    with _timer(timings, "models"):
+        warm_up_models()
+    with _timer(timings, "urls"):
+        warm_up_urls()
+    with _timer(timings, "templates"):
+        template_count = warm_up_templates()
+    logger.info(
+        "warm-up finished: %s (%d templates)",
+        ", ".join(f"{name}={ms:.1f}ms" for name, ms in timings.items()),
+        template_count,
+    )
+    return timings